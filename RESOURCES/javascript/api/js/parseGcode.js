@@ -37,7 +37,7 @@ jscut.parseGcode = function (options, gcode) {
                 ++i;
             return Number(gcode.substr(begin, i - begin));
         }
-        var g = NaN, x = NaN, y = NaN, z = NaN, f = NaN;
+        var g = NaN, x = NaN, y = NaN, z = NaN, f = NaN, cx = NaN, cy = NaN;
         while (i < gcode.length && gcode[i] != ';' && gcode[i] != '\r' && gcode[i] != '\n') {
             if (gcode[i] == 'G' || gcode[i] == 'g')
                 g = parse();
@@ -49,10 +49,40 @@ jscut.parseGcode = function (options, gcode) {
                 z = parse();
             else if (gcode[i] == 'F' || gcode[i] == 'f')
                 f = parse();
+            else if (gcode[i] == 'I' || gcode[i] == 'i')
+                cx = parse();
+            else if (gcode[i] == 'J' || gcode[i] == 'j')
+                cy = parse();
             else
                 ++i;
         }
-        if (g == 0 || g == 1) {
+        if ((g == 2 || g == 3) && !isNaN(lastX) && !isNaN(lastY) && !isNaN(lastZ)) {
+            // the arc as small lines (XY plane, helix in Z), up to its end point
+            var endX = isNaN(x) ? lastX : x;
+            var endY = isNaN(y) ? lastY : y;
+            var endZ = isNaN(z) ? lastZ : z;
+            var centerX = lastX + (isNaN(cx) ? 0 : cx);
+            var centerY = lastY + (isNaN(cy) ? 0 : cy);
+            var radius = Math.sqrt((lastX - centerX) * (lastX - centerX) + (lastY - centerY) * (lastY - centerY));
+            var startAngle = Math.atan2(lastY - centerY, lastX - centerX);
+            var sweep = Math.atan2(endY - centerY, endX - centerX) - startAngle;
+            if (g == 2 && sweep >= 0)
+                sweep -= 2 * Math.PI;
+            else if (g == 3 && sweep <= 0)
+                sweep += 2 * Math.PI;
+            var nbLines = Math.max(1, Math.ceil(Math.abs(sweep) / (Math.PI / 36)));
+            for (var k = 1; k < nbLines; ++k) {
+                var angle = startAngle + sweep * k / nbLines;
+                path.push(centerX + radius * Math.cos(angle));
+                path.push(centerY + radius * Math.sin(angle));
+                path.push(lastZ + (endZ - lastZ) * k / nbLines);
+                path.push(isNaN(f) ? lastF : f);
+            }
+            x = endX;
+            y = endY;
+            z = endZ;
+        }
+        if (g == 0 || g == 1 || g == 2 || g == 3) {
             if (!isNaN(x)) {
                 if (isNaN(lastX))
                     for (var j = 0; j < path.length; j += stride)
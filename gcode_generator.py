@@ -20,8 +20,18 @@ import sys
 from typing import List
 from typing import Dict
 from typing import Any
+from typing import Tuple
+from typing import Callable
+from typing import Iterator
+from typing import TextIO
+from typing import TYPE_CHECKING
 
+import io
 import math
+import hashlib
+import multiprocessing
+
+import concurrent.futures
 
 import shapely
 import shapely.geometry
@@ -29,12 +39,19 @@ import shapely.ops
 
 from shapely_utils import ShapelyUtils
 from shapely_svgpath_io import SvgPath
+from shapely_svgpath_io import SvgPathDiscretizer
 from shapely_matplotlib import MatplotLibUtils
 
-from svgviewer import SvgViewer
+if TYPE_CHECKING:
+    # only for the type hints - the gcode generation itself does not need Qt
+    from svgviewer import SvgViewer
 
 from shapely_cam import cam
 from shapely_cam import CamPath
+from shapely_cam import TabsIndex
+
+import toolpaths_cache
+from toolpaths_cache import ToolpathsCache
 
 from val_with_unit import ValWithUnit
 
@@ -249,6 +266,9 @@ class TabsModel:
 
         Tab.set_height(self.height, self.units)
 
+        self.tabs_index: TabsIndex | None = None
+        self.tabs_key: List[Tuple[Tuple[float, float], float]] = []
+
     def set_height(self, height: float, units: str):
         self.units = units
         self.height = ValWithUnit(height, units)
@@ -258,17 +278,41 @@ class TabsModel:
     def has_tabs(self):
         return len(self.tabs) > 0
 
+    def make_tabs_index(self) -> TabsIndex:
+        """
+        the tabs polygons, built again only if the tabs changed
+        """
+        tabs_key = [(tuple(tab["center"]), tab["radius"]) for tab in self.tabs]
+
+        if self.tabs_index is None or tabs_key != self.tabs_key:
+            self.tabs_index = TabsIndex(self.tabs)
+            self.tabs_key = tabs_key
+
+        return self.tabs_index
+
     def pos_in_tab(self, x: float, y: float, z: float, op_cut_depth: float):
-        for tab in self.tabs:
-            if Tab(tab).pos_inside_tab(x, y, z, op_cut_depth):
-                return True
+        if op_cut_depth + z > Tab.height:
+            # still above the tabs
+            return False
 
-        return False
+        return self.make_tabs_index().pos_in_tab(x, y)
 
 
 class CncOp:
     """ """
 
+    # the attributes filled by the geometry/toolpaths calculation
+    CALCULATED_ATTRS = (
+        "svg_paths",
+        "geometry_svg_paths",
+        "geometry",
+        "preview_geometry",
+        "shapely_polygons",
+        "shapely_lines",
+        "cam_paths",
+        "cam_paths_svg_paths",
+    )
+
     def __init__(self, operation: Dict[str, Any]):
         self.units: str = operation["units"]
         self.name: str = operation["name"]
@@ -321,7 +365,79 @@ class CncOp:
             self.enabled,
         )
 
-    def setup(self, svg_viewer: SvgViewer):
+    def to_dict(self) -> Dict[str, Any]:
+        """ """
+        return {
+            "name": self.name,
+            "type": self.cam_op,
+            "cut_depth": float(self.cut_depth),
+            "paths": self.paths,
+            "ramp_plunge": self.ramp_plunge,
+            "combinaison": self.combinaison,
+            "direction": self.direction,
+            "units": self.units,
+            "margin": float(self.margin),
+            "width": float(self.width),
+            "enabled": self.enabled,
+        }
+
+    def toolpaths_signature(self) -> Tuple:
+        """
+        All the op settings the geometry and the toolpaths depend on.
+
+        The cut depth and the ramp plunge are only used in the gcode generation.
+        """
+        return (
+            self.name,
+            tuple(self.paths),
+            self.combinaison,
+            self.cam_op,
+            self.direction,
+            self.units,
+            float(self.margin),
+            float(self.width),
+            self.enabled,
+        )
+
+    def toolpaths_cache_key(self, tool_data: Dict[str, Any]) -> str | None:
+        """
+        hash of all what the cam paths of the op depend on, once its
+        geometry is calculated - None if they cannot be cached
+        """
+        if self.geometry is None or not self.can_calculate_cam_paths_in_worker():
+            # the spirale pocket depends on the svg paths too
+            return None
+
+        settings = (
+            toolpaths_cache.VERSION,
+            self.cam_op,
+            self.name.startswith("hsm_"),
+            self.direction,
+            self.units,
+            float(self.margin),
+            float(self.width),
+            float(tool_data["diameter_tool"]),
+            float(tool_data["overlap"]),
+        )
+
+        key = hashlib.sha256(repr(settings).encode())
+        key.update(shapely.to_wkb(self.geometry))
+
+        preview_geometry = getattr(self, "preview_geometry", None)
+        if preview_geometry is not None:
+            key.update(shapely.to_wkb(preview_geometry))
+
+        return key.hexdigest()
+
+    def take_toolpaths(self, other: "CncOp"):
+        """
+        reuse the geometry and the toolpaths calculated by an op with the same signature
+        """
+        for attr in self.CALCULATED_ATTRS:
+            if attr in other.__dict__:
+                setattr(self, attr, other.__dict__[attr])
+
+    def setup(self, svg_viewer: "SvgViewer"):
         """ """
         self.svg_paths = [
             svg_viewer.svg_shapes[svg_path_id] for svg_path_id in self.paths
@@ -727,10 +843,52 @@ class CncOp:
             self.geometry_svg_paths.append(svg_path)
 
     def calculate_toolpaths(
-        self, svg_model: SvgModel, tool_model: ToolModel, material_model: MaterialModel
+        self,
+        svg_model: SvgModel,
+        tool_model: ToolModel,
+        material_model: MaterialModel,
+        nb_workers: int = 1,
     ):
         """ """
-        tool_data = tool_model.get_cam_data()
+        self.cam_paths = self.calculate_cam_paths(
+            tool_model.get_cam_data(), nb_workers
+        )
+
+        self.calculate_cam_paths_svg_paths(tool_model)
+
+    def can_calculate_cam_paths_in_worker(self) -> bool:
+        """
+        the spirale pocket needs the svg paths, the other ops only the geometry
+        """
+        return not (self.cam_op == "Pocket" and self.name.startswith("sp_"))
+
+    def worker_data(self, tool_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        what a worker process needs to calculate the cam paths of the op:
+        the op settings, the tool data and the geometry (as WKB)
+        """
+        preview_geometry = getattr(self, "preview_geometry", None)
+
+        return {
+            "operation": self.to_dict(),
+            # plain floats: ValWithUnit are not picklable
+            "tool_data": {key: float(value) for key, value in tool_data.items()},
+            "geometry": shapely.to_wkb(self.geometry),
+            "preview_geometry": (
+                shapely.to_wkb(preview_geometry)
+                if preview_geometry is not None
+                else None
+            ),
+        }
+
+    def calculate_cam_paths(
+        self, tool_data: Dict[str, Any], nb_workers: int = 1
+    ) -> List[CamPath]:
+        """
+        the toolpaths of the op, from its geometry - the hsm pockets of
+        several polygons in nb_workers worker processes
+        """
+        cam_paths = self.cam_paths
 
         name = self.name
         cam_op = self.cam_op
@@ -758,15 +916,15 @@ class CncOp:
 
         if self.geometry.geom_type == "MultiPoint":
             if cam_op == "Drill":
-                self.cam_paths = cam.drill(geometry, tool_data["diameter_tool"])
+                cam_paths = cam.drill(geometry, tool_data["diameter_tool"])
             elif cam_op == "Peck":
-                self.cam_paths = cam.peck(geometry, tool_data["diameter_tool"])
+                cam_paths = cam.peck(geometry, tool_data["diameter_tool"])
 
         if cam_op == "Helix":
-            self.cam_paths = cam.helix(geometry, tool_data["diameter_tool"])
+            cam_paths = cam.helix(geometry, tool_data["diameter_tool"])
 
         elif cam_op == "Pocket" and name.startswith("sp_"):
-            self.cam_paths = cam.spirale_pocket(
+            cam_paths = cam.spirale_pocket(
                 self.svg_paths,
                 geometry,
                 tool_data["diameter_tool"],
@@ -774,11 +932,12 @@ class CncOp:
                 direction == "Climb",
             )
         elif cam_op == "Pocket" and name.startswith("hsm_"):
-            self.cam_paths = cam.hsm_nibbler_pocket(
+            cam_paths = cam.hsm_nibbler_pocket(
                 geometry,
                 tool_data["diameter_tool"],
                 tool_data["overlap"],
                 direction == "Climb",
+                nb_workers,
             )
         else:
             if self.geometry.geom_type == "MultiPolygon":
@@ -792,7 +951,7 @@ class CncOp:
                     )
 
                 if cam_op == "Pocket":
-                    self.cam_paths = cam.pocket(
+                    cam_paths = cam.pocket(
                         geometry,
                         tool_data["diameter_tool"],
                         tool_data["overlap"],
@@ -802,7 +961,7 @@ class CncOp:
                     width = width.to_mm()
                     if width < tool_data["diameter_tool"]:
                         width = tool_data["diameter_tool"]
-                    self.cam_paths = cam.outline(
+                    cam_paths = cam.outline(
                         geometry,
                         tool_data["diameter_tool"],
                         cam_op == "Inside",
@@ -811,11 +970,11 @@ class CncOp:
                         direction == "Climb",
                     )
                 elif cam_op == "Engrave":
-                    self.cam_paths = cam.engrave(geometry, direction == "Climb")
+                    cam_paths = cam.engrave(geometry, direction == "Climb")
 
             if self.geometry.geom_type == "MultiLineString":
                 if cam_op == "Engrave":
-                    self.cam_paths = cam.engrave_opened_paths(
+                    cam_paths = cam.engrave_opened_paths(
                         geometry, direction == "Climb"
                     )
                 elif cam_op == "Inside" or cam_op == "Outside":
@@ -824,7 +983,7 @@ class CncOp:
                     width = width.to_mm()
                     if width < tool_data["diameter_tool"]:
                         width = tool_data["diameter_tool"]
-                    self.cam_paths = cam.outline_opened_paths(
+                    cam_paths = cam.outline_opened_paths(
                         geometry,
                         tool_data["diameter_tool"],
                         cam_op == "Inside",
@@ -833,9 +992,15 @@ class CncOp:
                         direction == "Climb",
                     )
 
-        # -------------------------------------------------------------------------------------
+        return cam_paths
+
+    def calculate_cam_paths_svg_paths(self, tool_model: ToolModel):
+        """
+        the toolpaths, to be displayed in the svg viewer
+        """
+        if self.cam_op == "Helix":
+            width = self.width
 
-        if cam_op == "Helix":
             for cam_path in self.cam_paths:
                 center = (cam_path.path.coords.xy[0][0], cam_path.path.coords.xy[1][0])
 
@@ -864,20 +1029,55 @@ class CncOp:
                     self.cam_paths_svg_paths.append(svg_path)
 
 
+def calculate_cam_paths_in_worker(
+    worker_data: Dict[str, Any]
+) -> List[Tuple[bytes, bool, List[Tuple[int, int, float, float]]]]:
+    """
+    runs in a worker process: the cam paths of an op from its geometry (WKB),
+    given back as WKB linestrings with their "safe_to_close" flag and arcs
+    """
+    op = CncOp(worker_data["operation"])
+    op.geometry = shapely.from_wkb(worker_data["geometry"])
+    if worker_data["preview_geometry"] is not None:
+        op.preview_geometry = shapely.from_wkb(worker_data["preview_geometry"])
+
+    cam_paths = op.calculate_cam_paths(worker_data["tool_data"])
+
+    return [
+        (shapely.to_wkb(cam_path.path), cam_path.safe_to_close, cam_path.arcs)
+        for cam_path in cam_paths
+    ]
+
+
 class JobModel:
     """ """
 
     def __init__(
         self,
-        svg_viewer: SvgViewer,
+        svg_viewer: "SvgViewer",
         cnc_ops: List[CncOp],
         material_model: MaterialModel,
         svg_model: SvgModel,
         tool_model: ToolModel,
         tabs_model: TabsModel,
         gcode_model: GcodeModel,
+        previous_job: "JobModel" = None,
+        nb_workers: int = 1,
+        toolpaths_cache: ToolpathsCache = None,
     ):
+        """
+        the toolpaths of the operations are calculated here - or taken from
+        the previous job if they did not change (only gcode settings changed).
+
+        With nb_workers > 1, the toolpaths of the operations are calculated
+        in a pool of worker processes - or, for a single operation, the hsm
+        pockets of its polygons.
+
+        With a toolpaths cache, only the ops whose geometry, type or tool
+        changed are calculated again
+        """
         self.svg_viewer = svg_viewer
+        self.svg_shapes = svg_viewer.svg_shapes
 
         self.operations = cnc_ops
 
@@ -892,19 +1092,139 @@ class JobModel:
         self.max_x = 0
         self.max_y = 0
 
-        self.calculate_operation_cam_paths()
+        self.nb_workers = nb_workers
+        self.toolpaths_cache = toolpaths_cache
+
+        if previous_job is not None and (
+            previous_job.toolpaths_signature() == self.toolpaths_signature()
+        ):
+            self.reuse_operation_cam_paths(previous_job)
+        else:
+            self.calculate_operation_cam_paths()
+
         self.find_min_max()
 
         self.gcode = ""
 
+    def toolpaths_signature(self) -> Tuple:
+        """
+        All what the toolpaths of the job depend on: the svg shapes (and their
+        discretization), the tool and the enabled operations.
+
+        Feeds, material, tabs and the gcode conversion settings are not part of it.
+        """
+        return (
+            id(self.svg_shapes),
+            SvgPathDiscretizer.PYCUT_SAMPLE_LEN_COEFF,
+            SvgPathDiscretizer.PYCUT_SAMPLE_MIN_NB_SEGMENTS,
+            float(self.tool_model.diameter.to_mm()),
+            self.tool_model.overlap,
+            tuple(op.toolpaths_signature() for op in self.operations if op.enabled),
+        )
+
     def calculate_operation_cam_paths(self):
-        for op in self.operations:
-            if op.enabled:
+        ops = [op for op in self.operations if op.enabled]
+
+        worker_ops = [op for op in ops if op.can_calculate_cam_paths_in_worker()]
+
+        if self.nb_workers > 1 and len(worker_ops) > 1:
+            self.calculate_operation_cam_paths_in_workers(ops)
+            return
+
+        tool_data = self.tool_model.get_cam_data()
+
+        for op in ops:
+            op.setup(self.svg_viewer)
+            op.calculate_geometry(self.tool_model)
+
+            if self.take_cached_cam_paths(op, tool_data):
+                continue
+
+            op.calculate_toolpaths(
+                self.svg_model,
+                self.tool_model,
+                self.material_model,
+                nb_workers=self.nb_workers,
+            )
+            self.cache_cam_paths(op, tool_data)
+
+    def calculate_operation_cam_paths_in_workers(self, ops: List[CncOp]):
+        """
+        the geometries are combined here, the toolpaths are calculated in
+        worker processes ("spawn": safe with Qt) as soon as the geometry of
+        their op is ready, and given back in the ops order
+        """
+        tool_data = self.tool_model.get_cam_data()
+
+        context = multiprocessing.get_context("spawn")
+
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.nb_workers, mp_context=context
+        ) as executor:
+            futures: Dict[int, concurrent.futures.Future] = {}
+
+            for k, op in enumerate(ops):
                 op.setup(self.svg_viewer)
                 op.calculate_geometry(self.tool_model)
-                op.calculate_toolpaths(
-                    self.svg_model, self.tool_model, self.material_model
-                )
+
+                if self.take_cached_cam_paths(op, tool_data):
+                    continue
+
+                if op.can_calculate_cam_paths_in_worker():
+                    futures[k] = executor.submit(
+                        calculate_cam_paths_in_worker, op.worker_data(tool_data)
+                    )
+                else:
+                    op.calculate_toolpaths(
+                        self.svg_model, self.tool_model, self.material_model
+                    )
+                    self.cache_cam_paths(op, tool_data)
+
+            for k, future in futures.items():
+                ops[k].cam_paths = [
+                    CamPath(shapely.from_wkb(path), safe_to_close, arcs)
+                    for path, safe_to_close, arcs in future.result()
+                ]
+                ops[k].calculate_cam_paths_svg_paths(self.tool_model)
+                self.cache_cam_paths(ops[k], tool_data)
+
+    def take_cached_cam_paths(self, op: CncOp, tool_data: Dict[str, Any]) -> bool:
+        """
+        the cam paths of the op from the toolpaths cache, if there
+        """
+        if self.toolpaths_cache is None:
+            return False
+
+        key = op.toolpaths_cache_key(tool_data)
+        if key is None:
+            return False
+
+        cam_paths = self.toolpaths_cache.get(key)
+        if cam_paths is None:
+            return False
+
+        op.cam_paths = cam_paths
+        op.calculate_cam_paths_svg_paths(self.tool_model)
+        return True
+
+    def cache_cam_paths(self, op: CncOp, tool_data: Dict[str, Any]):
+        """ """
+        if self.toolpaths_cache is None:
+            return
+
+        key = op.toolpaths_cache_key(tool_data)
+        if key is not None:
+            self.toolpaths_cache.put(key, op.cam_paths)
+
+    def reuse_operation_cam_paths(self, previous_job: "JobModel"):
+        """
+        the previous job has the same toolpaths signature: no need to recalculate
+        """
+        previous_ops = [op for op in previous_job.operations if op.enabled]
+        ops = [op for op in self.operations if op.enabled]
+
+        for op, previous_op in zip(ops, previous_ops):
+            op.take_toolpaths(previous_op)
 
     def find_min_max(self):
         min_x = sys.maxsize
@@ -931,7 +1251,16 @@ class JobModel:
 class GcodeGenerator:
     """ """
 
-    def __init__(self, job: JobModel):
+    # number of gcode lines written at once to a sink
+    CHUNK_NB_LINES = 4096
+
+    def __init__(
+        self, job: JobModel, on_chunk: Callable[[List[str]], None] | None = None
+    ):
+        """
+        on_chunk is called with each chunk of lines as the gcode is generated
+        (run time estimate...)
+        """
         self.job = job
 
         self.material_model = job.material_model
@@ -950,6 +1279,11 @@ class GcodeGenerator:
 
         self.gcode = ""
 
+        # if set, the gcode is streamed into it instead of being kept in self.gcode
+        self.sink: TextIO | None = None
+        self.on_chunk = on_chunk
+        self.nb_lines = 0
+
     @property
     def min_x(self):
         """
@@ -998,7 +1332,24 @@ class GcodeGenerator:
             # as flipped: is max_x when "no flip"
             return self.unit_converter.from_mm(self.job.max_x) + self.x_offset
 
-    def generate_gcode(self):
+    def generate_gcode(
+        self,
+        sink: TextIO | None = None,
+        on_chunk: Callable[[List[str]], None] | None = None,
+    ):
+        """
+        Without sink, the gcode text is in self.gcode (and job.gcode).
+
+        With a sink (a file or any text stream), the gcode is written into it
+        chunk by chunk, and the whole program is never held in memory.
+
+        In both cases, on_chunk (if given, else the one of the constructor) is
+        called with each chunk of lines as it is generated
+        """
+        self.sink = sink
+        if on_chunk is not None:
+            self.on_chunk = on_chunk
+
         if self.gcode_model.gcode_zero_ref == GcodeModel.ZERO_TOP_LEFT_OF_MATERIAL:
             self.generate_gcode_zero_topfeft_of_material()
         elif self.gcode_model.gcode_zero_ref == GcodeModel.ZERO_LOWER_LEFT_OF_MATERIAL:
@@ -1051,16 +1402,65 @@ class GcodeGenerator:
     def set_use_offset(self, value: bool):
         self.use_offset = value
 
-    def generate_gcode_action(self):
+    def cnc_ops_with_toolpaths(self) -> List["CncOp"]:
         cnc_ops: List["CncOp"] = []
         for cnc_op in self.job.operations:
             if cnc_op.enabled:
                 if len(cnc_op.cam_paths) > 0:
                     cnc_ops.append(cnc_op)
 
-        if len(cnc_ops) == 0:
+        return cnc_ops
+
+    def generate_gcode_action(self):
+        if len(self.cnc_ops_with_toolpaths()) == 0:
             return
 
+        if self.sink is not None:
+            self.nb_lines = self.write_gcode(self.sink, self.on_chunk)
+        else:
+            text = io.StringIO()
+            self.nb_lines = self.write_gcode(text, self.on_chunk)
+            gcode = text.getvalue()
+
+            self.gcode = gcode
+            self.job.gcode = gcode
+
+    def write_gcode(
+        self, sink: TextIO, on_chunk: Callable[[List[str]], None] | None = None
+    ) -> int:
+        """
+        Stream the gcode into the sink by chunks of lines - same text as self.gcode.
+        Returns the number of lines
+        """
+        nb_lines = 0
+        chunk: List[str] = []
+
+        def flush():
+            if nb_lines > len(chunk):
+                sink.write("\n")
+            sink.write("\n".join(chunk))
+            if on_chunk is not None:
+                on_chunk(chunk)
+
+        for line in self.iter_gcode():
+            chunk.append(line)
+            nb_lines += 1
+
+            if len(chunk) == self.CHUNK_NB_LINES:
+                flush()
+                chunk = []
+
+        if chunk:
+            flush()
+
+        return nb_lines
+
+    def iter_gcode(self) -> Iterator[str]:
+        """
+        The gcode lines, one after the other
+        """
+        cnc_ops = self.cnc_ops_with_toolpaths()
+
         safeZ = self.unit_converter.from_mm(self.material_model.mat_z_safe_move.to_mm())
         rapid_rate = int(
             self.unit_converter.from_mm(self.tool_model.rapid_rate.to_mm())
@@ -1076,33 +1476,30 @@ class GcodeGenerator:
         tab_height = self.unit_converter.from_mm(self.tabs_model.height.to_mm())
         peckZ = self.unit_converter.from_mm(1.0)
 
-        helix_outer_radius = cnc_op.width
-
-        if helix_outer_radius < tool_diameter / 2.0:
-            helix_outer_radius = tool_diameter / 2.0 + 0.1  # default! (drill)
-
         helix_plunge_rate = plunge_rate
 
-        gcode = []
+        tabs_index = self.tabs_model.make_tabs_index()
+        no_tabs_index = TabsIndex([])
+
         if self.units == "inch":
-            gcode.append("G20         ; Set units to inches")
+            yield "G20         ; Set units to inches"
         else:
-            gcode.append("G21         ; Set units to mm")
-        gcode.append("G90         ; Absolute positioning")
-        gcode.append(
+            yield "G21         ; Set units to mm"
+        yield "G90         ; Absolute positioning"
+        yield (
             f"G1 Z{safeZ.to_fixed(4)}    F{rapid_rate}      ; Move to clearance level"
         )
 
         if self.gcode_model.spindle_control:
-            gcode.append("")
-            gcode.append("; Start the spindle")
-            gcode.append(f"M3 S{self.gcode_model.spindle_speed}")
+            yield ""
+            yield "; Start the spindle"
+            yield f"M3 S{self.gcode_model.spindle_speed}"
 
-        gcode.append("")
-        gcode.append(";")
-        gcode.append("; Tool Info")
-        gcode.append(f"; Diameter:    {tool_diameter}")
-        gcode.append("")
+        yield ""
+        yield ";"
+        yield "; Tool Info"
+        yield f"; Diameter:    {tool_diameter}"
+        yield ""
 
         for idx, cnc_op in enumerate(cnc_ops):
             cut_depth = self.unit_converter.from_mm(cnc_op.cut_depth.to_mm())
@@ -1113,77 +1510,71 @@ class GcodeGenerator:
 
             nb_paths = len(cnc_op.cam_paths)  # in use!
 
-            gcode.append("")
-            gcode.append(";")
-            gcode.append(f"; Operation:    {idx+1}")
-            gcode.append(f"; Name:         {cnc_op.name}")
-            gcode.append(f"; Type:         {cnc_op.cam_op}")
-            gcode.append(f"; Paths:        {nb_paths}")
-            gcode.append(f"; Direction:    {cnc_op.direction}")
-            gcode.append(f"; Cut Depth:    {cut_depth}")
+            yield ""
+            yield ";"
+            yield f"; Operation:    {idx+1}"
+            yield f"; Name:         {cnc_op.name}"
+            yield f"; Type:         {cnc_op.cam_op}"
+            yield f"; Paths:        {nb_paths}"
+            yield f"; Direction:    {cnc_op.direction}"
+            yield f"; Cut Depth:    {cut_depth}"
 
             if cnc_op.cam_op == "Helix":
-                gcode.append(f"; Helix Pitch:       {helix_pitch}")
-                gcode.append(f"; Helix Plunge rate:  {helix_plunge_rate}")
+                yield f"; Helix Pitch:       {helix_pitch}"
+                yield f"; Helix Plunge rate:  {helix_plunge_rate}"
             else:
-                gcode.append(f"; Pass Depth:   {passdepth}")
-                gcode.append(f"; Plunge rate:  {plunge_rate}")
+                yield f"; Pass Depth:   {passdepth}"
+                yield f"; Plunge rate:  {plunge_rate}"
 
-            gcode.append(f"; Cut rate:     {cut_rate}")
-            gcode.append(";")
-            gcode.append(";")
+            yield f"; Cut rate:     {cut_rate}"
+            yield ";"
+            yield ";"
 
-            tabs = self.tabs_model.tabs
+            tabs = tabs_index
 
             if cnc_op.cam_op == "Pocket" or cnc_op.cam_op == "Helix":
                 # ignore tabs in pocket op
-                tabs = []
-
-            gcode.extend(
-                cam.get_gcode(
-                    {
-                        "optype": cnc_op.cam_op,
-                        "paths": cnc_op.cam_paths,
-                        "ramp": cnc_op.ramp_plunge,
-                        "x_offset": self.x_offset,
-                        "y_offset": self.y_offset,
-                        "decimal": 3 if self.units == "mm" else 4,
-                        "topZ": topZ,
-                        "botZ": botZ,
-                        "safeZ": safeZ,
-                        "passdepth": passdepth,
-                        "plunge_feed": plunge_rate,
-                        "retract_feed": rapid_rate,
-                        "cut_feed": cut_rate,
-                        "rapid_feed": rapid_rate,
-                        "tool_diameter": tool_diameter,
-                        "helix_outer_radius": cnc_op.width,
-                        "helix_pitch": helix_pitch,
-                        "helix_plunge_rate": helix_plunge_rate,
-                        "tabs": tabs,
-                        "tabZ": tabZ,
-                        "peckZ": peckZ,
-                        "flip_xy": self.flip_xy,
-                    }
-                )
+                tabs = no_tabs_index
+
+            yield from cam.get_gcode(
+                {
+                    "optype": cnc_op.cam_op,
+                    "paths": cnc_op.cam_paths,
+                    "ramp": cnc_op.ramp_plunge,
+                    "x_offset": self.x_offset,
+                    "y_offset": self.y_offset,
+                    "decimal": 3 if self.units == "mm" else 4,
+                    "topZ": topZ,
+                    "botZ": botZ,
+                    "safeZ": safeZ,
+                    "passdepth": passdepth,
+                    "plunge_feed": plunge_rate,
+                    "retract_feed": rapid_rate,
+                    "cut_feed": cut_rate,
+                    "rapid_feed": rapid_rate,
+                    "tool_diameter": tool_diameter,
+                    "helix_outer_radius": cnc_op.width,
+                    "helix_pitch": helix_pitch,
+                    "helix_plunge_rate": helix_plunge_rate,
+                    "tabs": tabs,
+                    "tabZ": tabZ,
+                    "peckZ": peckZ,
+                    "flip_xy": self.flip_xy,
+                }
             )
 
         if self.gcode_model.spindle_control:
-            gcode.append("")
-            gcode.append("; Stop the spindle")
-            gcode.append("M5")
+            yield ""
+            yield "; Stop the spindle"
+            yield "M5"
 
         if self.gcode_model.return_to_zero_at_end:
-            gcode.append("")
-            gcode.append("; Return to 0,0")
-            gcode.append(f"G0 X0 Y0 F{rapid_rate}")
+            yield ""
+            yield "; Return to 0,0"
+            yield f"G0 X0 Y0 F{rapid_rate}"
 
         if self.gcode_model.program_end:
-            gcode.append("")
-            gcode.append("; Program End")
-            gcode.append("M2")
-
-        gcode = "\n".join(gcode)
+            yield ""
+            yield "; Program End"
+            yield "M2"
 
-        self.gcode = gcode
-        self.job.gcode = gcode
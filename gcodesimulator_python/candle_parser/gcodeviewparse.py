@@ -9,14 +9,19 @@
 from functools import singledispatchmethod
 from typing import List
 
+import numpy as np
+
 from PySide6.QtGui import QVector3D
 
 from PySide6 import QtCore
 from PySide6.QtCore import qIsNaN
 
 from gcodeviewer.parser.linesegment import LineSegment
+from gcodeviewer.parser.pointsegment import PointSegment
 from gcodeviewer.parser.gcodeparser import GcodeParser
-from gcodeviewer.parser.gcodepreprocessorutils import GcodePreprocessorUtils
+from gcodesimulator_python.candle_parser.gcodepreprocessorutils import (
+    GcodePreprocessorUtils,
+)
 
 from gcodeviewer.util.util import Util
 from gcodeviewer.util.util import qQNaN
@@ -79,35 +84,32 @@ class GcodeViewParse:
         # For a line segment list ALL arcs must be converted to lines.
         minArcLength = 0.1
 
-        start = None
-        end = None
-
         # Prepare segments indexes
         self.m_lineIndexes = [[] for _ in range(len(psl))]
 
-        lineIndex = 0
-        for segment in psl:
-            ps = segment
-            isMetric = ps.isMetric()
+        # The arcs are expanded for graphics all at once
+        isMetrics = []
+        for ps in psl:
+            isMetrics.append(ps.isMetric())
             ps.convertToMetric()
 
+        arcPoints = iter(
+            self.expandArcs(psl, minArcLength, arcPrecision, arcDegreeMode)
+        )
+
+        start = None
+        end = None
+
+        lineIndex = 0
+        for ps, isMetric in zip(psl, isMetrics):
             end = ps.point()
 
             # start is null for the first iteration.
             if start != None:
                 # Expand arc for graphics.
                 if ps.isArc():
-                    points = GcodePreprocessorUtils.generatePointsAlongArcBDring(
-                        ps.plane(),
-                        start,
-                        end,
-                        ps.center(),
-                        ps.isClockwise(),
-                        ps.getRadius(),
-                        minArcLength,
-                        arcPrecision,
-                        arcDegreeMode,
-                    )
+                    points = next(arcPoints)
+
                     # Create line segments from points.
                     if len(points) > 0:
                         startPoint = start
@@ -186,6 +188,54 @@ class GcodeViewParse:
 
         return self.m_lines
 
+    def expandArcs(
+        self,
+        psl: List[PointSegment],
+        minArcLength: float,
+        arcPrecision: float,
+        arcDegreeMode: bool,
+    ) -> List[List[QVector3D]]:
+        """
+        The points of the arcs of the point segments (the first one is not
+        an arc: it has no start point)
+        """
+        arcs = [
+            (
+                ps.plane().value,
+                *psl[k - 1].point().toTuple(),
+                *ps.point().toTuple(),
+                *ps.center().toTuple(),
+                ps.isClockwise(),
+                ps.getRadius(),
+            )
+            for k, ps in enumerate(psl)
+            if k > 0 and ps.isArc()
+        ]
+        if len(arcs) == 0:
+            return []
+
+        arcs = np.array(arcs, dtype=np.float64)
+
+        points, counts = GcodePreprocessorUtils.generatePointsAlongArcs(
+            arcs[:, 0],
+            arcs[:, 1:4],
+            arcs[:, 4:7],
+            arcs[:, 7:10],
+            arcs[:, 10] != 0,
+            arcs[:, 11],
+            minArcLength,
+            arcPrecision,
+            arcDegreeMode,
+        )
+
+        points = [QVector3D(*point) for point in points.tolist()]
+        offsets = np.cumsum(counts).tolist()
+
+        return [
+            points[offset - count : offset]
+            for offset, count in zip(offsets, counts.tolist())
+        ]
+
     def getLines(self) -> List[LineSegment]:
         return self.m_lines
 
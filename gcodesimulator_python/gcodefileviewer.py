@@ -158,13 +158,9 @@ class GCodeFileViewer(QtWidgets.QPlainTextEdit):
         self.curr_line_no = cursor.blockNumber()
 
         # from the python "miniparser"
-        while self.curr_line_no not in self.miniparser.line_no_time_map and self.curr_line_no > 0:
-            self.curr_line_no -= 1
-
-        if self.curr_line_no == 0:
-            simtime = 0
-        else:
-            simtime = self.miniparser.line_no_time_map[self.curr_line_no]
+        self.curr_line_no, simtime = self.miniparser.get_line_no_time(
+            self.curr_line_no
+        )
 
         self.simulator.set_simtime_from_textbrowser(simtime)
 
@@ -22,13 +22,308 @@ import time
 from typing import List
 from typing import Tuple
 
-from PySide6.QtCore import qIsNaN
-from PySide6.QtGui import QVector3D
-
-from gcodesimulator_python.candle_parser.parser import CandleParser
+import numpy as np
 
 sNaN = float("NaN")
 
+# max angle of the segments of the arcs (G2/G3)
+ARC_SEGMENT_ANGLE = math.pi / 36
+
+# junctions taken as reversals / straight (as grbl)
+JUNCTION_COS_EPSILON = 1e-6
+
+
+def arc_points(
+    x0: float, y0: float, x1: float, y1: float, i: float, j: float, clockwise: bool
+) -> List[Tuple[float, float, float]]:
+    """
+    the points of the arc from (x0, y0) to (x1, y1) - center (x0 + i, y0 + j) -
+    with their fraction of the arc, the end point excluded
+    """
+    cx = x0 + i
+    cy = y0 + j
+    radius = math.hypot(i, j)
+
+    start_angle = math.atan2(y0 - cy, x0 - cx)
+    span = math.atan2(y1 - cy, x1 - cx) - start_angle
+
+    if clockwise:
+        if span >= 0:
+            span -= 2 * math.pi
+    else:
+        if span <= 0:
+            span += 2 * math.pi
+
+    nb_segments = max(1, math.ceil(abs(span) / ARC_SEGMENT_ANGLE))
+
+    points = []
+    for k in range(1, nb_segments):
+        angle = start_angle + span * k / nb_segments
+        points.append(
+            (
+                cx + radius * math.cos(angle),
+                cy + radius * math.sin(angle),
+                k / nb_segments,
+            )
+        )
+
+    return points
+
+
+# the letters of the words the parser knows, as rows of the per line values
+WORD_LETTERS = "GXYZFIJ"
+# the letters also read in lower case
+LOWER_CASE_LETTERS = "GXYZF"
+
+# byte -> index of the word letter, -1 for the other bytes
+LETTER_INDEX = np.full(256, -1, dtype=np.int8)
+for _index, _letter in enumerate(WORD_LETTERS):
+    LETTER_INDEX[ord(_letter)] = _index
+    if _letter in LOWER_CASE_LETTERS:
+        LETTER_INDEX[ord(_letter.lower())] = _index
+
+# bytes of the numbers
+IS_NUMBER_CHAR = np.zeros(256, dtype=bool)
+IS_NUMBER_CHAR[np.frombuffer(b"+-.0123456789", dtype=np.uint8)] = True
+
+
+def scan_words(gcode: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    the words of the gcode, scanned at once with numpy
+
+    returns the letter index, the value (nan when there is no number or an
+    invalid one) and the "line" of each word, plus the gcode line no of each
+    "line" - lines are separated by \\r or \\n, the line nos count the \\n
+    """
+    data = np.frombuffer(gcode.encode(), dtype=np.uint8)
+    padded = np.concatenate([data, [0]]).astype(np.uint8)
+
+    positions = np.flatnonzero(LETTER_INDEX[data] >= 0)
+    letters = LETTER_INDEX[data[positions]]
+
+    # the number of a word: after the letter and its spaces, up to the first
+    # non number character
+    begins = positions + 1
+    spaces = (padded[begins] == ord(" ")) | (padded[begins] == ord("\t"))
+    while spaces.any():
+        begins[spaces] += 1
+        spaces &= (padded[begins] == ord(" ")) | (padded[begins] == ord("\t"))
+
+    is_number = IS_NUMBER_CHAR[padded]
+    run_ends = np.flatnonzero(is_number[:-1] & ~is_number[1:]) + 1
+    ends = begins.copy()
+    with_number = is_number[begins]
+    ends[with_number] = run_ends[
+        np.searchsorted(run_ends, begins[with_number], side="right")
+    ]
+
+    values = np.full(len(positions), np.nan)
+    if with_number.any():
+        # the numbers only, separated by spaces
+        marks = np.zeros(len(padded), dtype=np.int8)
+        marks[begins[with_number]] = 1
+        marks[ends[with_number]] -= 1
+        in_number = np.cumsum(marks, dtype=np.int8)[:-1].astype(bool)
+        numbers = np.where(in_number, data, ord(" ")).astype(np.uint8).tobytes()
+        tokens = numbers.split()
+        try:
+            values[with_number] = np.array(tokens, dtype=float)
+        except ValueError:
+            # some "numbers" are not ("-", "1.2.3"...)
+            values[with_number] = [to_float(token) for token in tokens]
+
+    line_ends = np.flatnonzero((data == ord("\r")) | (data == ord("\n")))
+    word_lines = np.searchsorted(line_ends, positions)
+    line_nos = np.concatenate([[0], np.cumsum(data[line_ends] == ord("\n"))])
+
+    return letters, values, word_lines, line_nos
+
+
+def to_float(token: bytes) -> float:
+    try:
+        return float(token)
+    except ValueError:
+        return sNaN
+
+
+def scan_gcode(
+    gcode: str,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    the path of the moves (G0/G1/G2/G3) of the gcode: x, y, z, feedrate
+    and gcode line no of each point, the arcs as segments
+
+    - the last word of a letter in a line is the one used
+    - a line is a move only with a G0/G1/G2/G3 word
+    - x, y, z, feedrate are modal, their first value applies to the points
+      before it
+    """
+    letters, values, word_lines, line_nos = scan_words(gcode)
+
+    # the values of each letter, per line
+    line_values = np.full((len(WORD_LETTERS), len(line_nos)), np.nan)
+    for index in range(len(WORD_LETTERS)):
+        mask = letters == index
+        line_values[index, word_lines[mask]] = values[mask]
+
+    g, x, y, z, f, arc_i, arc_j = line_values
+
+    moves = np.flatnonzero((g == 0) | (g == 1) | (g == 2) | (g == 3))
+    if len(moves) == 0:
+        empty = np.zeros(0)
+        return empty, empty, empty, empty, np.zeros(0, dtype=int)
+
+    # the modal values at each move, and before it
+    last = np.array([forward_fill(column[moves]) for column in (x, y, z, f)])
+    prev = np.concatenate([np.full((4, 1), np.nan), last[:, :-1]], axis=1)
+    last_x, last_y, last_z, last_f = last
+    prev_x, prev_y, prev_z, _ = prev
+
+    # the arcs, with their intermediate points
+    g = g[moves]
+    arcs = np.flatnonzero(((g == 2) | (g == 3)) & ~np.isnan(prev_x) & ~np.isnan(prev_y))
+    arc_i = np.nan_to_num(arc_i[moves[arcs]])
+    arc_j = np.nan_to_num(arc_j[moves[arcs]])
+
+    arcs_points = [
+        arc_points(
+            prev_x[k], prev_y[k], last_x[k], last_y[k], arc_i[a], arc_j[a], g[k] == 2
+        )
+        for a, k in enumerate(arcs)
+    ]
+
+    counts = np.ones(len(moves), dtype=int)
+    counts[arcs] += np.array([len(points) for points in arcs_points], dtype=int)
+    ends = np.cumsum(counts) - 1
+
+    path = np.empty((4, ends[-1] + 1))
+    path[:, ends] = last
+    for k, points in zip(arcs, arcs_points):
+        if points:
+            ax, ay, coeff = np.array(points).T
+            begin = ends[k] - len(points)
+            path[0, begin : ends[k]] = ax
+            path[1, begin : ends[k]] = ay
+            path[2, begin : ends[k]] = prev_z[k] + coeff * (last_z[k] - prev_z[k])
+            path[3, begin : ends[k]] = last_f[k]
+
+    xs, ys, zs, fs = (backward_fill_start(column) for column in path)
+
+    return xs, ys, zs, fs, np.repeat(line_nos[moves], counts)
+
+
+def forward_fill(values: np.ndarray) -> np.ndarray:
+    """
+    each nan replaced by the last value before it (nan before the first one)
+    """
+    index = np.where(np.isnan(values), 0, np.arange(len(values)))
+    np.maximum.accumulate(index, out=index)
+    return values[index]
+
+
+def backward_fill_start(values: np.ndarray) -> np.ndarray:
+    """
+    the nan before the first value replaced by it
+    """
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) and valid[0] > 0:
+        values = values.copy()
+        values[: valid[0]] = values[valid[0]]
+    return values
+
+
+def segment_times(
+    xs: np.ndarray,
+    ys: np.ndarray,
+    zs: np.ndarray,
+    fs: np.ndarray,
+    acceleration: float = None,
+    junction_deviation: float = 0.01,
+) -> np.ndarray:
+    """
+    the durations (s) of the segments between the points of the path, each one
+    at the feedrate (units per minute) of its end point
+
+    Without acceleration, the feedrates are reached at once. With an
+    acceleration (units per s²) the speed follows a trapezoidal profile on
+    each segment, from a stop at the start of the path to a stop at its end,
+    the speed at the junctions limited by the junction deviation (units) as
+    in grbl's planner.
+    """
+    deltas = np.array([np.diff(xs), np.diff(ys), np.diff(zs)])
+    lengths = np.sqrt((deltas**2).sum(axis=0))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if acceleration is None:
+            return 60 * lengths / fs[1:]
+
+        # the zero length segments take no time and make no junction
+        times = np.zeros(len(lengths))
+        moving = lengths > 0
+        times[moving] = trapezoid_times(
+            deltas[:, moving],
+            lengths[moving],
+            fs[1:][moving] / 60,
+            acceleration,
+            junction_deviation,
+        )
+        return times
+
+
+def trapezoid_times(
+    deltas: np.ndarray,
+    lengths: np.ndarray,
+    speeds: np.ndarray,
+    acceleration: float,
+    junction_deviation: float,
+) -> np.ndarray:
+    """
+    the durations of the successive segments (3 x n deltas, lengths, nominal
+    speeds) with the trapezoidal speed profile
+    """
+    if len(lengths) == 0:
+        return np.zeros(0)
+
+    nominal2 = speeds**2
+
+    # max speed² at the junctions: grbl's junction deviation - a stop on
+    # the reversals, no limit on the straight junctions
+    directions = deltas / lengths
+    cos_theta = -(directions[:, :-1] * directions[:, 1:]).sum(axis=0)
+    sin_half_theta = np.sqrt(0.5 * (1 - np.clip(cos_theta, -1, 1)))
+    junctions = (
+        acceleration * junction_deviation * sin_half_theta / (1 - sin_half_theta)
+    )
+    junctions[cos_theta > 1 - JUNCTION_COS_EPSILON] = 0.0
+    junctions[cos_theta < -1 + JUNCTION_COS_EPSILON] = np.inf
+    junctions = np.minimum(junctions, np.minimum(nominal2[:-1], nominal2[1:]))
+
+    # the speed² at the nodes (segment ends) - stopped at both path ends
+    limits = np.concatenate([[0.0], junctions, [0.0]])
+
+    # the speed² can change by at most 2 * a * length on a segment: the
+    # backward (deceleration) and forward (acceleration) passes of a planner
+    # are min-plus scans, running minimums over the prefix sums
+    doubled = 2 * acceleration * lengths
+    prefix = np.concatenate([[0.0], np.cumsum(doubled)])
+
+    backward = np.minimum.accumulate((limits + prefix)[::-1])[::-1] - prefix
+    node_speeds2 = np.minimum.accumulate(backward - prefix) + prefix
+    node_speeds2 = np.maximum(node_speeds2, 0)
+
+    entry2 = node_speeds2[:-1]
+    exit2 = node_speeds2[1:]
+
+    cruise = lengths - (2 * nominal2 - entry2 - exit2) / (2 * acceleration)
+    # triangle profile when the nominal speed is not reached
+    peak = np.where(
+        cruise >= 0, speeds, np.sqrt(np.maximum((doubled + entry2 + exit2) / 2, 0))
+    )
+
+    ramps = (2 * peak - np.sqrt(entry2) - np.sqrt(exit2)) / acceleration
+
+    return ramps + np.maximum(cruise, 0) / speeds
+
 
 def qQNaN():
     return float("NaN")
@@ -37,13 +332,17 @@ def qQNaN():
 class GcodeAtomicMvt:
     """ """
 
-    def __init__(self, pos: QVector3D, feedrate: float):
+    def __init__(self, pos: "QVector3D", feedrate: float):
         self.at_time = None
         self.pos = pos
         self.feedrate = feedrate  # mm per minutes or inches per minutes
 
     @classmethod
-    def interpolate(cls, coeff: float, pos1: QVector3D, pos2: QVector3D) -> QVector3D:
+    def interpolate(
+        cls, coeff: float, pos1: "QVector3D", pos2: "QVector3D"
+    ) -> "QVector3D":
+        from PySide6.QtGui import QVector3D
+
         x = pos1.x() + coeff * (pos2.x() - pos1.x())
         y = pos1.y() + coeff * (pos2.y() - pos1.y())
         z = pos1.z() + coeff * (pos2.z() - pos1.z())
@@ -60,17 +359,30 @@ class GcodeAtomicMvt:
 class GcodeMiniParser:
     """
     Basic parser **only** for pycut generated gcode...
+
+    The path is kept as arrays (xs, ys, zs, fs, line_nos, times), one item
+    per point; the GcodeAtomicMvt list ("path") is only made on demand.
     """
 
-    def __init__(self):
-        """ """
+    def __init__(self, acceleration: float = None, junction_deviation: float = 0.01):
+        """
+        acceleration (units per s²): None for the feedrates reached at once,
+        see segment_times
+        """
         self.gcode = ""
 
-        self.char_no = 0  # index of the character in the whole gcode text
-        self.line_no = 0  # related line no in the whole gcode text
+        self.acceleration = acceleration
+        self.junction_deviation = junction_deviation
+
+        self.xs = np.zeros(0)
+        self.ys = np.zeros(0)
+        self.zs = np.zeros(0)
+        self.fs = np.zeros(0)  # feedrates
+        self.line_nos = np.zeros(0, dtype=int)  # gcode line no of each point
+        self.times = np.zeros(0)  # sim time at each point
 
-        self.path: List[GcodeAtomicMvt] = []
-        self.path_time_map: List[float] = []  # idx -> time
+        self._path: List[GcodeAtomicMvt] = None
+        self.path_time_map = np.zeros(0)  # idx -> time
 
         self.path_time = 0  # in seconds
 
@@ -78,17 +390,60 @@ class GcodeMiniParser:
         self.path_idx_line_no = {}  # map path "index" -> gcode line no
         self.line_no_time_map = {}  # map gcode line no -> sim time
 
+        # the gcode given by chunks: their paths, the number of lines so far
+        # and the modal x, y, z, feedrate at the end of the last chunk
+        self.chunks_paths: List[Tuple[np.ndarray, ...]] = []
+        self.chunks_nb_lines = 0
+        self.chunks_modal = [math.nan] * 4
+
     def reset(self):
         """ """
-        self.char_no = 0
-        self.line_no = 0
-
-        self.path = []
+        self.set_path(np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0))
         self.path_time = 0
 
-        self.path_idx_line_no = {}
         self.line_no_time_map = {}
 
+        self.chunks_paths = []
+        self.chunks_nb_lines = 0
+        self.chunks_modal = [math.nan] * 4
+
+    def set_path(
+        self,
+        xs: np.ndarray,
+        ys: np.ndarray,
+        zs: np.ndarray,
+        fs: np.ndarray,
+        line_nos: np.ndarray,
+    ):
+        """ """
+        self.xs = np.asarray(xs, dtype=float)
+        self.ys = np.asarray(ys, dtype=float)
+        self.zs = np.asarray(zs, dtype=float)
+        self.fs = np.asarray(fs, dtype=float)
+        self.line_nos = np.asarray(line_nos, dtype=int)
+        self.times = np.zeros(len(self.xs))
+
+        self._path = None
+        self.path_idx_line_no = dict(enumerate(self.line_nos.tolist()))
+
+    @property
+    def path(self) -> List[GcodeAtomicMvt]:
+        if self._path is None:
+            from PySide6.QtGui import QVector3D
+
+            self._path = []
+            for x, y, z, f, at_time in zip(
+                self.xs.tolist(),
+                self.ys.tolist(),
+                self.zs.tolist(),
+                self.fs.tolist(),
+                self.times.tolist(),
+            ):
+                mvt = GcodeAtomicMvt(QVector3D(x, y, z), f)
+                mvt.at_time = at_time
+                self._path.append(mvt)
+        return self._path
+
     def get_path(self) -> List[GcodeAtomicMvt]:
         return self.path
 
@@ -100,146 +455,80 @@ class GcodeMiniParser:
         self.reset()
         self.gcode = gcode
 
-        lastX = sNaN
-        lastY = sNaN
-        lastZ = sNaN
-        lastF = sNaN
-
-        def parse() -> float:
-            self.char_no += 1
-            while self.char_no < len(self.gcode) and (
-                self.gcode[self.char_no] == " " or self.gcode[self.char_no] == "\t"
-            ):
-                self.char_no += 1
-            begin = self.char_no
-            while (
-                self.char_no < len(self.gcode)
-                and self.gcode[self.char_no] in "+-.0123456789"
-            ):
-                self.char_no += 1
-            try:
-                end = self.char_no
-                return float(self.gcode[begin:end])
-            except Exception:
-                return None
-
-        self.char_no = 0
-        self.line_no = 0
-
-        while self.char_no < len(self.gcode):
-            g = sNaN
-            x = sNaN
-            y = sNaN
-            z = sNaN
-            f = sNaN
-
-            while (
-                self.char_no < len(self.gcode)
-                and self.gcode[self.char_no] != ""
-                and self.gcode[self.char_no] != "\r"
-                and self.gcode[self.char_no] != "\n"
-            ):
-                letter = self.gcode[self.char_no]
-                if letter == "G" or letter == "g":
-                    g = parse()
-                elif letter == "X" or letter == "x":
-                    x = parse()
-                elif letter == "Y" or letter == "y":
-                    y = parse()
-                elif letter == "Z" or letter == "z":
-                    z = parse()
-                elif letter == "F" or letter == "f":
-                    f = parse()
-                else:
-                    self.char_no += 1
-
-            if g == 0 or g == 1:
-                if not qIsNaN(x):
-                    if qIsNaN(lastX):
-                        for j in range(len(self.path)):
-                            self.path[j].pos.setX(x)
-                    lastX = x
-
-                if not qIsNaN(y):
-                    if qIsNaN(lastY):
-                        for j in range(len(self.path)):
-                            self.path[j].pos.setY(y)
-                    lastY = y
-
-                if not qIsNaN(z):
-                    if qIsNaN(lastZ):
-                        for j in range(len(self.path)):
-                            self.path[j].pos.setZ(z)
-                    lastZ = z
-
-                if not qIsNaN(f):
-                    if qIsNaN(lastF):
-                        for j in range(len(self.path)):
-                            self.path[j].feedrate = f
-                    lastF = f
-
-                self.path.append(GcodeAtomicMvt(QVector3D(lastX, lastY, lastZ), lastF))
-                self.path_idx_line_no[len(self.path) - 1] = self.line_no
-
-            while (
-                self.char_no < len(self.gcode)
-                and self.gcode[self.char_no] != "\r"
-                and self.gcode[self.char_no] != "\n"
-            ):
-                self.char_no += 1
-            while self.char_no < len(self.gcode) and (
-                self.gcode[self.char_no] == "\r" or self.gcode[self.char_no] == "\n"
-            ):
-                if self.gcode[self.char_no] == "\n":
-                    self.line_no += 1
-                self.char_no += 1
+        self.set_path(*scan_gcode(gcode))
 
         # last thing
         self.eval_path_time()
 
-    def eval_path_time(self) -> float:
-        """ """
-        self.path_time_map = []
-        self.line_no_time_map = {}
-
-        total_time = 0.0
-
-        self.path[0].at_time = 0.0
-
-        for idx, mvt in enumerate(self.path):
-            if idx == 0:
-                continue
+    def parse_gcode_chunk(self, lines: List[str]):
+        """
+        the next lines of the gcode, as they are generated (see
+        GcodeGenerator on_chunk) - the path is complete after end_gcode_chunks
 
-            prev_idx = idx - 1
-            prev_mvt = self.path[prev_idx]
+        The chunk is scanned after a move to the modal position and feedrate
+        of the previous chunks, whose point is dropped: same path as
+        parse_gcode on the whole text
+        """
+        words = [
+            letter + np.format_float_positional(value)
+            for letter, value in zip("XYZF", self.chunks_modal)
+            if not math.isnan(value)
+        ]
+        text = "\n".join(lines)
 
-            f = mvt.feedrate
+        xs, ys, zs, fs, line_nos = scan_gcode(" ".join(["G1"] + words) + "\n" + text)
 
-            dist = mvt.pos.distanceToPoint(prev_mvt.pos)
+        # the line nos without the modal move line
+        line_nos += self.chunks_nb_lines - 1
+        self.chunks_nb_lines += text.count("\n") + 1
 
-            total_time = total_time + 60 * dist / f
+        self.chunks_paths.append((xs[1:], ys[1:], zs[1:], fs[1:], line_nos[1:]))
+        if len(xs) > 1:
+            self.chunks_modal = [xs[-1], ys[-1], zs[-1], fs[-1]]
 
-            # ------------------------------------------
-            # fill self.line_no_time_map
-            # ------------------------------------------
-            if idx in self.path_idx_line_no:
-                line_no = self.path_idx_line_no[idx]
-            else:
-                idx0 = idx
-                while True:
-                    idx0 = idx0 - 1
-                    if idx0 in self.path_idx_line_no:
-                        line_no = self.path_idx_line_no[idx0]
-                        break
-            # ------------------------------------------
-            self.line_no_time_map[line_no] = total_time
-            # ------------------------------------------
-            self.path_time_map.append(total_time)
-            # ------------------------------------------
+    def end_gcode_chunks(self):
+        """
+        the path and its time, once all the chunks are parsed
+        """
+        if self.chunks_paths:
+            xs, ys, zs, fs, line_nos = (
+                np.concatenate(columns) for columns in zip(*self.chunks_paths)
+            )
+            self.set_path(
+                *(backward_fill_start(column) for column in (xs, ys, zs, fs)), line_nos
+            )
+            self.chunks_paths = []
 
-            mvt.at_time = total_time
+        self.eval_path_time()
 
-        self.path_time = total_time
+    def eval_path_time(self) -> float:
+        """ """
+        if len(self.xs) == 0:
+            self.path_time_map = np.zeros(0)
+            self.line_no_time_map = {}
+            self.path_time = 0
+            return self.path_time
+
+        self.path_time_map = np.cumsum(
+            segment_times(
+                self.xs,
+                self.ys,
+                self.zs,
+                self.fs,
+                self.acceleration,
+                self.junction_deviation,
+            )
+        )
+
+        self.times = np.concatenate([[0.0], self.path_time_map])
+        self._path = None
+
+        # the last time of each line no wins
+        self.line_no_time_map = dict(
+            zip(self.line_nos[1:].tolist(), self.path_time_map.tolist())
+        )
+
+        self.path_time = float(self.times[-1])
 
         return self.path_time
 
@@ -247,30 +536,34 @@ class GcodeMiniParser:
         if atime == 0:
             return 0
 
-        begin = 0
-        end = len(self.path)
+        return int(np.searchsorted(self.times, atime, side="left"))
 
-        while begin < end:
-            i = math.floor((begin + end) / 2)
-            if self.path[i].at_time < atime:
-                begin = i + 1
-            else:
-                end = i
+    def get_line_no_time(self, line_no: int) -> Tuple[int, float]:
+        """
+        the last line no <= line_no with a move and its (last) sim time,
+        (0, 0) when there is none
+        """
+        k = int(np.searchsorted(self.line_nos[1:], line_no, side="right"))
+        if k == 0:
+            return 0, 0.0
 
-        return end
+        return int(self.line_nos[k]), float(self.path_time_map[k - 1])
 
     def parse_gcode_use_candle_parser(self, gcode: str):
         """
         candle "linesegment"  has a src and target point
         and the speed is the speed between these 2 points
         """
+        from gcodesimulator_python.candle_parser.parser import CandleParser
+
         candle_parser = CandleParser("")
         candle_parser.loadData(gcode.split("\n"))
 
         self.reset()
         self.gcode = gcode
 
-        is_first = True
+        points = []
+        line_nos = []
 
         def get_lineno_for_directiveno(no: int):
             while no not in candle_parser.lineno2filelineno:
@@ -288,30 +581,21 @@ class GcodeMiniParser:
                 y = first.y()
                 z = first.z()
 
-                if qIsNaN(x) or qIsNaN(y) or qIsNaN(z):
+                if math.isnan(x) or math.isnan(y) or math.isnan(z):
                     continue
 
-                if is_first:
-                    # go to this first point
-                    mvt = GcodeAtomicMvt(first, 100000)
-                    self.path.append(mvt)
-
-                    no = ls.m_lineNumber
-                    # self.path_idx_line_no[len(self.path)-1] = ls.m_lineNumber
-                    self.path_idx_line_no[len(self.path) - 1] = (
-                        get_lineno_for_directiveno(no)
-                    )
+                no = ls.m_lineNumber
 
-                    is_first = False
+                if not points:
+                    # go to this first point
+                    points.append((x, y, z, 100000))
+                    line_nos.append(get_lineno_for_directiveno(no))
 
-                mvt = GcodeAtomicMvt(pt, feedrate)
-                self.path.append(mvt)
+                points.append((pt.x(), pt.y(), pt.z(), feedrate))
+                line_nos.append(get_lineno_for_directiveno(no))
 
-                no = ls.m_lineNumber
-                # self.path_idx_line_no[len(self.path)-1] = no
-                self.path_idx_line_no[len(self.path) - 1] = get_lineno_for_directiveno(
-                    no
-                )
+        xs, ys, zs, fs = np.array(points, dtype=float).reshape(-1, 4).T
+        self.set_path(xs, ys, zs, fs, line_nos)
 
         # last thing
         self.eval_path_time()
@@ -319,13 +603,15 @@ class GcodeMiniParser:
 
 if __name__ == "__main__":
     gcodefile = sys.argv[1]
+    # optional: acceleration (units per s²)
+    acceleration = float(sys.argv[2]) if len(sys.argv) > 2 else None
 
     fp = open(gcodefile, "r")
     gcode = fp.read()
     fp.close()
 
     t1 = time.time()
-    parser = GcodeMiniParser()
+    parser = GcodeMiniParser(acceleration)
     parser.parse_gcode(gcode)
     t2 = time.time()
 
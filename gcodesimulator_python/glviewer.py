@@ -35,8 +35,10 @@ from OpenGL import GL
 
 from PySide6.QtUiTools import QUiLoader
 
-from gcodesimulator_python.gcodeminiparser import GcodeAtomicMvt
 from gcodesimulator_python.gcodeminiparser import GcodeMiniParser
+from gcodesimulator_python.vertexbuffer import make_path_buffer
+from gcodesimulator_python.vertexbuffer import path_buffer_key
+from gcodesimulator_python.vertexbuffer import PathBufferCache
 
 from gcodesimulator_python.gcodefileviewer import GCodeFileViewer
 
@@ -141,20 +143,12 @@ def make_scene_numba(resolution) -> np.array:
 
 
 class Scene:
-    class VertexData:
-        # NB_FLOATS_PER_VERTEX = 12
-        NB_FLOATS_PER_VERTEX = 9
-
-        def __init__(self):
-            self.pos1 = QVector3D()
-            self.pos2 = QVector3D()
-
-            self.startTime = sNaN
-            self.endTime = sNaN
-            self.command = sNaN
+    # the disk cache of the path buffers - None: no cache
+    cache: PathBufferCache = None
 
-            # VBit
-            # self.rawPos = QVector3D()
+    @classmethod
+    def set_cache_dir(cls, cache_dir: str):
+        cls.cache = PathBufferCache(cache_dir) if cache_dir else None
 
     def __init__(
         self,
@@ -166,12 +160,8 @@ class Scene:
     ):
         """ """
         self.gcode = gcode
-        self.parser = GcodeMiniParser()
-
-        if useCandleParser == False:
-            self.parser.parse_gcode(self.gcode)
-        else:
-            self.parser.parse_gcode_use_candle_parser(self.gcode)
+        self.useCandleParser = useCandleParser
+        self.parser = None  # only when the path buffer is not in the cache
 
         self.topZ = 0.0
         self.cutterDiameter = cutterDiameter
@@ -192,318 +182,70 @@ class Scene:
         self.pathScale = 0.0
         self.pathMinZ = 0.0
 
-        # make a scene
-        self.vertices: List[Scene.VertexData] = self.make_scene()
-
-        self.array = None  # all vertices as np float array
-        # fill the numpy array from the scene ("path") and gets its buffer
-        self.pathBufferContent = self.make_buffer()
-
-    def make_scene(self):
-        vertices: List[Scene.VertexData] = []
+        # all vertices as np float32 array (memory mapped from the cache)
+        self.array = self.make_scene()
 
-        # fill the numpy array - each vertex is composed of 9 float
+    def make_scene(self) -> np.ndarray:
         startTime = time.time()
 
-        pathTopZ = self.topZ
-        cutterDia = self.cutterDiameter
         if self.cutterAngle <= 0 or self.cutterAngle > 180:
             self.cutterAngle = 180
-        cutterAngleRad = self.cutterAngle * math.pi / 180
-        self.isVBit = isVBit = self.cutterAngle < 180
-        cutterH = self.cutterHeight
-
-        inputStride = 4
-
-        self.pathNumPoints = len(self.parser.path)
+        self.isVBit = self.cutterAngle < 180
 
-        numHalfCircleSegments = 5
+        key = path_buffer_key(self.gcode, self.cutterAngle, self.useCandleParser)
 
-        if isVBit:
-            self.pathStride = 12
-            self.pathVertexesPerLine = 12 + numHalfCircleSegments * 6
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            array, infos = cached
         else:
-            self.pathStride = 9
-            self.pathVertexesPerLine = 18
-
-        self.pathNumVertexes = self.pathNumPoints * self.pathVertexesPerLine
-        # self.pathBufferContent = bufferContent = np.empty(self.pathNumVertexes, dtype=np.float32)
-
-        path = self.parser.path
-
-        minX = path[0].pos.x()
-        maxX = path[0].pos.x()
-        minY = path[0].pos.y()
-        maxY = path[0].pos.y()
-        minZ = path[0].pos.z()
-
-        total_time = 0
-        for idx, point in enumerate(path):
-            prevIdx = max(idx - 1, 0)
-            prevPoint = path[prevIdx]
-
-            x = point.pos.x()
-            y = point.pos.y()
-            z = point.pos.z()
-            feedrate = point.feedrate
-
-            prevX = prevPoint.pos.x()
-            prevY = prevPoint.pos.y()
-            prevZ = prevPoint.pos.z()
-
-            dist = math.sqrt(
-                (x - prevX) * (x - prevX)
-                + (y - prevY) * (y - prevY)
-                + (z - prevZ) * (z - prevZ)
-            )
-            beginTime = total_time
-            total_time = total_time + dist / feedrate * 60
-
-            minX = min(minX, x)
-            maxX = max(maxX, x)
-            minY = min(minY, y)
-            maxY = max(maxY, y)
-            minZ = min(minZ, z)
-
-            if isVBit:
-                coneHeight = -min(z, prevZ, 0) + 0.1
-                coneDia = (
-                    coneHeight
-                    * 2
-                    * math.sin(cutterAngleRad / 2)
-                    / math.cos(cutterAngleRad / 2)
-                )
-
-                if x == prevX and y == prevY:
-                    rotAngle = 0
-                else:
-                    rotAngle = math.atan2(y - prevY, x - prevX)
-
-                xyDist = math.sqrt(
-                    (x - prevX) * (x - prevX) + (y - prevY) * (y - prevY)
-                )
-
-                # --------------------------------------------------------------------------------------------------
-                def f(command, rawX, rawY, rawZ, rotCos, rotSin, zOffset=None):
-                    if zOffset is None:
-                        zOffset = 0
-
-                    vertex = Scene.VertexData()
-                    vertex.pos1 = QVector3D(prevX, prevY, prevZ + zOffset)
-                    vertex.pos2 = QVector3D(x, y, z + zOffset)
-                    vertex.startTime = beginTime
-                    vertex.endTime = total_time
-                    vertex.command = command
-
-                    if isVBit:
-                        vertex.rawPos = QVector3D(
-                            rawX * rotCos - rawY * rotSin,
-                            rawY * rotCos + rawX * rotSin,
-                            rawZ,
-                        )
-
-                    vertices.append(vertex)
-
-                # --------------------------------------------------------------------------------------------------
-
-                if math.abs(z - prevZ) >= xyDist * math.pi / 2 * math.cos(
-                    cutterAngleRad / 2
-                ) / math.sin(cutterAngleRad / 2):
-                    # console.log("plunge or retract")
-                    # plunge or retract
-                    index = 0
-
-                    command = 100 if prevZ < z else 101
-                    for circleIndex in range(1, numHalfCircleSegments * 2):
-                        a1 = 2 * math.pi * circleIndex / numHalfCircleSegments / 2
-                        a2 = 2 * math.pi * (circleIndex + 1) / numHalfCircleSegments / 2
-                        f(
-                            command,
-                            coneDia / 2 * math.cos(a2),
-                            coneDia / 2 * math.sin(a2),
-                            coneHeight,
-                            1,
-                            0,
-                        )
-                        index += 1
-                        f(command, 0, 0, 0, 1, 0)
-                        index += 1
-                        f(
-                            command,
-                            coneDia / 2 * math.cos(a1),
-                            coneDia / 2 * math.sin(a1),
-                            coneHeight,
-                            1,
-                            0,
-                        )
-                        index += 1
-
-                    while index < self.pathVertexesPerLine:
-                        f(200, 0, 0, 0, 1, 0)
-                        index += 1
-
-                else:
-                    # cut
-                    planeContactAngle = math.asin(
-                        (prevZ - z)
-                        / xyDist
-                        * math.sin(cutterAngleRad / 2)
-                        / math.cos(cutterAngleRad / 2)
-                    )
-
-                    index = 0
-                    if True:
-                        f(
-                            100,
-                            0,
-                            -coneDia / 2,
-                            coneHeight,
-                            math.cos(rotAngle - planeContactAngle),
-                            math.sin(rotAngle - planeContactAngle),
-                        )
-                        f(
-                            101,
-                            0,
-                            -coneDia / 2,
-                            coneHeight,
-                            math.cos(rotAngle - planeContactAngle),
-                            math.sin(rotAngle - planeContactAngle),
-                        )
-                        f(100, 0, 0, 0, 1, 0)
-                        f(100, 0, 0, 0, 1, 0)
-                        f(
-                            101,
-                            0,
-                            -coneDia / 2,
-                            coneHeight,
-                            math.cos(rotAngle - planeContactAngle),
-                            math.sin(rotAngle - planeContactAngle),
-                        )
-                        f(101, 0, 0, 0, 1, 0)
-                        f(100, 0, 0, 0, 1, 0)
-                        f(101, 0, 0, 0, 1, 0)
-                        f(
-                            100,
-                            0,
-                            coneDia / 2,
-                            coneHeight,
-                            math.cos(rotAngle + planeContactAngle),
-                            math.sin(rotAngle + planeContactAngle),
-                        )
-                        f(
-                            100,
-                            0,
-                            coneDia / 2,
-                            coneHeight,
-                            math.cos(rotAngle + planeContactAngle),
-                            math.sin(rotAngle + planeContactAngle),
-                        )
-                        f(101, 0, 0, 0, 1, 0)
-                        f(
-                            101,
-                            0,
-                            coneDia / 2,
-                            coneHeight,
-                            math.cos(rotAngle + planeContactAngle),
-                            math.sin(rotAngle + planeContactAngle),
-                        )
-
-                        index += 12
-
-                    startAngle = rotAngle + math.pi / 2 - planeContactAngle
-                    endAngle = rotAngle + 3 * math.pi / 2 + planeContactAngle
-                    for circleIndex in range(1, numHalfCircleSegments):
-                        a1 = startAngle + circleIndex / numHalfCircleSegments * (
-                            endAngle - startAngle
-                        )
-                        a2 = startAngle + (circleIndex + 1) / numHalfCircleSegments * (
-                            endAngle - startAngle
-                        )
-                        # console.log("a1,a2: " + (a1 * 180 / math.pi) + ", " + (a2 * 180 / math.pi))
-
-                        f(
-                            100,
-                            coneDia / 2 * math.cos(a2),
-                            coneDia / 2 * math.sin(a2),
-                            coneHeight,
-                            1,
-                            0,
-                        )
-                        f(100, 0, 0, 0, 1, 0)
-                        f(
-                            100,
-                            coneDia / 2 * math.cos(a1),
-                            coneDia / 2 * math.sin(a1),
-                            coneHeight,
-                            1,
-                            0,
-                        )
-                        f(
-                            101,
-                            coneDia / 2 * math.cos(a2 + math.pi),
-                            coneDia / 2 * math.sin(a2 + math.pi),
-                            coneHeight,
-                            1,
-                            0,
-                        )
-                        f(101, 0, 0, 0, 1, 0)
-                        f(
-                            101,
-                            coneDia / 2 * math.cos(a1 + math.pi),
-                            coneDia / 2 * math.sin(a1 + math.pi),
-                            coneHeight,
-                            1,
-                            0,
-                        )
-
-                        index += 16
-
+            self.parser = GcodeMiniParser()
+            if self.useCandleParser == False:
+                self.parser.parse_gcode(self.gcode)
             else:
-                for virtex in range(self.pathVertexesPerLine):
-                    vertex = Scene.VertexData()
-                    vertex.pos1 = QVector3D(prevX, prevY, prevZ)
-                    vertex.pos2 = QVector3D(x, y, z)
-                    vertex.startTime = beginTime
-                    vertex.endTime = total_time
-                    vertex.command = virtex
+                self.parser.parse_gcode_use_candle_parser(self.gcode)
+
+            array, infos = make_path_buffer(
+                self.parser.xs,
+                self.parser.ys,
+                self.parser.zs,
+                self.parser.fs,
+                self.cutterAngle,
+            )
+            if self.cache is not None:
+                self.cache.put(key, array, infos)
 
-                    vertices.append(vertex)
+        self.pathStride = infos["stride"]
+        self.pathVertexesPerLine = infos["vertexes_per_line"]
+        self.pathNumPoints = infos["num_points"]
+        self.pathNumVertexes = self.pathNumPoints * self.pathVertexesPerLine
 
-        self.totalTime = total_time
+        self.totalTime = infos["total_time"]
 
-        self.pathXOffset = -(minX + maxX) / 2
-        self.pathYOffset = -(minY + maxY) / 2
-        size = max(maxX - minX + 4 * cutterDia, maxY - minY + 4 * cutterDia)
+        cutterDia = self.cutterDiameter
+        self.pathXOffset = -(infos["min_x"] + infos["max_x"]) / 2
+        self.pathYOffset = -(infos["min_y"] + infos["max_y"]) / 2
+        size = max(
+            infos["max_x"] - infos["min_x"] + 4 * cutterDia,
+            infos["max_y"] - infos["min_y"] + 4 * cutterDia,
+        )
         self.pathScale = 2 / size
-        self.pathMinZ = minZ
-
-        return vertices
-
-    def make_buffer(self):
-        self.array = np.empty(
-            len(self.vertices) * Scene.VertexData.NB_FLOATS_PER_VERTEX, dtype=np.float32
+        self.pathMinZ = infos["min_z"]
+
+        print(
+            "path buffer: %d points, %.1f MB%s in %.2f s"
+            % (
+                self.pathNumPoints,
+                array.nbytes / 1024 / 1024,
+                " (cache)" if cached is not None else "",
+                time.time() - startTime,
+            )
         )
 
-        for k, vertex in enumerate(self.vertices):
-            self.array[9 * k + 0] = vertex.pos1.x()
-            self.array[9 * k + 1] = vertex.pos1.y()
-            self.array[9 * k + 2] = vertex.pos1.z()
-            self.array[9 * k + 3] = vertex.pos2.x()
-            self.array[9 * k + 4] = vertex.pos2.y()
-            self.array[9 * k + 5] = vertex.pos2.z()
-            self.array[9 * k + 6] = vertex.startTime
-            self.array[9 * k + 7] = vertex.endTime
-            self.array[9 * k + 8] = float(vertex.command)
-
-        return self.array.tobytes()
+        return array
 
     def buffer_size(self) -> int:
         """in bytes"""
-        return (
-            len(self.vertices)
-            * Scene.VertexData.NB_FLOATS_PER_VERTEX
-            * np.float32().itemsize
-        )
+        return self.array.nbytes
 
 
 class SceneHeightMap:
@@ -899,7 +641,7 @@ class Drawable:
         self.commandLocation = self.program_path.attributeLocation("command")
         self.rawPosLocation = self.program_path.attributeLocation("rawPos")
 
-        stride = Scene.VertexData.NB_FLOATS_PER_VERTEX * np.float32().itemsize
+        stride = self.scene.pathStride * np.float32().itemsize
 
         self.program_path.setAttributeBuffer(
             self.pos1Location, GL.GL_FLOAT, 0, 3, stride
@@ -926,9 +668,11 @@ class Drawable:
         )
         self.program_path.enableAttributeArray(self.commandLocation)
 
-        # if self.isVBit:
-        #    self.program_path.setAttributeBuffer(self.rawPosLocation, GL.GL_FLOAT,   9* np.float32().itemsize, 3, stride)
-        #    self.program_path.enableAttributeArray(self.rawPosLocation)
+        if self.isVBit:
+            self.program_path.setAttributeBuffer(
+                self.rawPosLocation, GL.GL_FLOAT, 9 * np.float32().itemsize, 3, stride
+            )
+            self.program_path.enableAttributeArray(self.rawPosLocation)
 
         # self.vbo_path.release()
 
@@ -1003,24 +747,11 @@ class Drawable:
             start = lastTriangle * self.scene.pathStride * 3  # in float
             length = n * self.scene.pathStride * 3  # in float
 
-            array_window = self.scene.array[start : start + length]
-
-            """
-            for k, vertexdata in enumerate(self.scene.vertices):
-                print(f"{k} -> pos 1 = {vertexdata.pos1}")
-                print(f"{k} -> pos 2 = {vertexdata.pos2}")
-                print(f"{k} -> start/end time 2 = {vertexdata.startTime} - {vertexdata.endTime}")
-                print(f"{k} -> command = {vertexdata.command}")
-            """
-
-            """for k in range(array_window.size):
-                print(f"{k} -> byte = {array_window[k]}")
-            """
+            # a view on the buffer, no copy
+            array_window = memoryview(self.scene.array[start : start + length])
 
             # PROTO write(offset, data, size) all in bytes
-            self.vbo_path.write(
-                0, array_window.tobytes(), array_window.size * np.float32().itemsize
-            )
+            self.vbo_path.write(0, array_window, array_window.nbytes)
 
             # draw
             gl.glDrawArrays(GL.GL_TRIANGLES, 0, n * 3)  # n*3 "strides"
@@ -0,0 +1,463 @@
+# This file is part of pycut.
+#
+# pycut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pycut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pycut.  If not, see <http:#www.gnu.org/licenses/>.
+
+"""
+Material removal simulation on the CPU: the height map of the stock after
+the cutter swept the path of a GcodeMiniParser - no OpenGL needed.
+
+Same model as the path rasterization of the OpenGL simulator (glviewer.py):
+- the grid is the square the path fits in, with a 2 cutter diameters margin
+- a flat cutter is a disc moving along the segments
+- a V-bit (cutter angle < 180) is a cone, as wide as it is deep in the stock
+- the height map is the lowest height reached at each point, up to the top
+  of the stock (z = 0), before "stop_at_time"
+
+The grid is computed in bands of rows, each band in square tiles where the
+segments near the tile are swept all at once with numpy.
+"""
+
+import sys
+import math
+import time
+import argparse
+import multiprocessing
+import concurrent.futures
+
+from typing import Any
+from typing import Dict
+from typing import Tuple
+
+import numpy as np
+
+from gcodesimulator_python.gcodeminiparser import GcodeMiniParser
+
+
+# tile size (pixels): a power of 2 about half the cutter radius, in this
+# range - a band of the grid is a row of tiles, in blocks
+MIN_TILE_SIZE = 8
+MAX_TILE_SIZE = 64
+TILES_PER_BLOCK = 8
+
+# max number of (segment, pixel) pairs evaluated at once
+BATCH_SIZE = 1 << 20
+
+# segment arrays columns
+X1, Y1, Z1, X2, Y2, Z2, RADIUS = range(7)
+
+
+def swept_heights(
+    segments: np.ndarray, px: np.ndarray, py: np.ndarray, slope: float
+) -> np.ndarray:
+    """
+    the lowest height of the cutter tip sweeping each segment, at each point
+    (inf where the cutter does not reach the point)
+
+    slope: height of the cutter profile per unit of radius (0: flat cutter)
+
+    Along a segment, the height of the cutter profile at a point is
+        z(t) + slope * distance(point, xy(t))
+    convex in t: its minimum over the part of the segment within the cutter
+    radius of the point is its unconstrained minimum clamped to this part.
+    """
+    x1, y1, z1, x2, y2, z2, radius = (segments[:, k, None] for k in range(7))
+
+    dx = x2 - x1
+    dy = y2 - y1
+    dz = z2 - z1
+    length2 = dx * dx + dy * dy
+    moving = length2 > 0
+    safe_length2 = np.where(moving, length2, 1.0)
+    safe_length = np.sqrt(safe_length2)
+
+    ex = px - x1
+    ey = py - y1
+
+    # projection of the point on the segment, and squared distance to the line
+    t0 = np.where(moving, (ex * dx + ey * dy) / safe_length2, 0.0)
+    h2 = np.maximum(ex * ex + ey * ey - t0 * t0 * length2, 0.0)
+
+    # part of the segment within the cutter radius of the point
+    r2 = radius * radius
+    half_width = np.where(
+        moving, np.sqrt(np.maximum(r2 - h2, 0.0) / safe_length2), np.inf
+    )
+    t_lo = np.maximum(t0 - half_width, 0.0)
+    t_hi = np.minimum(t0 + half_width, 1.0)
+    reached = (h2 <= r2) & (t_lo <= t_hi)
+
+    # unconstrained minimum: where the cutter profile slope balances dz,
+    # else at the lowest end
+    t_lowest = np.where(dz < 0, 1.0, 0.0)
+    if slope > 0:
+        balance = -dz / (slope * safe_length)
+        balanced = moving & (np.abs(balance) < 1)
+        balance = np.where(balanced, balance, 0.0)
+        t_balanced = t0 + balance * np.sqrt(h2 / (1 - balance * balance)) / safe_length
+        t_lowest = np.where(balanced, t_balanced, t_lowest)
+
+    t = np.minimum(np.maximum(t_lowest, t_lo), t_hi)
+
+    heights = z1 + dz * t
+    if slope > 0:
+        heights = heights + slope * np.sqrt((t - t0) ** 2 * length2 + h2)
+
+    return np.where(reached, heights, np.inf)
+
+
+def segments_distance(segments: np.ndarray, x: float, y: float) -> np.ndarray:
+    """
+    the distance in the xy plane from (x, y) to each segment
+    """
+    x1 = segments[:, X1]
+    y1 = segments[:, Y1]
+    dx = segments[:, X2] - x1
+    dy = segments[:, Y2] - y1
+    length2 = dx * dx + dy * dy
+
+    t = np.clip(
+        ((x - x1) * dx + (y - y1) * dy) / np.where(length2 > 0, length2, 1.0), 0, 1
+    )
+    return np.hypot(x1 + t * dx - x, y1 + t * dy - y)
+
+
+def near_segments(
+    segments: np.ndarray, xs: np.ndarray, ys: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    the indexes of the segments within the cutter radius of the rectangle of
+    points xs * ys, their distance to its center, and its half diagonal
+    """
+    center_x = (xs[0] + xs[-1]) / 2
+    center_y = (ys[0] + ys[-1]) / 2
+    half_diagonal = math.hypot(xs[-1] - center_x, ys[-1] - center_y)
+
+    distance = segments_distance(segments, center_x, center_y)
+    near = np.flatnonzero(distance <= segments[:, RADIUS] + half_diagonal)
+
+    return near, distance[near], half_diagonal
+
+
+def tile_heights(
+    segments: np.ndarray, xs: np.ndarray, ys: np.ndarray, top_z: float, slope: float
+) -> np.ndarray:
+    """
+    the height map of a tile: rows ys, columns xs
+
+    The segments are swept from the one that may go the deepest in the tile
+    up: the tile is done when the remaining ones cannot go below any point.
+    """
+    px, py = np.meshgrid(xs, ys)
+    px = px.ravel()
+    py = py.ravel()
+
+    heights = np.full(len(px), top_z)
+
+    near, distance, half_diagonal = near_segments(segments, xs, ys)
+
+    # lowest height each segment can reach in the tile
+    bound = np.minimum(segments[near, Z1], segments[near, Z2]) + slope * np.maximum(
+        distance - half_diagonal, 0
+    )
+    order = np.argsort(bound, kind="stable")
+    near = near[order]
+    bound = bound[order]
+
+    batch = 1
+    k = 0
+    while k < len(near):
+        # only the points still above what the next segments can reach
+        active = np.flatnonzero(heights > bound[k])
+        if len(active) == 0:
+            break
+        heights[active] = np.minimum(
+            heights[active],
+            swept_heights(
+                segments[near[k : k + batch]], px[active], py[active], slope
+            ).min(axis=0),
+        )
+        k += batch
+        batch = min(2 * batch, max(1, BATCH_SIZE // len(active)))
+
+    return heights.reshape(len(ys), len(xs))
+
+
+def band_heights(
+    segments: np.ndarray,
+    xs: np.ndarray,
+    ys: np.ndarray,
+    top_z: float,
+    slope: float,
+    tile_size: int,
+) -> np.ndarray:
+    """
+    the height map of a band of the grid: rows ys, columns xs - in blocks of
+    tiles, each with the segments near it
+    """
+    heights = np.full((len(ys), len(xs)), top_z)
+
+    block_size = tile_size * TILES_PER_BLOCK
+
+    for block0 in range(0, len(xs), block_size):
+        block_xs = xs[block0 : block0 + block_size]
+        near, _, _ = near_segments(segments, block_xs, ys)
+        if len(near) == 0:
+            continue
+        block_segments = segments[near]
+
+        for col0 in range(block0, block0 + len(block_xs), tile_size):
+            heights[:, col0 : col0 + tile_size] = tile_heights(
+                block_segments, xs[col0 : col0 + tile_size], ys, top_z, slope
+            )
+
+    return heights
+
+
+def band_heights_in_worker(worker_data: Dict[str, Any]) -> np.ndarray:
+    """
+    runs in a worker process: the height map of a band
+    """
+    return band_heights(
+        worker_data["segments"],
+        worker_data["xs"],
+        worker_data["ys"],
+        worker_data["top_z"],
+        worker_data["slope"],
+        worker_data["tile_size"],
+    )
+
+
+class HeightMapSimulator:
+    """
+    The height map of the stock after the cutter swept a GcodeMiniParser path
+    """
+
+    def __init__(
+        self,
+        parser: GcodeMiniParser,
+        cutter_diameter: float,
+        cutter_angle: float = 180.0,
+        resolution: int = 1024,
+        nb_workers: int = 1,
+    ):
+        self.cutter_diameter = cutter_diameter
+        if cutter_angle <= 0 or cutter_angle > 180:
+            cutter_angle = 180
+        self.cutter_angle = cutter_angle
+        self.is_vbit = cutter_angle < 180
+
+        self.resolution = resolution
+        self.nb_workers = nb_workers
+
+        self.top_z = 0.0
+
+        # the path points and their times - the first "segment" is the
+        # cutter at the first point
+        self.points = np.array([parser.xs, parser.ys, parser.zs]).T
+        self.times = parser.times.copy()
+
+        # the grid
+        min_x, min_y, _ = self.points.min(axis=0)
+        max_x, max_y, _ = self.points.max(axis=0)
+        size = max(
+            max_x - min_x + 4 * cutter_diameter, max_y - min_y + 4 * cutter_diameter
+        )
+
+        self.pixel_size = size / resolution
+        self.min_x = (min_x + max_x) / 2 - size / 2
+        self.min_y = (min_y + max_y) / 2 - size / 2
+
+        centers = (np.arange(resolution) + 0.5) * self.pixel_size
+        self.xs = self.min_x + centers
+        self.ys = self.min_y + centers
+
+        radius_pixels = cutter_diameter / 2 / self.pixel_size
+        self.tile_size = int(
+            min(
+                max(2 ** round(math.log2(max(radius_pixels / 2, 1))), MIN_TILE_SIZE),
+                MAX_TILE_SIZE,
+            )
+        )
+
+    @classmethod
+    def from_gcode(
+        cls,
+        gcode: str,
+        cutter_diameter: float,
+        cutter_angle: float = 180.0,
+        resolution: int = 1024,
+        nb_workers: int = 1,
+        use_candle_parser: bool = False,
+    ) -> "HeightMapSimulator":
+        """ """
+        parser = GcodeMiniParser()
+        if use_candle_parser:
+            parser.parse_gcode_use_candle_parser(gcode)
+        else:
+            parser.parse_gcode(gcode)
+
+        return cls(parser, cutter_diameter, cutter_angle, resolution, nb_workers)
+
+    @property
+    def total_time(self) -> float:
+        return float(self.times[-1])
+
+    def slope(self) -> float:
+        """
+        height of the cutter profile per unit of radius
+        """
+        if not self.is_vbit:
+            return 0.0
+        return 1 / math.tan(self.cutter_angle * math.pi / 180 / 2)
+
+    def segments(self, stop_at_time: float = None) -> np.ndarray:
+        """
+        the segments swept before stop_at_time, the last one cut at that
+        time: array of (x1, y1, z1, x2, y2, z2, radius)
+        """
+        starts = np.concatenate([self.points[:1], self.points[:-1]])
+        ends = self.points.copy()
+        start_times = np.concatenate([self.times[:1], self.times[:-1]])
+        end_times = self.times
+
+        if stop_at_time is not None:
+            started = start_times <= stop_at_time
+            starts = starts[started]
+            ends = ends[started]
+            start_times = start_times[started]
+            end_times = end_times[started]
+
+            cut = end_times > stop_at_time
+            coeff = (stop_at_time - start_times[cut]) / (
+                end_times[cut] - start_times[cut]
+            )
+            ends[cut] = starts[cut] + (ends[cut] - starts[cut]) * coeff[:, None]
+
+        if self.is_vbit:
+            # the cone, up to the top of the stock
+            cone_height = (
+                self.top_z
+                - np.minimum(np.minimum(starts[:, 2], ends[:, 2]), self.top_z)
+                + 0.1
+            )
+            radius = cone_height / self.slope()
+        else:
+            radius = np.full(len(starts), self.cutter_diameter / 2)
+
+        segments = np.column_stack([starts, ends, radius])
+
+        # only the segments below the top of the stock cut anything
+        return segments[np.minimum(segments[:, Z1], segments[:, Z2]) < self.top_z]
+
+    def simulate(self, stop_at_time: float = None) -> np.ndarray:
+        """
+        the height map: heights[row, col] at (xs[col], ys[row])
+        """
+        segments = self.segments(stop_at_time)
+        slope = self.slope()
+
+        # the bands of rows, with the segments near each of them
+        radius = segments[:, RADIUS]
+        seg_min_y = np.minimum(segments[:, Y1], segments[:, Y2]) - radius
+        seg_max_y = np.maximum(segments[:, Y1], segments[:, Y2]) + radius
+
+        bands = []
+        for row0 in range(0, self.resolution, self.tile_size):
+            ys = self.ys[row0 : row0 + self.tile_size]
+            near = (seg_min_y <= ys[-1]) & (seg_max_y >= ys[0])
+            bands.append(
+                {
+                    "segments": segments[near],
+                    "xs": self.xs,
+                    "ys": ys,
+                    "top_z": self.top_z,
+                    "slope": slope,
+                    "tile_size": self.tile_size,
+                }
+            )
+
+        if self.nb_workers > 1:
+            context = multiprocessing.get_context("spawn")
+
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.nb_workers, mp_context=context
+            ) as executor:
+                heights = list(executor.map(band_heights_in_worker, bands))
+        else:
+            heights = [band_heights_in_worker(band) for band in bands]
+
+        return np.vstack(heights)
+
+    def save_png(self, filename: str, heights: np.ndarray):
+        """
+        the height map as a gray image: white is the top of the stock,
+        black the deepest cut - the y axis up
+        """
+        import matplotlib.image
+
+        bottom = float(heights.min())
+        if bottom == self.top_z:
+            bottom = self.top_z - 1.0
+
+        matplotlib.image.imsave(
+            filename,
+            heights,
+            cmap="gray",
+            vmin=bottom,
+            vmax=self.top_z,
+            origin="lower",
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="heightmapsimulator", description="Height map of the stock cut by gcode"
+    )
+
+    # argument
+    parser.add_argument("gcodefile", help="gcode file")
+    # options
+    parser.add_argument("--cutterdiameter", dest="cutter_diameter", type=float, default=6.0, help="cutter diameter (mm)")
+    parser.add_argument("--cutterangle", dest="cutter_angle", type=float, default=180.0, help="cutter angle (degree) - V-bit when < 180")
+    parser.add_argument("--resolution", dest="resolution", type=int, default=1024, help="grid size (pixels)")
+    parser.add_argument("--stopattime", dest="stop_at_time", type=float, default=None, help="simulation time (s) - default: the whole gcode")
+    parser.add_argument("--candleparser", dest="use_candle_parser", action='store_true', default=False, help="use candle parser")
+    parser.add_argument("-j", "--jobs", dest="nb_workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("-o", "--output", dest="output", default="heightmap.png", help="output file: .png image or .npy array")
+
+    options = parser.parse_args()
+
+    with open(options.gcodefile, "r") as fp:
+        gcode = fp.read()
+
+    t1 = time.time()
+    simulator = HeightMapSimulator.from_gcode(
+        gcode,
+        options.cutter_diameter,
+        options.cutter_angle,
+        options.resolution,
+        options.nb_workers,
+        options.use_candle_parser,
+    )
+    heights = simulator.simulate(options.stop_at_time)
+    t2 = time.time()
+
+    if options.output.endswith(".npy"):
+        np.save(options.output, heights)
+    else:
+        simulator.save_png(options.output, heights)
+
+    print("gcode time:     ", simulator.total_time)
+    print("simulation time:", t2 - t1)
+    sys.exit(0)
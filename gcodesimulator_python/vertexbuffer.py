@@ -0,0 +1,324 @@
+# This Python file uses the following encoding: utf-8
+
+"""
+The vertex buffer of the path rasterization of the simulator (glviewer.py),
+made with numpy from the path arrays of a GcodeMiniParser - same layout as
+fillPathBuffer of jscut's RenderPath.js - and its disk cache.
+
+Flat cutter: 18 vertexes per path point, 9 floats each
+    pos1 (3), pos2 (3), startTime, endTime, command (0-17)
+V-bit: 42 vertexes per path point, 12 floats each
+    pos1 (3), pos2 (3), startTime, endTime, command (100, 101, 200), rawPos (3)
+
+No Qt here: the buffer can be made (and cached) without an OpenGL context.
+"""
+
+import os
+import json
+import math
+import hashlib
+
+from typing import Any
+from typing import Dict
+from typing import Tuple
+
+import numpy as np
+
+# change it when the buffer layout changes: the disk cache of the previous
+# versions is then ignored
+VERSION = 1
+
+NUM_HALF_CIRCLE_SEGMENTS = 5
+
+# the vertexes are made by chunks of points (bounded temporaries)
+CHUNK_NB_POINTS = 1 << 16
+
+
+def path_times(
+    xs: np.ndarray, ys: np.ndarray, zs: np.ndarray, fs: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    begin/end time of the move to each point, the first point "moves" from
+    itself
+    """
+    dists = np.sqrt(
+        np.diff(xs, prepend=xs[:1]) ** 2
+        + np.diff(ys, prepend=ys[:1]) ** 2
+        + np.diff(zs, prepend=zs[:1]) ** 2
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        end_times = np.cumsum(dists / fs * 60)
+    begin_times = np.concatenate([[0.0], end_times[:-1]])
+
+    return begin_times, end_times
+
+
+def vbit_templates() -> Dict[str, np.ndarray]:
+    """
+    per vertex of a path point: command, on the cone (or its apex), and the
+    angle of the rawPos on the cone, as
+        plunge/retract: angle
+        cut: rotAngle + angle + coeff * planeContactAngle
+    """
+    n = NUM_HALF_CIRCLE_SEGMENTS
+    nb_vertexes = 12 + n * 6
+
+    # plunge or retract: a full circle, then discarded vertexes
+    plunge_command = np.full(nb_vertexes, 200.0)
+    plunge_cone = np.zeros(nb_vertexes, dtype=bool)
+    plunge_angle = np.zeros(nb_vertexes)
+    for circle_index in range(n * 2):
+        a1 = 2 * math.pi * circle_index / n / 2
+        a2 = 2 * math.pi * (circle_index + 1) / n / 2
+        k = 3 * circle_index
+        plunge_command[k : k + 3] = 100  # 101 for a plunge (going down)
+        plunge_cone[[k, k + 2]] = True
+        plunge_angle[[k, k + 2]] = a2, a1
+
+    # cut: the 2 contact lines, then the 2 half circles
+    m, p = (-math.pi / 2, -1), (math.pi / 2, 1)
+    cut = [
+        (100, m), (101, m), (100, None), (100, None),
+        (101, m), (101, None), (100, None), (101, None),
+        (100, p), (100, p), (101, None), (101, p),
+    ]  # fmt: skip
+    for circle_index in range(n):
+        f1 = circle_index / n
+        f2 = (circle_index + 1) / n
+        a1 = (math.pi / 2 + f1 * math.pi, 2 * f1 - 1)
+        a2 = (math.pi / 2 + f2 * math.pi, 2 * f2 - 1)
+        a1_opposite = (a1[0] + math.pi, a1[1])
+        a2_opposite = (a2[0] + math.pi, a2[1])
+        cut += [
+            (100, a2), (100, None), (100, a1),
+            (101, a2_opposite), (101, None), (101, a1_opposite),
+        ]  # fmt: skip
+
+    return {
+        "plunge_command": plunge_command,
+        "plunge_cone": plunge_cone,
+        "plunge_angle": plunge_angle,
+        "cut_command": np.array([command for command, _ in cut], dtype=float),
+        "cut_cone": np.array([angle is not None for _, angle in cut]),
+        "cut_angle": np.array([angle[0] if angle else 0.0 for _, angle in cut]),
+        "cut_coeff": np.array([angle[1] if angle else 0.0 for _, angle in cut]),
+    }
+
+
+def fill_vbit_vertexes(
+    array: np.ndarray,
+    prev: np.ndarray,
+    curr: np.ndarray,
+    cutter_angle_rad: float,
+    templates: Dict[str, np.ndarray],
+):
+    """
+    the V-bit vertexes (n x 42 x 12 array) of the moves prev -> curr (3 x n)
+    """
+    px, py, pz = prev
+    x, y, z = curr
+    tan_half = math.tan(cutter_angle_rad / 2)
+
+    cone_height = -np.minimum(np.minimum(z, pz), 0) + 0.1
+    cone_radius = cone_height * tan_half
+
+    same_xy = (x == px) & (y == py)
+    rot_angle = np.where(same_xy, 0.0, np.arctan2(y - py, x - px))
+    xy_dist = np.hypot(x - px, y - py)
+
+    plunge = np.abs(z - pz) >= xy_dist * math.pi / 2 / tan_half
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # clipped: the shallow slopes of a cut, nan in RenderPath.js
+        plane_contact_angle = np.arcsin(
+            np.clip(np.where(plunge, 0, (pz - z) / xy_dist * tan_half), -1, 1)
+        )
+
+    cut_angles = (
+        rot_angle[:, None]
+        + templates["cut_angle"]
+        + templates["cut_coeff"] * plane_contact_angle[:, None]
+    )
+    angles = np.where(plunge[:, None], templates["plunge_angle"], cut_angles)
+    on_cone = np.where(
+        plunge[:, None], templates["plunge_cone"], templates["cut_cone"]
+    )
+
+    # as RenderPath.js: 101 when going down (prevZ >= z)
+    plunging = plunge & (pz >= z)
+    commands = np.where(
+        plunge[:, None], templates["plunge_command"], templates["cut_command"]
+    )
+    commands[plunging] = np.where(commands[plunging] == 100, 101, commands[plunging])
+
+    radius = np.where(on_cone, cone_radius[:, None], 0.0)
+
+    array[:, :, 8] = commands
+    array[:, :, 9] = radius * np.cos(angles)
+    array[:, :, 10] = radius * np.sin(angles)
+    array[:, :, 11] = np.where(on_cone, cone_height[:, None], 0.0)
+
+
+def make_path_buffer(
+    xs: np.ndarray,
+    ys: np.ndarray,
+    zs: np.ndarray,
+    fs: np.ndarray,
+    cutter_angle: float,
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    the float32 vertex buffer of the path and its infos (stride, vertexes per
+    line, number of points, total time, bounds)
+    """
+    if cutter_angle <= 0 or cutter_angle > 180:
+        cutter_angle = 180
+    is_vbit = cutter_angle < 180
+
+    if is_vbit:
+        stride = 12
+        vertexes_per_line = 12 + NUM_HALF_CIRCLE_SEGMENTS * 6
+    else:
+        stride = 9
+        vertexes_per_line = 18
+
+    num_points = len(xs)
+
+    begin_times, end_times = path_times(xs, ys, zs, fs)
+
+    points = np.array([xs, ys, zs])
+    prev_points = np.concatenate([points[:, :1], points[:, :-1]], axis=1)
+
+    array = np.empty((num_points, vertexes_per_line, stride), dtype=np.float32)
+
+    templates = vbit_templates() if is_vbit else None
+
+    for begin in range(0, num_points, CHUNK_NB_POINTS):
+        end = min(begin + CHUNK_NB_POINTS, num_points)
+        chunk = array[begin:end]
+
+        chunk[:, :, 0:3] = prev_points[:, begin:end].T[:, None, :]
+        chunk[:, :, 3:6] = points[:, begin:end].T[:, None, :]
+        chunk[:, :, 6] = begin_times[begin:end, None]
+        chunk[:, :, 7] = end_times[begin:end, None]
+
+        if is_vbit:
+            fill_vbit_vertexes(
+                chunk,
+                prev_points[:, begin:end],
+                points[:, begin:end],
+                cutter_angle * math.pi / 180,
+                templates,
+            )
+        else:
+            chunk[:, :, 8] = np.arange(vertexes_per_line)
+
+    infos = {
+        "stride": stride,
+        "vertexes_per_line": vertexes_per_line,
+        "num_points": num_points,
+        "total_time": float(end_times[-1]) if num_points else 0.0,
+        "min_x": float(xs.min()) if num_points else 0.0,
+        "max_x": float(xs.max()) if num_points else 0.0,
+        "min_y": float(ys.min()) if num_points else 0.0,
+        "max_y": float(ys.max()) if num_points else 0.0,
+        "min_z": float(zs.min()) if num_points else 0.0,
+    }
+
+    return array.reshape(-1), infos
+
+
+def path_buffer_key(gcode: str, cutter_angle: float, use_candle_parser: bool) -> str:
+    """
+    everything the buffer depends on
+    """
+    key = hashlib.sha256(
+        repr((VERSION, cutter_angle, use_candle_parser)).encode()
+    )
+    key.update(gcode.encode())
+    return key.hexdigest()
+
+
+class PathBufferCache:
+    """
+    The vertex buffers on disk: a .npy file read back memory mapped, and
+    the infos in a small json file. Only the most recent ones are kept,
+    up to a number of entries and a total size of the buffers.
+    """
+
+    MAX_NB_ENTRIES = 8
+    MAX_NB_BYTES = 4 * 1024**3
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_nb_entries: int = MAX_NB_ENTRIES,
+        max_nb_bytes: int = MAX_NB_BYTES,
+    ):
+        self.cache_dir = cache_dir
+        self.max_nb_entries = max_nb_entries
+        self.max_nb_bytes = max_nb_bytes
+
+    def filename(self, key: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, key + ext)
+
+    def get(self, key: str) -> Tuple[np.ndarray, Dict[str, Any]] | None:
+        """ """
+        try:
+            with open(self.filename(key, ".json")) as f:
+                infos = json.load(f)
+            if infos.get("version", None) != VERSION:
+                return None
+            array = np.load(self.filename(key, ".npy"), mmap_mode="r")
+            os.utime(self.filename(key, ".json"))
+        except (OSError, ValueError):
+            return None
+
+        return array, infos
+
+    def put(self, key: str, array: np.ndarray, infos: Dict[str, Any]):
+        """
+        a failure to write the cache is not an error
+        """
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            # the buffer before the infos: an entry is complete with its infos
+            with open(self.filename(key, ".npy.tmp"), "wb") as f:
+                np.save(f, array)
+            os.replace(self.filename(key, ".npy.tmp"), self.filename(key, ".npy"))
+
+            with open(self.filename(key, ".json.tmp"), "w") as f:
+                json.dump(dict(infos, version=VERSION), f)
+            os.replace(self.filename(key, ".json.tmp"), self.filename(key, ".json"))
+
+            self.evict()
+        except OSError as e:
+            print("path buffer cache: cannot write %s: %s" % (self.cache_dir, e))
+
+    def evict(self):
+        """
+        the least recently used entries are removed, the most recent one is
+        always kept
+        """
+        entries = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if name.endswith(".json")
+        ]
+        entries.sort(key=os.path.getmtime, reverse=True)
+
+        nb_bytes = 0
+        for k, entry in enumerate(entries):
+            key = os.path.basename(entry)[: -len(".json")]
+            try:
+                nb_bytes += os.path.getsize(self.filename(key, ".npy"))
+            except OSError:
+                pass
+
+            if k == 0 or (k < self.max_nb_entries and nb_bytes <= self.max_nb_bytes):
+                continue
+
+            for ext in (".json", ".npy"):
+                try:
+                    os.remove(self.filename(key, ext))
+                except OSError:
+                    pass
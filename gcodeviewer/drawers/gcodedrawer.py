@@ -1,4 +1,5 @@
 from typing import List
+from typing import Tuple
 
 from enum import Enum
 
@@ -11,16 +12,16 @@ from PySide6.QtCore import QTimer, Slot
 from PySide6.QtCore import qIsNaN
 
 from PySide6.QtOpenGL import QOpenGLTexture
-from PySide6.QtOpenGL import QOpenGLBuffer
 
-from gcodeviewer.parser.linesegment import LineSegment
 from gcodeviewer.parser.gcodeviewparse import GcodeViewParse
 
 from gcodeviewer.drawers.shaderdrawable import ShaderDrawable
 from gcodeviewer.drawers.shaderdrawable import VertexData
+from gcodeviewer.drawers.linespyramid import LinesPyramid
 
 from gcodeviewer.util.util import Util
-from gcodeviewer.util.util import qBound
+
+import numpy as np
 
 sNaN = float("NaN")
 
@@ -28,6 +29,9 @@ sNaN = float("NaN")
 class GcodeDrawer(ShaderDrawable):
     """ """
 
+    # smaller toolpaths are always drawn exactly
+    LOD_MIN_LINES = 4096
+
     class GrayscaleCode(Enum):
         S = 0
         Z = 1
@@ -44,6 +48,7 @@ class GcodeDrawer(ShaderDrawable):
         self.m_drawMode = GcodeDrawer.DrawMode.Vectors
         self.m_simplify = True
         self.m_simplifyPrecision = 0.0
+        self.m_levelsOfDetail = True
         self.m_ignoreZ = False
         self.m_grayscaleSegments = False
         self.m_grayscaleCode = GcodeDrawer.GrayscaleCode.S
@@ -60,7 +65,8 @@ class GcodeDrawer(ShaderDrawable):
         self.m_timerVertexUpdate = QTimer()
 
         self.m_image = QImage()
-        self.m_indexes: List[int] = []
+        self.m_indexes: List[np.ndarray] = []
+        self.m_vertexIndexes = np.empty(0, dtype=np.int64)
         self.m_geometryUpdated = False
 
         self.m_pointSize = 6
@@ -73,9 +79,19 @@ class GcodeDrawer(ShaderDrawable):
         self.m_geometryUpdated = False
         super().update()
 
-    def update_indexes(self, indexes: List[int]):
+    def update_indexes(self, indexes: np.ndarray):
         # Store segments to update
-        self.m_indexes += indexes
+        self.m_indexes.append(np.asarray(indexes, dtype=np.int64))
+
+    def updatedIndexes(self) -> np.ndarray:
+        segments = self.m_viewParser.getLineSegments()
+
+        # sorted and unique, without sorting
+        updated = np.zeros(len(segments), dtype=bool)
+        for indexes in self.m_indexes:
+            updated[indexes[(indexes >= 0) & (indexes < len(segments))]] = True
+
+        return np.flatnonzero(updated)
 
     def updateData(self):
         if self.m_drawMode == GcodeDrawer.DrawMode.Vectors:
@@ -127,6 +143,12 @@ class GcodeDrawer(ShaderDrawable):
     def setSimplifyPrecision(self, simplifyPrecision: float):
         self.m_simplifyPrecision = simplifyPrecision
 
+    def levelsOfDetail(self) -> bool:
+        return self.m_levelsOfDetail
+
+    def setLevelsOfDetail(self, levelsOfDetail: bool):
+        self.m_levelsOfDetail = levelsOfDetail
+
     def geometryUpdated(self) -> bool:
         return self.m_geometryUpdated
 
@@ -210,160 +232,156 @@ class GcodeDrawer(ShaderDrawable):
     def prepareVectors(self) -> bool:
         print("preparing vectors : %s" % self)
 
-        lines = self.m_viewParser.getLines()
-
-        print("lines count: %d" % len(lines))
+        segments = self.m_viewParser.getLineSegments()
+        starts = segments.starts()
+        ends = segments.ends()
+        nbSegments = len(segments)
 
-        vertex = VertexData()
+        print("lines count: %d" % nbSegments)
 
         # Clear all vertex data
         self.m_lines = []
         self.m_points = []
         self.m_triangles = []
+        self.m_lineLevels = []
 
         # Delete texture on mode change
         if self.m_texture:
             self.m_texture.destroy()
             self.m_texture = None
 
-        drawFirstPoint = True
-        i = 0
-        # i will be changed in the while-loop!
-        while i < len(lines):
-            line = lines[i]
+        self.m_vertexIndexes = np.full(nbSegments, -1, dtype=np.int64)
 
-            if qIsNaN(line.getEnd().z()):
-                i += 1
-                continue
-
-            # Find first point of toolpath
-            if drawFirstPoint:
-                if qIsNaN(line.getEnd().x()) or qIsNaN(line.getEnd().y()):
-                    i += 1
-                    continue
-
-                # Draw first toolpath point
-                vertex.color = Util.colorToVector(self.m_colorStart)
-                vertex.position = line.getEnd()
-                if self.m_ignoreZ:
-                    vertex.position.setZ(0)
-                vertex.start = QVector3D(sNaN, sNaN, self.m_pointSize)
-                self.m_points.append(VertexData.clone(vertex))
-
-                drawFirstPoint = False
-                continue
-
-            # Prepare vertices
-            if line.isFastTraverse():
-                vertex.start = line.getStart()
-            else:
-                vertex.start = QVector3D(sNaN, sNaN, sNaN)
-
-            # Simplify geometry
-            j = i
-            if self.m_simplify and i < len(lines) - 1:
-                start = line.getEnd() - line.getStart()
-                next = QVector3D()
-                length = start.length()
-                straight = False
-
-                ddo = True
-
-                while ddo:
-                    line.setVertexIndex(len(self.m_lines))  # Store vertex index
-                    i += 1
-
-                    if i < len(lines) - 1:
-                        next = lines[i].getEnd() - lines[i].getStart()
-                        length += next.length()
-                        # straight = start.crossProduct(start.normalized(), next.normalized()).length() < 0.025
-
-                    # Split short & straight lines
-                    ddo = (
-                        (length < self.m_simplifyPrecision or straight)
-                        and i < len(lines)
-                        and self.getSegmentType(lines[i])
-                        == self.getSegmentType(lines[j])
-                    )
-                i -= 1
-            else:
-                line.setVertexIndex(len(self.m_lines))  # Store vertex index
-
-            # Set color
-            vertex.color = self.getSegmentColorVector(lines[i])
-
-            # Line start
-            vertex.position = lines[j].getStart()
-            if self.m_ignoreZ:
-                vertex.position.setZ(0)
-            self.m_lines.append(VertexData.clone(vertex))
-
-            # Line end
-            vertex.position = lines[i].getEnd()
-            if self.m_ignoreZ:
-                vertex.position.setZ(0)
-            self.m_lines.append(VertexData.clone(vertex))
-
-            # Draw last toolpath point
-            if i == len(lines) - 1:
-                vertex.color = Util.colorToVector(self.m_colorEnd)
-                vertex.position = lines[i].getEnd()
-                if self.m_ignoreZ:
-                    vertex.position.setZ(0)
-                vertex.start = QVector3D(sNaN, sNaN, self.m_pointSize)
-                self.m_points.append(VertexData.clone(vertex))
-
-            # do not forget to increment the variable i
-            i += 1
+        # The toolpath begins at the first point with x, y and z
+        withZ = ~np.isnan(ends[:, 2])
+        firsts = np.flatnonzero(withZ & ~np.isnan(ends[:, 0]) & ~np.isnan(ends[:, 1]))
+        if len(firsts) == 0:
+            self.m_geometryUpdated = True
+            self.m_indexes = []
+            return True
+
+        # The drawn segments (j -> i, merged when simplified)
+        firstIndexes = firsts[0] + np.flatnonzero(withZ[firsts[0] :])
+        if self.m_simplify and self.m_simplifyPrecision > 0:
+            firstIndexes, lastIndexes = self.simplifiedSegments(firstIndexes)
+        else:
+            lastIndexes = firstIndexes
+
+        nbLines = len(firstIndexes)
+
+        # Store vertex index
+        vertexIndexes = 2 * np.arange(nbLines)
+        self.m_vertexIndexes[firstIndexes] = vertexIndexes
+        if lastIndexes is not firstIndexes:
+            groups = np.repeat(np.arange(nbLines), lastIndexes - firstIndexes + 1)
+            merged = np.concatenate(
+                [np.arange(j, i + 1) for j, i in zip(firstIndexes, lastIndexes)]
+            )
+            self.m_vertexIndexes[merged] = vertexIndexes[groups]
+
+        # Line start, line end
+        lines = np.empty((nbLines, 2, 9), dtype=np.float32)
+        lines[:, 0, 0:3] = starts[firstIndexes]
+        lines[:, 1, 0:3] = ends[lastIndexes]
+        lines[:, :, 3:6] = self.getSegmentColors(lastIndexes)[:, None, :]
+        lines[:, :, 6:9] = np.where(
+            segments.isFastTraverse()[firstIndexes, None],
+            starts[firstIndexes],
+            sNaN,
+        )[:, None, :]
+        if self.m_ignoreZ:
+            lines[:, :, 2] = 0
+
+        self.m_lines = lines.reshape(-1, 9)
+
+        # Levels of detail of the lines, for the small pixel sizes
+        if self.m_levelsOfDetail and nbLines >= self.LOD_MIN_LINES:
+            self.m_lineLevels = LinesPyramid(
+                lines[:, 0, 0:3],
+                lines[:, 1, 0:3],
+                self.getSegmentTypes()[lastIndexes],
+            ).levels()
+
+        # Draw first and last toolpath points
+        points = [(ends[firsts[0]], self.m_colorStart)]
+        if lastIndexes[-1] == nbSegments - 1:
+            points.append((ends[-1], self.m_colorEnd))
+
+        self.m_points = np.array(
+            [
+                (*position, *Util.colorToVector(color).toTuple())
+                + (sNaN, sNaN, self.m_pointSize)
+                for position, color in points
+            ],
+            dtype=np.float32,
+        )
+        if self.m_ignoreZ:
+            self.m_points[:, 2] = 0
 
         self.m_geometryUpdated = True
         self.m_indexes = []
         return True
 
+    def simplifiedSegments(self, indexes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The short segments following a segment of the same type are merged
+        with it: the first and last segments of the merged ones
+        """
+        segments = self.m_viewParser.getLineSegments()
+        lengths = segments.lengths()
+        types = self.getSegmentTypes()
+        nbSegments = len(segments)
+
+        firstIndexes = []
+        lastIndexes = []
+
+        k = 0
+        while k < len(indexes):
+            j = indexes[k]
+            i = j
+            length = lengths[j]
+            while i < nbSegments - 1:
+                if i + 1 < nbSegments - 1:
+                    length += lengths[i + 1]
+                if not (length < self.m_simplifyPrecision and types[i + 1] == types[j]):
+                    break
+                i += 1
+
+            firstIndexes.append(j)
+            lastIndexes.append(i)
+
+            # the next drawn segment after the merged ones
+            k = np.searchsorted(indexes, i + 1)
+
+        return np.array(firstIndexes), np.array(lastIndexes)
+
     def updateVectors(self) -> bool:
         # Update vertices
-        lines = self.m_viewParser.getLines()
-
-        # Map buffer : C++ => cast to VertexData* pointer ; Python => Shiboken VoidPtr
-        data = self.m_vbo.map(QOpenGLBuffer.WriteOnly)
-
-        # Update vertices for each line segment
-        for i in self.m_indexes:
-            # Update vertex pair
-            if i < 0 or i > len(lines) - 1:
-                continue
-
-            line = lines[i]
-
-            vertexIndex = line.vertexIndex()
-            if vertexIndex >= 0:
-                # Update vertex array
-                if data:  # FIXME: if data is not None:
-                    data[vertexIndex].color = self.getSegmentColorVector(line)
-                    data[vertexIndex + 1].color = data[vertexIndex].color
-                    # FIXME : work at the buffer level
-                    # buffer_index <- vertexIndex
-                    # np_array <-> data
-                    # color = self.getSegmentColorVector(line)
-                    # np_array[bufferIndex + colorOffset + 0] as np array = color.x()
-                    # np_array[bufferIndex + colorOffset + 1] as np array = color.y()
-                    # np_array[bufferIndex + colorOffset + 2] as np array = color.z()
-                    #
-                    # np_array[bufferIndex + stride + colorOffset + 0] as np array = color.x()
-                    # np_array[bufferIndex + stride + colorOffset + 1] as np array = color.y()
-                    # np_array[bufferIndex + stride + colorOffset + 2] as np array = color.z()
-                    #
-                else:
-                    self.m_lines[vertexIndex].color = self.getSegmentColorVector(line)
-                    self.m_lines[vertexIndex + 1].color = self.m_lines[
-                        vertexIndex
-                    ].color
+        indexes = self.updatedIndexes()
+        vertexIndexes = self.m_vertexIndexes[indexes]
+        drawn = vertexIndexes >= 0
+        indexes = indexes[drawn]
+        vertexIndexes = vertexIndexes[drawn]
+
+        # A merged line (simplified) gets the color of its last updated
+        # segment: the vertex indexes do not decrease with the segments
+        last = np.append(vertexIndexes[1:] != vertexIndexes[:-1], True)
+        indexes = indexes[last]
+        vertexIndexes = vertexIndexes[last]
 
         self.m_indexes = []
-        if data:  # FIXME: if data is not None:
-            self.m_vbo.unmap()
 
-        return not data
+        if len(vertexIndexes) == 0:
+            return False
+
+        # Update vertex pair
+        colors = self.getSegmentColors(indexes)
+        self.m_lines[vertexIndexes, 3:6] = colors
+        self.m_lines[vertexIndexes + 1, 3:6] = colors
+
+        # Only the updated vertices are written in the vertex buffer
+        vertexIndexes = np.stack([vertexIndexes, vertexIndexes + 1], axis=1)
+        return not self.updateLineVertices(vertexIndexes.reshape(-1))
 
     def prepareRaster(self) -> bool:
         maxImageSize = 8192
@@ -385,26 +403,18 @@ class GcodeDrawer(ShaderDrawable):
             image = QImage(self.m_viewParser.getResolution(), QImage.Format_RGB888)
             image.fill(QColor("white"))
 
-            lines = self.m_viewParser.getLines()
-            print("lines count: %d" % len(lines))
+            segments = self.m_viewParser.getLineSegments()
+            print("lines count: %d" % len(segments))
 
-            pixelSize = self.m_viewParser.getMinLength()
-            origin = self.m_viewParser.getMinimumExtremes()
-
-            for line in lines:
-                if not qIsNaN(line.getEnd().length()):
-                    self.setImagePixelColor(
-                        image,
-                        (line.getEnd().x() - origin.x()) / pixelSize,
-                        (line.getEnd().y() - origin.y()) / pixelSize,
-                        self.getSegmentColor(line).rgb(),
-                    )
+            indexes = np.flatnonzero(~np.isnan(segments.ends()).any(axis=1))
+            self.setImagePixelColors(image, indexes)
 
         # Create vertices array
         # Clear all vertex data
         self.m_lines = []
         self.m_points = []
         self.m_triangles = []
+        self.m_lineLevels = []
 
         if self.m_texture:
             self.m_texture.destroy()
@@ -469,19 +479,7 @@ class GcodeDrawer(ShaderDrawable):
 
     def updateRaster(self) -> bool:
         if not self.m_image is None:
-            lines = self.m_viewParser.getLines()
-
-            pixelSize = self.m_viewParser.getMinLength()
-            origin = self.m_viewParser.getMinimumExtremes()
-
-            for idx in self.m_indexes:
-                line = lines[idx]
-                self.setImagePixelColor(
-                    self.m_image,
-                    (line.getEnd().x() - origin.x()) / pixelSize,
-                    (line.getEnd().y() - origin.y()) / pixelSize,
-                    self.getSegmentColor(line.rgb()),
-                )
+            self.setImagePixelColors(self.m_image, self.updatedIndexes())
 
             if self.m_texture:
                 self.m_texture.setData(
@@ -491,52 +489,63 @@ class GcodeDrawer(ShaderDrawable):
         self.m_indexes = []
         return False
 
-    def getSegmentType(self, segment: LineSegment) -> int:
-        return segment.isFastTraverse() + segment.isZMovement() * 2
-
-    def getSegmentColorVector(self, segment: LineSegment) -> QVector3D:
-        return Util.colorToVector(self.getSegmentColor(segment))
-
-    def getSegmentColor(self, segment: LineSegment) -> QColor:
-        if segment.drawn():
-            return self.m_colorDrawn  # QVector3D(0.85, 0.85, 0.85)
-        elif segment.isHightlight():
-            return self.m_colorHighlight  # QVector3D(0.57, 0.51, 0.9)
-        elif segment.isFastTraverse():
-            return self.m_colorNormal  # QVector3D(0.0, 0.0, 0.0)
-        elif segment.isZMovement():
-            return self.m_colorZMovement  # QVector3D(1.0, 0.0, 0.0)
-        elif self.m_grayscaleSegments:
+    def getSegmentTypes(self) -> np.ndarray:
+        segments = self.m_viewParser.getLineSegments()
+        return segments.isFastTraverse() + segments.isZMovement() * 2
+
+    def getSegmentColors(self, indexes: np.ndarray) -> np.ndarray:
+        """
+        The colors (n x 3) of segments, the first matching state wins:
+        drawn, highlight, fast traverse, z movement, grayscale, normal
+        """
+        segments = self.m_viewParser.getLineSegments()
+
+        colors = np.empty((len(indexes), 3), dtype=np.float32)
+        colors[:] = Util.colorToVector(self.m_colorNormal).toTuple()
+
+        if self.m_grayscaleSegments:
             if self.m_grayscaleCode == GcodeDrawer.GrayscaleCode.S:
-                return QColor.fromHsl(
-                    0,
-                    0,
-                    qBound(
-                        0,
-                        255
-                        - 255.0
-                        / (self.m_grayscaleMax - self.m_grayscaleMin)
-                        * segment.getSpindleSpeed(),
-                        255,
-                    ),
-                )
-            elif self.m_grayscaleCode == GcodeDrawer.GrayscaleCode.Z:
-                return QColor.fromHsl(
-                    0,
-                    0,
-                    qBound(
-                        0,
-                        255
-                        - 255.0
-                        / (self.m_grayscaleMax - self.m_grayscaleMin)
-                        * segment.getStart().z(),
-                        255,
-                    ),
-                )
+                values = segments.spindleSpeeds()[indexes]
+            else:
+                values = segments.starts()[indexes, 2]
+            lightness = np.clip(
+                255 - 255.0 / (self.m_grayscaleMax - self.m_grayscaleMin) * values,
+                0,
+                255,
+            )
+            colors[:] = (lightness.astype(int) / 255.0)[:, None]
+
+        flags = segments.flags()[indexes]
+
+        for states, color in (
+            ((flags & segments.Z_MOVEMENT) != 0, self.m_colorZMovement),
+            ((flags & segments.FAST_TRAVERSE) != 0, self.m_colorNormal),
+            (segments.highlights()[indexes], self.m_colorHighlight),
+            (segments.drawn()[indexes], self.m_colorDrawn),
+        ):
+            colors[states] = Util.colorToVector(color).toTuple()
+
+        return colors
+
+    def setImagePixelColors(self, image: QImage, indexes: np.ndarray):
+        segments = self.m_viewParser.getLineSegments()
+
+        pixelSize = self.m_viewParser.getMinLength()
+        origin = self.m_viewParser.getMinimumExtremes()
+
+        ends = segments.ends()[indexes]
+        colors = (self.getSegmentColors(indexes) * 255).astype(int)
 
-        return self.m_colorNormal  # QVector3D(0.0, 0.0, 0.0)
+        for end, color in zip(ends, colors):
+            self.setImagePixelColor(
+                image,
+                (end[0] - origin.x()) / pixelSize,
+                (end[1] - origin.y()) / pixelSize,
+                QColor(*color.tolist()).rgb(),
+            )
 
-    def setImagePixelColor(image: QImage, x: float, y: float, color: int):
+    @classmethod
+    def setImagePixelColor(cls, image: QImage, x: float, y: float, color: int):
         """
         QRgb = int
         """
@@ -0,0 +1,199 @@
+# This file is a part of "pycut" application.
+
+# Copyright 2020-2030 Xavier Marduel
+
+from typing import List
+from typing import Tuple
+
+import numpy as np
+
+
+class LinesPyramid:
+    """
+    Levels of detail of the lines of a toolpath (GL_LINES vertex pairs),
+    computed once with Douglas-Peucker.
+
+    The connected lines of the same type are polylines. Douglas-Peucker
+    is run once on all of them (without tolerance), level by level of
+    its recursion: each point gets its significance, the largest
+    tolerance for which Douglas-Peucker keeps it. A level of detail of
+    tolerance t is then the points of significance > t.
+
+    A level is given as the vertex indexes of its lines in the vertex
+    array of the lines: a simplified line goes from the start vertex of
+    its first line to the end vertex of its last line.
+    """
+
+    # polylines are cut after this number of lines (bounded recursion)
+    MAX_POLYLINE_LINES = 1024
+
+    # the tolerances of the levels, relatively to the size of the toolpath
+    FINEST_TOLERANCE = 2**-14
+    COARSEST_TOLERANCE = 2**-6
+    TOLERANCE_STEP = 4
+
+    # a level is kept when it has this ratio of the lines of the finer one
+    MAX_LINES_RATIO = 0.75
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, types: np.ndarray):
+        """
+        starts, ends: the points (n x 3) of the lines, types: their types
+        (a polyline has lines of the same type)
+        """
+        self.m_nbLines = len(types)
+        self.m_significances = np.empty(0)
+        self.m_size = 0.0
+
+        if self.m_nbLines == 0:
+            return
+
+        # the polylines: the lines [firsts[k], lasts[k]]
+        newPolylines = np.any(starts[1:] != ends[:-1], axis=1) | (
+            types[1:] != types[:-1]
+        )
+        newPolylines |= np.arange(1, self.m_nbLines) % self.MAX_POLYLINE_LINES == 0
+        firsts = np.concatenate([[0], np.flatnonzero(newPolylines) + 1])
+        lasts = np.concatenate([firsts[1:] - 1, [self.m_nbLines - 1]])
+
+        # the points: the start of each polyline, then the ends of its lines
+        nbPoints = self.m_nbLines + len(firsts)
+        pointLines = np.arange(self.m_nbLines) + np.repeat(
+            np.arange(1, len(firsts) + 1), lasts - firsts + 1
+        )
+        polylineStarts = firsts + np.arange(len(firsts))
+
+        points = np.empty((nbPoints, 3), dtype=np.float64)
+        points[pointLines] = ends
+        points[polylineStarts] = starts[firsts]
+
+        extent = np.nanmax(points, axis=0) - np.nanmin(points, axis=0)
+        self.m_size = float(np.linalg.norm(np.nan_to_num(extent)))
+
+        significances = self.significances(
+            points,
+            polylineStarts,
+            pointLines[lasts],
+            self.m_size * self.FINEST_TOLERANCE,
+        )
+
+        # the significance of the end point of each line
+        self.m_significances = significances[pointLines]
+
+    @classmethod
+    def significances(
+        cls,
+        points: np.ndarray,
+        firsts: np.ndarray,
+        lasts: np.ndarray,
+        minTolerance: float = 0.0,
+    ) -> np.ndarray:
+        """
+        The Douglas-Peucker significance of the points (m x 3) of the
+        polylines [firsts[k], lasts[k]]: inf for their ends. The
+        significances up to minTolerance are not computed (0).
+
+        All the intervals of a level of the recursion are done at once.
+        """
+        significances = np.zeros(len(points))
+        significances[firsts] = np.inf
+        significances[lasts] = np.inf
+
+        # the intervals to split, with the significance of their parent
+        begins = firsts
+        ends = lasts
+        parents = np.full(len(firsts), np.inf)
+
+        while True:
+            inner = ends - begins > 1
+            begins, ends, parents = begins[inner], ends[inner], parents[inner]
+            if len(begins) == 0:
+                break
+
+            # the inner points of each interval and their distance to it
+            counts = ends - begins - 1
+            offsets = np.cumsum(counts) - counts
+            intervals = np.repeat(np.arange(len(begins)), counts)
+            inners = np.arange(len(intervals)) - offsets[intervals] + 1
+            inners += begins[intervals]
+
+            distances = cls.pointSegmentDistances2(
+                points[inners], points[begins], points[ends], intervals
+            )
+            distances[np.isnan(distances)] = np.inf
+
+            # the farthest point (the first one) of each interval
+            maxDistances = np.maximum.reduceat(distances, offsets)
+            farthest = np.flatnonzero(distances == maxDistances[intervals])
+            farthest = farthest[
+                np.concatenate(
+                    [[True], intervals[farthest[1:]] != intervals[farthest[:-1]]]
+                )
+            ]
+            farthest = inners[farthest]
+
+            # not more significant than its parent
+            maxDistances = np.sqrt(maxDistances)
+            parents = np.minimum(parents, maxDistances)
+            significances[farthest] = parents
+
+            # the intervals of the points not on the chord are split
+            split = maxDistances > minTolerance
+            begins, ends = (
+                np.concatenate([begins[split], farthest[split]]),
+                np.concatenate([farthest[split], ends[split]]),
+            )
+            parents = np.concatenate([parents[split], parents[split]])
+
+        return significances
+
+    @classmethod
+    def pointSegmentDistances2(
+        cls, points: np.ndarray, a: np.ndarray, b: np.ndarray, segments: np.ndarray
+    ) -> np.ndarray:
+        """
+        The squared distances of the points (n x 3) to their segments
+        [a[segments], b[segments]]
+        """
+        ab = b - a
+        lengths2 = np.einsum("ij,ij->i", ab, ab)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ab /= np.where(lengths2 > 0, lengths2, 1)[:, None]
+
+        ap = points - a[segments]
+        t = np.einsum("ij,ij->i", ap, ab[segments])
+        np.clip(t, 0, 1, out=t)
+
+        ap -= t[:, None] * (b - a)[segments]
+        return np.einsum("ij,ij->i", ap, ap)
+
+    def lineIndexes(self, tolerance: float) -> np.ndarray:
+        """
+        The vertex indexes (uint32, 2 per line) of the lines of the level
+        of detail with this tolerance
+        """
+        lasts = np.flatnonzero(self.m_significances > tolerance)
+        firsts = np.concatenate([[0], lasts[:-1] + 1])
+
+        indexes = np.empty((len(lasts), 2), dtype=np.uint32)
+        indexes[:, 0] = 2 * firsts
+        indexes[:, 1] = 2 * lasts + 1
+
+        return indexes.reshape(-1)
+
+    def levels(self) -> List[Tuple[float, np.ndarray]]:
+        """
+        The levels of detail, (tolerance, vertex indexes) from the finest:
+        each one has at most MAX_LINES_RATIO of the lines of the finer one
+        """
+        levels = []
+        nbLines = self.m_nbLines
+
+        tolerance = self.m_size * self.FINEST_TOLERANCE
+        while tolerance > 0 and tolerance <= self.m_size * self.COARSEST_TOLERANCE:
+            indexes = self.lineIndexes(tolerance)
+            if len(indexes) // 2 <= nbLines * self.MAX_LINES_RATIO:
+                levels.append((tolerance, indexes))
+                nbLines = len(indexes) // 2
+            tolerance *= self.TOLERANCE_STEP
+
+        return levels
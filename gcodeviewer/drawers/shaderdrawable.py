@@ -1,6 +1,7 @@
 ﻿import ctypes
 
 from typing import List
+from typing import Tuple
 
 from PySide6.QtGui import QVector3D
 from PySide6.QtGui import QOpenGLFunctions
@@ -78,6 +79,12 @@ class ShaderDrawable(QOpenGLFunctions):
     sizeof_vertexdata = 36  # the "stride" of the vertex array: 3xQVector3D
     sizeof_vector3D = 12  # size of every attribute in a VertexData item
 
+    # changed vertices closer than this are written in the same range
+    VERTEX_RANGES_GAP = 256
+
+    # the error allowed on the lines by a level of detail
+    LOD_TOLERANCE_PIXELS = 0.5
+
     def __init__(self):
         """ """
         QOpenGLFunctions.__init__(self)
@@ -87,12 +94,23 @@ class ShaderDrawable(QOpenGLFunctions):
         self.m_lineWidth = 1.0
         self.m_pointSize = 1.0
         self.m_texture: QOpenGLTexture = None
-        self.m_lines: List[VertexData] = []
-        self.m_points: List[VertexData] = []
-        self.m_triangles: List[VertexData] = []
+        # lists of VertexData or (n x 9) float32 arrays
+        self.m_lines: List[VertexData] | np.ndarray = []
+        self.m_points: List[VertexData] | np.ndarray = []
+        self.m_triangles: List[VertexData] | np.ndarray = []
+        # levels of detail of the lines: (tolerance, vertex indexes of their
+        # lines) from the finest, drawn from the index buffer
+        self.m_lineLevels: List[Tuple[float, np.ndarray]] = []
+        # the size of a pixel in the view (0: the lines are drawn exactly)
+        self.m_pixelSize = 0.0
 
         self.m_vbo = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
         self.m_vao = QOpenGLVertexArrayObject()
+        self.m_ibo = QOpenGLBuffer(QOpenGLBuffer.IndexBuffer)
+        # the offsets of the levels of detail in the index buffer
+        self.m_lineLevelOffsets: List[int] = []
+        # the number of vertices in the vertex buffer
+        self.m_vboVertexCount = 0
 
     def init(self):
         # Init openGL functions
@@ -101,6 +119,7 @@ class ShaderDrawable(QOpenGLFunctions):
         # Create buffers
         self.m_vao.create()
         self.m_vbo.create()
+        self.m_ibo.create()
 
     def update(self):
         self.m_needsUpdateGeometry = True
@@ -123,17 +142,21 @@ class ShaderDrawable(QOpenGLFunctions):
         # Update vertex buffer
         if self.updateData():
             # Fill vertices buffer
-            vertexData = []
-            vertexData += self.m_triangles
-            vertexData += self.m_lines
-            vertexData += self.m_points
-
             # python handling of vbo - with numpy -
-            np_array = VertexData.VertexDataListToNumPy(vertexData)
+            np_array = np.concatenate(
+                [
+                    self.vertexArray(self.m_triangles),
+                    self.vertexArray(self.m_lines),
+                    self.vertexArray(self.m_points),
+                ]
+            )
             np_bytes = np_array.tobytes()
 
             self.m_vbo.allocate(len(np_bytes))
             self.m_vbo.write(0, np_bytes, len(np_bytes))
+            self.m_vboVertexCount = len(np_array)
+
+            self.updateLineLevels()
         else:
             self.m_vbo.release()
             if self.m_vao.isCreated():
@@ -178,9 +201,102 @@ class ShaderDrawable(QOpenGLFunctions):
 
         self.m_needsUpdateGeometry = False
 
+    @classmethod
+    def vertexArray(cls, vertices: List[VertexData] | np.ndarray) -> np.ndarray:
+        """
+        The vertices as a (n x 9) array: the drawers give a list of
+        VertexData, or directly the array
+        """
+        if isinstance(vertices, np.ndarray):
+            return vertices
+
+        return VertexData.VertexDataListToNumPy(vertices).reshape(-1, 9)
+
+    def updateLineLevels(self):
+        """
+        Fills the index buffer with the indexes of the levels of detail
+        """
+        first = len(self.m_triangles)
+
+        self.m_lineLevelOffsets = []
+        offset = 0
+        for _, indexes in self.m_lineLevels:
+            self.m_lineLevelOffsets.append(offset)
+            offset += indexes.nbytes
+
+        if offset == 0:
+            return
+
+        np_bytes = np.concatenate(
+            [indexes + np.uint32(first) for _, indexes in self.m_lineLevels]
+        ).tobytes()
+
+        self.m_ibo.bind()
+        self.m_ibo.allocate(len(np_bytes))
+        self.m_ibo.write(0, np_bytes, len(np_bytes))
+        self.m_ibo.release()
+
+    def lineLevel(self) -> int:
+        """
+        The coarsest level of detail close enough to the lines at the
+        current pixel size, -1: the lines themselves
+        """
+        level = -1
+        for k, (tolerance, _) in enumerate(self.m_lineLevels):
+            if tolerance <= self.m_pixelSize * self.LOD_TOLERANCE_PIXELS:
+                level = k
+
+        return level
+
+    def pixelSize(self) -> float:
+        return self.m_pixelSize
+
+    def setPixelSize(self, pixelSize: float):
+        self.m_pixelSize = pixelSize
+
+    @classmethod
+    def vertexRanges(cls, indexes: np.ndarray, gap: int = VERTEX_RANGES_GAP):
+        """
+        The ranges [begin, end) covering the (sorted) indexes of vertices,
+        the gaps up to 'gap' vertices between them included
+        """
+        if len(indexes) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        breaks = np.flatnonzero(np.diff(indexes) > gap + 1)
+        begins = indexes[np.concatenate([[0], breaks + 1])]
+        ends = indexes[np.concatenate([breaks, [len(indexes) - 1]])] + 1
+
+        return begins, ends
+
+    def updateLineVertices(self, indexes: np.ndarray) -> bool:
+        """
+        Writes the vertices 'indexes' (sorted) of the lines in the bound
+        vertex buffer, range by range (glBufferSubData): the rest of the
+        buffer is not sent again.
+
+        False when the buffer does not hold the current vertices: it has to
+        be filled again.
+        """
+        if self.m_vboVertexCount != self.getVertexCount():
+            return False
+
+        lines = self.vertexArray(self.m_lines)
+        first = len(self.m_triangles)
+
+        for begin, end in zip(*self.vertexRanges(indexes)):
+            data = lines[begin:end].tobytes()
+            self.m_vbo.write(
+                int(first + begin) * self.sizeof_vertexdata, data, len(data)
+            )
+
+        return True
+
     def updateData(self) -> bool:
         """
         Test data
+
+        True: the vertex buffer is filled with all the vertices
         """
         self.m_lines = []
 
@@ -236,7 +352,21 @@ class ShaderDrawable(QOpenGLFunctions):
 
         if len(self.m_lines) != 0:
             self.glLineWidth(self.m_lineWidth)
-            self.glDrawArrays(GL.GL_LINES, len(self.m_triangles), len(self.m_lines))
+
+            level = self.lineLevel()
+            if level >= 0 and len(self.m_lineLevelOffsets) == len(self.m_lineLevels):
+                self.m_ibo.bind()
+                self.glDrawElements(
+                    GL.GL_LINES,
+                    len(self.m_lineLevels[level][1]),
+                    GL.GL_UNSIGNED_INT,
+                    self.m_lineLevelOffsets[level],
+                )
+                self.m_ibo.release()
+            else:
+                self.glDrawArrays(
+                    GL.GL_LINES, len(self.m_triangles), len(self.m_lines)
+                )
 
         if len(self.m_points) != 0:
             self.glDrawArrays(
@@ -0,0 +1,111 @@
+# This file is a part of "pycut" application.
+
+# Copyright 2020-2030 Xavier Marduel
+
+from typing import List
+
+from PySide6.QtCore import QThread
+from PySide6.QtCore import Signal
+
+from PySide6.QtGui import QVector3D
+
+from gcodeviewer.parser.gcodeparser import GcodeParser
+from gcodeviewer.parser.gcodepreprocessorutils import GcodePreprocessorUtils
+
+from gcodeviewer.tables.gcodetablemodel import GCodeItem
+
+CHUNKLINES = 1000
+
+
+class GcodeLoader(QThread):
+    """
+    Parses a gcode program in a background thread, by chunks of lines.
+
+    For each chunk, 'chunkLoaded' gives the table items of its lines and
+    the parser point segments that are complete (the last one can still
+    get a dwell from the next line: it comes with the next chunk).
+    'loaded' is emitted at the end, after the last chunk, also when the
+    loading is canceled.
+    """
+
+    chunkLoaded = Signal(object, object, int)  # items, point segments, nb lines done
+    loaded = Signal()
+
+    def __init__(
+        self,
+        gcode: str,
+        traverseSpeed: float,
+        initialPoint: QVector3D = None,
+        chunkLines: int = CHUNKLINES,
+        parent=None,
+    ):
+        super().__init__(parent)
+
+        self.m_lines = gcode.split("\n")
+        self.m_chunkLines = chunkLines
+        self.m_canceled = False
+
+        self.m_parser = GcodeParser()
+        self.m_parser.setTraverseSpeed(traverseSpeed)
+        if initialPoint is not None:
+            self.m_parser.reset(initialPoint)
+
+    def nbLines(self) -> int:
+        return len(self.m_lines)
+
+    def parser(self) -> GcodeParser:
+        return self.m_parser
+
+    def cancel(self):
+        """
+        the loading stops after the current chunk
+        """
+        self.m_canceled = True
+
+    def isCanceled(self) -> bool:
+        return self.m_canceled
+
+    def run(self):
+        gp = self.m_parser
+        points = gp.getPointSegmentList()
+
+        nbSent = 0
+        nbLinesDone = 0
+
+        while nbLinesDone < len(self.m_lines) and not self.m_canceled:
+            lines = self.m_lines[nbLinesDone : nbLinesDone + self.m_chunkLines]
+            items = self.parseLines(lines)
+            nbLinesDone += len(lines)
+
+            nbPoints = len(points) - 1
+            self.chunkLoaded.emit(items, points[nbSent:nbPoints], nbLinesDone)
+            nbSent = nbPoints
+
+        self.chunkLoaded.emit([], points[nbSent:], nbLinesDone)
+        self.loaded.emit()
+
+    def parseLines(self, lines: List[str]) -> List[GCodeItem]:
+        gp = self.m_parser
+        items = []
+
+        for command in lines:
+            # Trim command
+            trimmed = command.strip()
+
+            if len(trimmed) > 0:
+                # Split command
+                stripped = GcodePreprocessorUtils.removeComment(command)
+                args = GcodePreprocessorUtils.splitCommand(stripped)
+
+                gp.addCommand(args)
+
+                item = GCodeItem()
+
+                item.command = trimmed
+                item.state = GCodeItem.States.InQueue
+                item.line = gp.getCommandNumber()
+                item.args = args
+
+                items.append(item)
+
+        return items
@@ -11,6 +11,9 @@ import re
 
 from typing import List
 from typing import Any
+from typing import Tuple
+
+import numpy as np
 
 from PySide6.QtGui import QMatrix4x4
 from PySide6.QtGui import QVector3D
@@ -64,12 +67,14 @@ class GcodePreprocessorUtils:
         res = command
 
         # Remove any comments within ( parentheses ) using regex "\([^\(]*\)"
-        match = cls.rx1_comment_parenthesis.match(command)
-        if match.hasMatch():
-            # comment = match.captured(0)
-            idx = match.capturedStart()
-            len = match.capturedLength()
-            res = res[:idx] + res[idx + len :]
+        # (no regex for the lines without comment)
+        if "(" in command:
+            match = cls.rx1_comment_parenthesis.match(command)
+            if match.hasMatch():
+                # comment = match.captured(0)
+                idx = match.capturedStart()
+                len = match.capturedLength()
+                res = res[:idx] + res[idx + len :]
 
         # Remove any comment beginning with ';' using regex ";.*"
         if ";" in res:
@@ -519,7 +524,7 @@ class GcodePreprocessorUtils:
         numPoints = 0
 
         if arcDegreeMode and arcPrecision > 0:
-            numPoints = max(1.0, sweep / (cls.M_PI * arcPrecision / 180))
+            numPoints = int(max(1.0, sweep / (cls.M_PI * arcPrecision / 180)))
         else:
             if arcPrecision <= 0 and minArcLength > 0:
                 arcPrecision = minArcLength
@@ -590,3 +595,174 @@ class GcodePreprocessorUtils:
         segments.append(m.map(p2))
 
         return segments
+
+    # the permutation and signs of the coordinates rotating each plane
+    # (XY, ZX, YZ) to XY, as the matrices of generatePointsAlongArcBDring
+    # (exact, without the nan of a coordinate spreading to the others)
+    PLANE_TO_XY = (
+        np.array([[0, 1, 2], [0, 2, 1], [2, 1, 0]]),
+        np.array([[1, 1, 1], [1, -1, 1], [-1, 1, 1]]),
+    )
+    PLANE_FROM_XY = (
+        np.array([[0, 1, 2], [0, 2, 1], [2, 1, 0]]),
+        np.array([[1, 1, 1], [1, 1, -1], [1, 1, -1]]),
+    )
+
+    @classmethod
+    def generatePointsAlongArcs(
+        cls,
+        planes: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        centers: np.ndarray,
+        clockwise: np.ndarray,
+        radii: np.ndarray,
+        minArcLength: float,
+        arcPrecision: float,
+        arcDegreeMode: bool,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        generatePointsAlongArcBDring for a batch of n arcs: planes (values
+        of PointSegment.Plane), starts, ends, centers (n x 3), clockwise and
+        radii (0: from the center) as arrays.
+
+        Returns the points of the arcs one after the other (m x 3) and the
+        number of points of each arc (0 for an arc without center). As with
+        generatePointsAlongArcBDring_Num, the first point of an arc is at its
+        start angle (its start in the plane, z already incremented) and the
+        last one is its end point.
+        """
+        planes = np.asarray(planes, dtype=np.int64)
+        clockwise = np.asarray(clockwise, dtype=bool)
+
+        def rotate(points, rotation):
+            permutations, signs = rotation
+            points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+            return (
+                np.take_along_axis(points, permutations[planes], axis=1)
+                * signs[planes]
+            )
+
+        starts = rotate(starts, cls.PLANE_TO_XY)
+        ends = rotate(ends, cls.PLANE_TO_XY)
+        centers = rotate(centers, cls.PLANE_TO_XY)
+
+        valid = ~np.isnan(centers).any(axis=1)
+
+        # Calculate radius if necessary (negative: the R of a long arc)
+        deltas = starts[:, :2] - centers[:, :2]
+        radii = np.fabs(np.asarray(radii, dtype=np.float64))
+        radii = np.where(radii == 0, np.hypot(deltas[:, 0], deltas[:, 1]), radii)
+
+        startAngles = cls.getAngles(centers, starts)
+        endAngles = cls.getAngles(centers, ends)
+        sweeps = cls.calculateSweeps(startAngles, endAngles, clockwise)
+
+        # Number of points (an int in Candle: truncated in degree mode)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if arcDegreeMode and arcPrecision > 0:
+                numPoints = np.maximum(1.0, sweeps / (cls.M_PI * arcPrecision / 180))
+                numPoints = np.floor(numPoints)
+            else:
+                if arcPrecision <= 0 and minArcLength > 0:
+                    arcPrecision = minArcLength
+
+                numPoints = np.ceil(sweeps * radii / arcPrecision)
+
+        numPoints = np.where(valid, numPoints, 0)
+        numPoints = np.nan_to_num(numPoints, nan=1, posinf=1)
+        numPoints = np.maximum(numPoints, 1).astype(np.int64)
+
+        # the points of each arc and its end point
+        counts = np.where(valid, numPoints + 1, 0)
+
+        arcIndexes = np.repeat(np.arange(len(counts)), counts)
+        firsts = np.cumsum(counts) - counts
+        i = np.arange(len(arcIndexes)) - firsts[arcIndexes]
+
+        n = numPoints[arcIndexes]
+        steps = i * sweeps[arcIndexes] / n
+        angles = startAngles[arcIndexes] + np.where(
+            clockwise[arcIndexes], -steps, steps
+        )
+        angles = np.where(angles >= cls.M_PI * 2, angles - cls.M_PI * 2, angles)
+
+        radius = radii[arcIndexes]
+        center = centers[arcIndexes]
+        start = starts[arcIndexes]
+        end = ends[arcIndexes]
+        zIncrements = (end[:, 2] - start[:, 2]) / n
+
+        points = np.empty((len(arcIndexes), 3))
+        points[:, 0] = np.cos(angles) * radius + center[:, 0]
+        points[:, 1] = np.sin(angles) * radius + center[:, 1]
+        points[:, 2] = start[:, 2] + (i + 1) * zIncrements
+
+        isEnd = i == n
+        points[isEnd] = end[isEnd]
+
+        planes = planes[arcIndexes]
+        permutations, signs = cls.PLANE_FROM_XY
+        points = (
+            np.take_along_axis(points, permutations[planes], axis=1) * signs[planes]
+        )
+
+        return points, counts
+
+    @classmethod
+    def getAngles(cls, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        getAngle for arrays of points (n x 3)
+        """
+        deltaX = ends[:, 0] - starts[:, 0]
+        deltaY = ends[:, 1] - starts[:, 1]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            atan = np.fabs(np.arctan(deltaY / deltaX))
+
+        return np.select(
+            [
+                (deltaX > 0) & (deltaY >= 0),
+                (deltaX < 0) & (deltaY >= 0),
+                (deltaX < 0) & (deltaY < 0),
+                (deltaX > 0) & (deltaY < 0),
+                (deltaX == 0) & (deltaY > 0),
+                deltaX == 0,
+            ],
+            [
+                atan,
+                cls.M_PI - atan,
+                cls.M_PI + atan,
+                cls.M_PI * 2 - atan,
+                cls.M_PI / 2.0,
+                cls.M_PI * 3.0 / 2.0,
+            ],
+            0.0,
+        )
+
+    @classmethod
+    def calculateSweeps(
+        cls, startAngles: np.ndarray, endAngles: np.ndarray, isCw: np.ndarray
+    ) -> np.ndarray:
+        """
+        calculateSweep for arrays of angles
+        """
+        # Full circle
+        fullCircles = startAngles == endAngles
+
+        # Account for full circles and end angles of 0/360
+        endAngles = np.where(endAngles == 0, cls.M_PI * 2, endAngles)
+
+        sweeps = np.select(
+            [
+                ~isCw & (endAngles < startAngles),
+                isCw & (endAngles > startAngles),
+            ],
+            [
+                (cls.M_PI * 2 - startAngles) + endAngles,
+                (cls.M_PI * 2 - endAngles) + startAngles,
+            ],
+            np.fabs(endAngles - startAngles),
+        )
+
+        return np.where(fullCircles, cls.M_PI * 2, sweeps)
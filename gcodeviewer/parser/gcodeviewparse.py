@@ -8,13 +8,17 @@
 
 from functools import singledispatchmethod
 from typing import List
+from typing import Tuple
+
+import numpy as np
 
 from PySide6.QtGui import QVector3D
 
 from PySide6 import QtCore
 from PySide6.QtCore import qIsNaN
 
-from gcodeviewer.parser.linesegment import LineSegment
+from gcodeviewer.parser.linesegments import LineSegments
+from gcodeviewer.parser.pointsegment import PointSegment
 from gcodeviewer.parser.gcodeparser import GcodeParser
 from gcodeviewer.parser.gcodepreprocessorutils import GcodePreprocessorUtils
 
@@ -34,12 +38,10 @@ class GcodeViewParse:
         self.m_max = QVector3D(qQNaN(), qQNaN(), qQNaN())
         self.m_minLength = qQNaN()
 
-        self.m_lines: List[LineSegment] = []
-        self.m_lineIndexes: List[List[int]] = [[]]
+        self.m_lines = LineSegments()
 
         # Parsing state.
         self.lastPoint: QVector3D = None
-        self.currentLine = 0  # for assigning line numbers to segments.
 
         # Debug
         self.debug = True
@@ -61,7 +63,7 @@ class GcodeViewParse:
 
     def toObjRedux(
         self, gcode: List[str], arcPrecision: float, arcDegreeMode: bool
-    ) -> List[LineSegment]:
+    ) -> LineSegments:
         gp = GcodeParser()
 
         for s in gcode:
@@ -69,25 +71,39 @@ class GcodeViewParse:
 
         return self.getLinesFromParser(gp, arcPrecision, arcDegreeMode)
 
-    def getLineSegmentList(self) -> List[LineSegment]:
+    def getLineSegments(self) -> LineSegments:
         return self.m_lines
 
     def getLinesFromParser(
         self, gp: GcodeParser, arcPrecision: float, arcDegreeMode: bool
-    ) -> List[LineSegment]:
-        psl = gp.getPointSegmentList()
+    ) -> LineSegments:
+        # Restart the lines
+        self.lastPoint = None
+
+        return self.addPointSegments(
+            gp.getPointSegmentList(), arcPrecision, arcDegreeMode
+        )
+
+    def addPointSegments(
+        self, psl: List[PointSegment], arcPrecision: float, arcDegreeMode: bool
+    ) -> LineSegments:
+        """
+        Continues the lines with the next point segments of a parser: the
+        program can be given in consecutive parts.
+        """
         # For a line segment list ALL arcs must be converted to lines.
         minArcLength = 0.1
 
-        start = None
+        start = self.lastPoint
         end = None
 
-        # Prepare segments indexes
-        self.m_lineIndexes = [[] for _ in range(len(psl))]
+        # the columns of the new segments, one row per point segment (the
+        # rows of the arcs are expanded after)
+        points = []  # start and end
+        props = []  # speed, spindle speed, dwell, line number, flags
+        arcs = []  # row, plane, center, clockwise, radius
 
-        lineIndex = 0
-        for segment in psl:
-            ps = segment
+        for ps in psl:
             isMetric = ps.isMetric()
             ps.convertToMetric()
 
@@ -95,108 +111,149 @@ class GcodeViewParse:
 
             # start is null for the first iteration.
             if start != None:
-                # Expand arc for graphics.
+                flags = (
+                    ps.m_isFastTraverse * LineSegments.FAST_TRAVERSE
+                    | ps.m_isZMovement * LineSegments.Z_MOVEMENT
+                    | ps.m_isAbsolute * LineSegments.ABSOLUTE
+                )
+
+                # Arc: expanded for graphics with all the arcs of the part
                 if ps.isArc():
-                    points = GcodePreprocessorUtils.generatePointsAlongArcBDring(
-                        ps.plane(),
-                        start,
-                        end,
-                        ps.center(),
-                        ps.isClockwise(),
-                        ps.getRadius(),
-                        minArcLength,
-                        arcPrecision,
-                        arcDegreeMode,
+                    center = ps.center()
+                    arcs.append(
+                        (
+                            len(points),
+                            ps.plane().value,
+                            center.x(),
+                            center.y(),
+                            center.z(),
+                            ps.isClockwise(),
+                            ps.getRadius(),
+                        )
+                    )
+                    flags |= (
+                        LineSegments.ARC
+                        | ps.isClockwise() * LineSegments.CLOCKWISE
+                        | isMetric * LineSegments.METRIC
                     )
-                    # Create line segments from points.
-                    if len(points) > 0:
-                        startPoint = start
-                        for nextPoint in points:
-                            if nextPoint == startPoint:
-                                continue
-                            ls = LineSegment()
-                            # ls.setIsArc(ps.isArc())
-                            # ls.setIsClockwise(ps.isClockwise())
-                            # ls.setPlane(ps.plane())
-                            # ls.setIsFastTraverse(ps.isFastTraverse())
-                            # ls.setIsZMovement(ps.isZMovement())
-                            # ls.setIsMetric(isMetric)
-                            # ls.setIsAbsolute(ps.isAbsolute())
-                            # ls.setSpeed(ps.getSpeed())
-                            # ls.setSpindleSpeed(ps.getSpindleSpeed())
-                            # ls.setDwell(ps.getDwell())
-                            # self.testExtremes(nextPoint)
-
-                            ls.m_isArc = ps.m_isArc
-                            ls.m_isClockwise = ps.isClockwise()
-                            ls.m_plane = ps.m_plane
-                            ls.m_isFastTraverse = ps.m_isFastTraverse
-                            ls.m_isZMovement = ps.m_isZMovement
-                            ls.m_isMetric = isMetric
-                            ls.m_isAbsolute = ps.m_isAbsolute
-                            ls.m_speed = ps.m_speed
-                            ls.m_spindleSpeed = ps.m_spindleSpeed
-                            ls.m_dwell = ps.m_dwell
-
-                            ls.m_first = startPoint
-                            ls.m_second = nextPoint
-                            ls.m_lineNumber = lineIndex
-
-                            self.testExtremes(nextPoint)
-                            self.m_lines.append(ls)
-                            self.m_lineIndexes[ps.getLineNumber()].append(
-                                len(self.m_lines) - 1
-                            )
-                            startPoint = nextPoint
-
-                        lineIndex += 1
 
                 # Line
                 else:
-                    ls = LineSegment()
-                    ls.m_first = start
-                    ls.m_second = end
-                    ls.m_lineNumber = lineIndex
-
-                    lineIndex += 1
-                    # ls.setIsArc(ps.isArc())
-                    # ls.setIsFastTraverse(ps.isFastTraverse())
-                    # ls.setIsZMovement(ps.isZMovement())
-                    # ls.setIsMetric(isMetric)
-                    # ls.setIsAbsolute(ps.isAbsolute())
-                    # ls.setSpeed(ps.getSpeed())
-                    # ls.setSpindleSpeed(ps.getSpindleSpeed())
-                    # ls.setDwell(ps.getDwell())
-
-                    ls.m_isArc = ps.m_isArc
-                    ls.m_isFastTraverse = ps.m_isFastTraverse
-                    ls.m_isZMovement = ps.m_isZMovement
-                    ls.m_isMetric = ps.m_isMetric
-                    ls.m_isAbsolute = ps.m_isAbsolute
-                    ls.m_speed = ps.m_speed
-                    ls.m_spindleSpeed = ps.m_spindleSpeed
-                    ls.m_dwell = ps.m_dwell
-
-                    self.testExtremes(end)
-                    self.testLength(start, end)
-                    self.m_lines.append(ls)
-                    self.m_lineIndexes[ps.getLineNumber()].append(len(self.m_lines) - 1)
+                    flags |= ps.m_isMetric * LineSegments.METRIC
+
+                points.append(
+                    (start.x(), start.y(), start.z(), end.x(), end.y(), end.z())
+                )
+                props.append(
+                    (
+                        ps.m_speed,
+                        ps.m_spindleSpeed,
+                        ps.m_dwell,
+                        ps.getLineNumber(),
+                        flags,
+                    )
+                )
 
             start = end
 
-        return self.m_lines
+        self.lastPoint = start
+
+        if len(points) == 0:
+            return self.m_lines
+
+        points = np.array(points, dtype=np.float64).reshape(-1, 2, 3)
+        props = np.array(props, dtype=np.float64)
+
+        if len(arcs) > 0:
+            points, props = self.expandArcs(
+                points,
+                props,
+                np.array(arcs, dtype=np.float64),
+                minArcLength,
+                arcPrecision,
+                arcDegreeMode,
+            )
+
+        isArc = (props[:, 4].astype(np.uint8) & LineSegments.ARC) != 0
+
+        self.m_lines.append(
+            points[:, 0],
+            points[:, 1],
+            props[:, 0],
+            props[:, 1],
+            props[:, 2],
+            props[:, 3],
+            props[:, 4],
+        )
+
+        self.testExtremes(points[:, 1])
+        self.testLengths(
+            np.linalg.norm(points[~isArc, 1] - points[~isArc, 0], axis=1)
+        )
 
-    def getLines(self) -> List[LineSegment]:
         return self.m_lines
 
-    def getLinesIndexes(self) -> List[List[int]]:
-        return self.m_lineIndexes
+    def expandArcs(
+        self,
+        points: np.ndarray,
+        props: np.ndarray,
+        arcs: np.ndarray,
+        minArcLength: float,
+        arcPrecision: float,
+        arcDegreeMode: bool,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Replaces the rows of the arcs (start and end points, props) by the
+        rows of their line segments, generated for all the arcs at once.
+        """
+        rows = arcs[:, 0].astype(np.int64)
+
+        arcPoints, counts = GcodePreprocessorUtils.generatePointsAlongArcs(
+            arcs[:, 1],
+            points[rows, 0],
+            points[rows, 1],
+            arcs[:, 2:5],
+            arcs[:, 5] != 0,
+            arcs[:, 6],
+            minArcLength,
+            arcPrecision,
+            arcDegreeMode,
+        )
+        # the points are float (QVector3D) as the ends of the lines
+        arcPoints = arcPoints.astype(np.float32)
+
+        # each point ends a segment from the previous point - the arc start
+        # for the first one - unless it is the same point
+        arcIndexes = np.repeat(np.arange(len(rows)), counts)
+        firsts = (np.cumsum(counts) - counts)[counts > 0]
+
+        previousPoints = np.empty_like(arcPoints)
+        previousPoints[1:] = arcPoints[:-1]
+        previousPoints[firsts] = points[rows[counts > 0], 0]
+
+        kept = np.any(arcPoints != previousPoints, axis=1)
+
+        # the segments of each row, in order
+        nbSegments = np.ones(len(points), dtype=np.int64)
+        nbSegments[rows] = np.bincount(arcIndexes[kept], minlength=len(rows))
+        segmentRows = np.repeat(np.arange(len(points)), nbSegments)
+
+        expandedPoints = points[segmentRows]
+        expandedProps = props[segmentRows]
+
+        isArcSegment = np.zeros(len(points), dtype=bool)
+        isArcSegment[rows] = True
+        isArcSegment = isArcSegment[segmentRows]
+
+        expandedPoints[isArcSegment, 0] = previousPoints[kept]
+        expandedPoints[isArcSegment, 1] = arcPoints[kept]
+
+        return expandedPoints, expandedProps
 
     def reset(self):
-        self.m_lines = []
-        self.m_lineIndexes = []
+        self.m_lines = LineSegments()
 
-        self.currentLine = 0
+        self.lastPoint = None
         self.m_min = QVector3D(qQNaN(), qQNaN(), qQNaN())
         self.m_max = QVector3D(qQNaN(), qQNaN(), qQNaN())
         self.m_minLength = qQNaN()
@@ -219,6 +276,21 @@ class GcodeViewParse:
         self.m_max.setY(Util.nMax(self.m_max.y(), y))
         self.m_max.setZ(Util.nMax(self.m_max.z(), z))
 
+    @testExtremes.register
+    def _(self, points: np.ndarray):
+        """
+        With an array of points (n x 3)
+        """
+        if len(points) == 0:
+            return
+
+        # fmin/fmax ignore nan as nMin/nMax
+        vmin = (self.m_min.x(), self.m_min.y(), self.m_min.z())
+        vmax = (self.m_max.x(), self.m_max.y(), self.m_max.z())
+
+        self.m_min = QVector3D(*np.fmin(vmin, np.fmin.reduce(points, axis=0)))
+        self.m_max = QVector3D(*np.fmax(vmax, np.fmax.reduce(points, axis=0)))
+
     def testLength(self, start: QVector3D, end: QVector3D):
         length = (start - end).length()
         if (not qIsNaN(length)) and length != 0:
@@ -226,3 +298,11 @@ class GcodeViewParse:
                 self.m_minLength = length
             else:
                 self.m_minLength = min(self.m_minLength, length)
+
+    def testLengths(self, lengths: np.ndarray):
+        """
+        With an array of lengths
+        """
+        lengths = lengths[~np.isnan(lengths) & (lengths != 0)]
+        if len(lengths) > 0:
+            self.m_minLength = Util.nMin(self.m_minLength, float(lengths.min()))
@@ -0,0 +1,156 @@
+# This file is a part of "pycut" application.
+
+# Copyright 2020-2030 Xavier Marduel
+
+from typing import Tuple
+
+import numpy as np
+
+
+class LineSegments:
+    """
+    The line segments of a program as columns (struct of arrays): one row
+    per segment, about 50 bytes, instead of a LineSegment object with two
+    QVector3D.
+
+    The rows are appended by blocks (the view parser gives them by chunks
+    of the program), the capacity grows geometrically.
+
+    The line number of a segment is the command number of its gcode line:
+    it never decreases along the segments.
+    """
+
+    # flags
+    FAST_TRAVERSE = 1
+    Z_MOVEMENT = 2
+    ARC = 4
+    CLOCKWISE = 8
+    METRIC = 16
+    ABSOLUTE = 32
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self):
+        self.m_size = 0
+        self.allocate(0)
+
+    def allocate(self, capacity: int):
+        self.m_starts = np.empty((capacity, 3), dtype=np.float32)
+        self.m_ends = np.empty((capacity, 3), dtype=np.float32)
+        self.m_speeds = np.empty(capacity, dtype=np.float32)
+        self.m_spindleSpeeds = np.empty(capacity, dtype=np.float32)
+        self.m_dwells = np.empty(capacity, dtype=np.float32)
+        self.m_lineNumbers = np.empty(capacity, dtype=np.int32)
+        self.m_flags = np.empty(capacity, dtype=np.uint8)
+        self.m_drawn = np.empty(capacity, dtype=bool)
+        self.m_highlights = np.empty(capacity, dtype=bool)
+
+    def reserve(self, capacity: int):
+        if capacity <= len(self.m_lineNumbers):
+            return
+
+        columns = self.columns()
+        self.allocate(max(capacity, 2 * len(self.m_lineNumbers), self.INITIAL_CAPACITY))
+        for column, values in zip(self.columns(), columns):
+            column[: self.m_size] = values[: self.m_size]
+
+    def columns(self) -> Tuple[np.ndarray, ...]:
+        return (
+            self.m_starts,
+            self.m_ends,
+            self.m_speeds,
+            self.m_spindleSpeeds,
+            self.m_dwells,
+            self.m_lineNumbers,
+            self.m_flags,
+            self.m_drawn,
+            self.m_highlights,
+        )
+
+    def append(
+        self,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        speeds: np.ndarray,
+        spindleSpeeds: np.ndarray,
+        dwells: np.ndarray,
+        lineNumbers: np.ndarray,
+        flags: np.ndarray,
+    ):
+        """
+        appends a block of segments, not drawn nor highlighted
+        """
+        n = len(lineNumbers)
+        self.reserve(self.m_size + n)
+
+        block = slice(self.m_size, self.m_size + n)
+
+        self.m_starts[block] = starts
+        self.m_ends[block] = ends
+        self.m_speeds[block] = speeds
+        self.m_spindleSpeeds[block] = spindleSpeeds
+        self.m_dwells[block] = dwells
+        self.m_lineNumbers[block] = lineNumbers
+        self.m_flags[block] = flags
+        self.m_drawn[block] = False
+        self.m_highlights[block] = False
+
+        self.m_size += n
+
+    def __len__(self) -> int:
+        return self.m_size
+
+    # the columns, as views: the drawn and highlight states can be set
+    # through them
+    def starts(self) -> np.ndarray:
+        return self.m_starts[: self.m_size]
+
+    def ends(self) -> np.ndarray:
+        return self.m_ends[: self.m_size]
+
+    def speeds(self) -> np.ndarray:
+        return self.m_speeds[: self.m_size]
+
+    def spindleSpeeds(self) -> np.ndarray:
+        return self.m_spindleSpeeds[: self.m_size]
+
+    def dwells(self) -> np.ndarray:
+        return self.m_dwells[: self.m_size]
+
+    def lineNumbers(self) -> np.ndarray:
+        return self.m_lineNumbers[: self.m_size]
+
+    def flags(self) -> np.ndarray:
+        return self.m_flags[: self.m_size]
+
+    def drawn(self) -> np.ndarray:
+        return self.m_drawn[: self.m_size]
+
+    def highlights(self) -> np.ndarray:
+        return self.m_highlights[: self.m_size]
+
+    def hasFlag(self, flag: int) -> np.ndarray:
+        return (self.flags() & flag) != 0
+
+    def isFastTraverse(self) -> np.ndarray:
+        return self.hasFlag(self.FAST_TRAVERSE)
+
+    def isZMovement(self) -> np.ndarray:
+        return self.hasFlag(self.Z_MOVEMENT)
+
+    def isArc(self) -> np.ndarray:
+        return self.hasFlag(self.ARC)
+
+    def lengths(self) -> np.ndarray:
+        return np.linalg.norm(
+            self.ends().astype(np.float64) - self.starts(), axis=1
+        )
+
+    def lineRange(self, firstLine: int, lastLine: int) -> Tuple[int, int]:
+        """
+        the segments [begin, end) of the gcode lines [firstLine, lastLine)
+        """
+        lineNumbers = self.lineNumbers()
+        begin = int(np.searchsorted(lineNumbers, firstLine, side="left"))
+        end = int(np.searchsorted(lineNumbers, lastLine, side="left"))
+        return begin, max(begin, end)
@@ -110,6 +110,20 @@ class GCodeTableModel(QtCore.QAbstractTableModel):
 
         return True
 
+    def appendItems(
+        self, items: List[GCodeItem], parent: QtCore.QModelIndex = QtCore.QModelIndex()
+    ) -> bool:
+        if len(items) == 0:
+            return False
+
+        row = self.rowCount()
+
+        self.beginInsertRows(parent, row, row + len(items) - 1)
+        self.m_data.extend(items)
+        self.endInsertRows()
+
+        return True
+
     def removeRow(
         self, row: int, parent: QtCore.QModelIndex = QtCore.QModelIndex()
     ) -> bool:
@@ -624,7 +624,9 @@ void main()
                     drawable.updateGeometry(self.m_shaderProgram)
 
             # Draw geometries
+            pixelSize = self.pixelSize()
             for drawable in self.m_shaderDrawables:
+                drawable.setPixelSize(pixelSize)
                 drawable.draw(self.m_shaderProgram)
                 if drawable.visible():
                     vertices += drawable.getVertexCount()
@@ -699,6 +701,13 @@ void main()
             self.m_distance * 2,
         )
 
+    def pixelSize(self) -> float:
+        """
+        The size of a pixel at the center of the view, in model units
+        (the view height is half the distance at zoom 1)
+        """
+        return self.m_distance / (2 * self.m_zoom * max(1, self.height()))
+
     def updateView(self):
         # Set view matrix
         self.m_viewMatrix.setToIdentity()
@@ -24,9 +24,8 @@ from gcodeviewer.drawers.tooldrawer import ToolDrawer
 from gcodeviewer.drawers.selectiondrawer import SelectionDrawer
 
 from gcodeviewer.parser.gcodeviewparse import GcodeViewParse
-from gcodeviewer.parser.gcodepreprocessorutils import GcodePreprocessorUtils
-from gcodeviewer.parser.gcodeparser import GcodeParser
-from gcodeviewer.parser.linesegment import LineSegment
+from gcodeviewer.parser.gcodeloader import GcodeLoader
+from gcodeviewer.parser.linesegments import LineSegments
 
 from gcodeviewer.tables.gcodetableview import GCodeTableView
 from gcodeviewer.tables.gcodetablemodel import GCodeItem
@@ -35,10 +34,11 @@ from gcodeviewer.tables.gcodetablemodel import GCodeTableModel
 from gcodeviewer.widgets.glwidget import GLWidget
 from gcodeviewer.widgets.glcontrolswidget import GCodeControlsWidget
 
+import numpy as np
+
 sNan = float("NaN")
 
 PROGRESSMINLINES = 10000
-PROGRESSSTEP = 1000
 
 
 class GLWidgetContainer(QtWidgets.QWidget):
@@ -89,6 +89,15 @@ class GLWidgetContainer(QtWidgets.QWidget):
 
         self.m_programFileName = None
 
+        self.m_loader: GcodeLoader = None
+        self.m_progress: QProgressDialog = None
+        self.m_loadingTime = QElapsedTimer()
+        self.m_programLoading = False
+        self.m_nbDrawnLines = 0
+
+        self.m_arcPrecision = 0.0  # TODO self.m_settings.arcPrecision()
+        self.m_arcDegreeMode = True  # TODO self.m_settings.arcDegreeMode()
+
         self.m_viewParser = GcodeViewParse()
         self.m_programModel = GCodeTableModel()
 
@@ -140,6 +149,9 @@ class GLWidgetContainer(QtWidgets.QWidget):
 
         self.clearTable()
 
+        # the loader thread must not outlive the application
+        QApplication.instance().aboutToQuit.connect(self.cancelLoading)
+
     def loadFile(self, fileName):
         fp = open(fileName, "r")
         gcode = fp.read()
@@ -152,13 +164,14 @@ class GLWidgetContainer(QtWidgets.QWidget):
         self.loadData(gcode)
 
     def loadData(self, gcode: str):
-        data = gcode.split("\n")
+        # Stop a previous loading
+        self.cancelLoading()
 
         time = QElapsedTimer()
         time.start()
 
         # Reset tables
-        self.clearTable()
+        self.m_programModel.clear()
         # self.m_probeModel.clear()
         # self.m_programHeightmapModel.clear()
         self.m_currentModel = self.m_programModel
@@ -171,7 +184,8 @@ class GLWidgetContainer(QtWidgets.QWidget):
         self.m_currentDrawer = self.m_codeDrawer
         self.m_codeDrawer.update()
         self.glwVisualizer.fitDrawable(self.m_codeDrawer)
-        self.updateProgramEstimatedTime([])
+        self.updateProgramEstimatedTime(LineSegments())
+        self.m_nbDrawnLines = 0
 
         # Update interface
         # self.chkHeightMapUse.setChecked(False)
@@ -179,95 +193,98 @@ class GLWidgetContainer(QtWidgets.QWidget):
         # self.style().unpolish(self.grpHeightMap)
         # self.grpHeightMap.ensurePolished()
 
-        # Reset tableview
-        headerState = self.tblProgram.horizontalHeader().saveState()
-        self.tblProgram.setModel(None)
-
         # Prepare parser
-        gp = GcodeParser()
         ####gp.setTraverseSpeed(self.m_settings.rapidSpeed())
-        gp.setTraverseSpeed(100)
-
+        initialPoint = None
         if self.m_codeDrawer.getIgnoreZ():
-            gp.reset(QVector3D(sNan, sNan, 0))
+            initialPoint = QVector3D(sNan, sNan, 0)
+
+        self.m_loader = GcodeLoader(gcode, 100, initialPoint, parent=self)
+        self.m_loader.chunkLoaded.connect(self.onChunkLoaded)
+        self.m_loader.loaded.connect(self.onProgramLoaded)
 
         print("Prepared to load: %s" % time.elapsed())
-        time.start()
+        self.m_loadingTime.start()
 
         # Block parser updates on table changes
         self.m_programLoading = True
 
-        # Prepare model
-        self.m_programModel.m_data.clear()
-        self.m_programModel.m_data = []
+        nbLines = self.m_loader.nbLines()
 
-        progress = QProgressDialog("Parsing GCode...", "Abort", 0, len(data), self)
-        progress.setWindowModality(Qt.WindowModal)
-        progress.setFixedSize(progress.sizeHint())
-        if len(data) > PROGRESSMINLINES:
-            progress.show()
-            progress.setStyleSheet(
+        self.m_progress = QProgressDialog("Parsing GCode...", "Abort", 0, nbLines, self)
+        self.m_progress.setWindowModality(Qt.WindowModal)
+        self.m_progress.setFixedSize(self.m_progress.sizeHint())
+        # the lines parsed so far are kept
+        self.m_progress.canceled.connect(self.m_loader.cancel)
+        if nbLines > PROGRESSMINLINES:
+            self.m_progress.show()
+            self.m_progress.setStyleSheet(
                 'QProgressBar {text-align: center qproperty-format: ""}'
             )
 
-        while len(data) > 0:
-            command = data.pop(0)
-
-            # Trim command
-            trimmed = command.strip()
+        self.m_loader.start()
 
-            if len(trimmed) > 0:
-                # Split command
-                stripped = GcodePreprocessorUtils.removeComment(command)
-                args = GcodePreprocessorUtils.splitCommand(stripped)
+    def cancelLoading(self):
+        """
+        Stops the loading of the program, if any, and drops it
+        """
+        loader = self.m_loader
+        if loader is None:
+            return
 
-                gp.addCommand(args)
+        self.m_loader = None
+        loader.cancel()
+        loader.wait()
+        loader.deleteLater()
 
-                item = GCodeItem()
+        self.m_progress.close()
+        self.m_programLoading = False
 
-                item.command = trimmed
-                item.state = GCodeItem.States.InQueue
-                item.line = gp.getCommandNumber()
-                item.args = args
+    def isLoading(self) -> bool:
+        return self.m_loader is not None
 
-                self.m_programModel.m_data.append(item)
+    def onChunkLoaded(self, items: List[GCodeItem], segments: list, nbLinesDone: int):
+        if self.sender() is not self.m_loader:
+            # from a canceled loading
+            return
 
-            if progress.isVisible() and (len(data) % PROGRESSSTEP == 0):
-                progress.setValue(progress.maximum() - len(data))
-                QApplication.instance().processEvents()
-                if progress.wasCanceled():
-                    break
+        self.m_programModel.appendItems(items)
 
-        progress.close()
+        self.m_viewParser.addPointSegments(
+            segments, self.m_arcPrecision, self.m_arcDegreeMode
+        )
 
-        self.m_programModel.insertRow(self.m_programModel.rowCount())
-        print("model filled: %s ms." % time.elapsed())
+        # The drawer gets all the lines at each update: redraw when the
+        # number of lines doubled, to stay linear in the program size
+        nbLines = len(self.m_viewParser.getLineSegments())
+        if nbLines >= 2 * self.m_nbDrawnLines:
+            self.m_nbDrawnLines = nbLines
+            self.m_codeDrawer.update()
 
-        time.start()
+        if self.m_progress.isVisible():
+            self.m_progress.setValue(nbLinesDone)
 
-        arcPrecision = 0.0  # TODO self.m_settings.arcPrecision()
-        arcDegreeMode = True  # TODO self.m_settings.arcDegreeMode()
+    def onProgramLoaded(self):
+        loader = self.m_loader
+        if self.sender() is not loader:
+            # from a canceled loading
+            return
 
-        all_lines = self.m_viewParser.getLinesFromParser(
-            gp, arcPrecision, arcDegreeMode
-        )
+        self.m_loader = None
+        loader.wait()
+        loader.deleteLater()
 
-        self.updateProgramEstimatedTime(all_lines)
-        print("view parser filled: %s ms" % time.elapsed())
+        self.m_progress.close()
 
-        self.m_programLoading = False
+        self.m_programModel.insertRow(self.m_programModel.rowCount())
+        print("program loaded: %s ms." % self.m_loadingTime.elapsed())
 
-        # Set table model
-        self.tblProgram.setModel(self.m_programModel)
-        self.tblProgram.horizontalHeader().restoreState(headerState)
-        self.tblProgram.setup()
+        self.updateProgramEstimatedTime(self.m_viewParser.getLineSegments())
 
-        # connect this model
-        self.tblProgram.selectionModel().currentChanged.connect(
-            self.onTableCurrentChanged
-        )
+        self.m_programLoading = False
 
         # Update tableview
+        self.tblProgram.setCurrentIndex(QtCore.QModelIndex())
         self.tblProgram.selectRow(0)
 
         # Update code drawer
@@ -285,28 +302,19 @@ class GLWidgetContainer(QtWidgets.QWidget):
         self.m_programModel.clear()
         self.m_programModel.insertRow(0)
 
-    def updateProgramEstimatedTime(self, lines: List[LineSegment]) -> QTime:
-        time = 0
-
-        for ls in lines:
-            length = (ls.getEnd() - ls.getStart()).length()
-
-            if not qIsNaN(length) and not qIsNaN(ls.getSpeed()) and ls.getSpeed() != 0:
-                speed = ls.getSpeed()
-
-                """
-                cond1 = self.slbFeedOverride.isChecked() and not ls.isFastTraverse()
-                cond2 = self.slbRapidOverride.isChecked() and ls.isFastTraverse()
-                
-                val1 = speed * self.slbFeedOverride.value() / 100.0
-                val2 = speed * self.slbRapidOverride.value() / 100.0
-                
-                if cond1:
-                    speed = val1
-                elif cond2:
-                    speed = val2
-                """
-                time += length / speed
+    def updateProgramEstimatedTime(self, segments: LineSegments) -> QTime:
+        lengths = segments.lengths()
+        speeds = segments.speeds()
+
+        """
+        feedOverride = self.slbFeedOverride.isChecked() and not isFastTraverse
+        rapidOverride = self.slbRapidOverride.isChecked() and isFastTraverse
+
+        speeds[feedOverride] *= self.slbFeedOverride.value() / 100.0
+        speeds[rapidOverride] *= self.slbRapidOverride.value() / 100.0
+        """
+        timed = ~np.isnan(lengths) & ~np.isnan(speeds) & (speeds != 0)
+        time = float(np.sum(lengths[timed] / speeds[timed]))
 
         time *= 60
 
@@ -325,6 +333,9 @@ class GLWidgetContainer(QtWidgets.QWidget):
         pass
 
     def onTableCurrentChanged(self, idx1: QtCore.QModelIndex, idx2: QtCore.QModelIndex):
+        if self.m_programLoading:
+            return
+
         # Update toolpath hightlighting
         if idx1.row() > self.m_currentModel.rowCount() - 2:
             idx1 = self.m_currentModel.index(self.m_currentModel.rowCount() - 2, 0)
@@ -332,17 +343,15 @@ class GLWidgetContainer(QtWidgets.QWidget):
             idx2 = self.m_currentModel.index(self.m_currentModel.rowCount() - 2, 0)
 
         parser = self.m_currentDrawer.viewParser()
-        list = parser.getLineSegmentList()
-        lineIndexes = parser.getLinesIndexes()
+        segments = parser.getLineSegments()
+        highlights = segments.highlights()
 
         # Update linesegments on cell changed
         if not self.m_currentDrawer.geometryUpdated():
-            for i in range(len(list)):
-                jdx1 = list[i].getLineNumber()
-                jdx2 = int(
-                    self.m_currentModel.data(self.m_currentModel.index(idx1.row(), 4))
-                )
-                list[i].setIsHightlight(jdx1 <= jdx2)
+            line = int(
+                self.m_currentModel.data(self.m_currentModel.index(idx1.row(), 4))
+            )
+            highlights[:] = segments.lineNumbers() <= line
 
         # Update vertices on current cell changed
         else:
@@ -355,35 +364,29 @@ class GLWidgetContainer(QtWidgets.QWidget):
             if lineLast < lineFirst:
                 lineLast, lineFirst = lineFirst, lineLast
 
-            indexes = []
-            for i in range(lineFirst + 1, lineLast + 1):
-                for l in lineIndexes[i]:
-                    list[l].setIsHightlight(idx1.row() > idx2.row())
-                    indexes.append(l)
+            # the segments of the lines ]lineFirst, lineLast]
+            begin, end = segments.lineRange(lineFirst + 1, lineLast + 1)
+            highlights[begin:end] = idx1.row() > idx2.row()
 
-            if len(indexes) == 0:
+            if begin == end:
                 self.m_selectionDrawer.setEndPosition(QVector3D(sNan, sNan, sNan))
             else:
+                pos = segments.ends()[end - 1]
                 if self.m_codeDrawer.getIgnoreZ():
-                    self.m_selectionDrawer.setEndPosition(
-                        QVector3D(
-                            list[indexes[-1]].getEnd().x(),
-                            list[indexes[-1]].getEnd().y(),
-                            0,
-                        )
-                    )
+                    self.m_selectionDrawer.setEndPosition(QVector3D(pos[0], pos[1], 0))
                 else:
-                    self.m_selectionDrawer.setEndPosition(list[indexes[-1]].getEnd())
+                    self.m_selectionDrawer.setEndPosition(QVector3D(*pos))
             self.m_selectionDrawer.update()
 
-            if len(indexes) > 0:
-                self.m_currentDrawer.update_indexes(indexes)
+            if begin < end:
+                self.m_currentDrawer.update_indexes(np.arange(begin, end))
 
         # Update selection marker
 
         line = int(self.m_currentModel.data(self.m_currentModel.index(idx1.row(), 4)))
-        if line > 0 and lineIndexes[line] != "":
-            pos = list[lineIndexes[line][-1]].getEnd()
+        begin, end = segments.lineRange(line, line + 1)
+        if line > 0 and begin < end:
+            pos = QVector3D(*segments.ends()[end - 1])
             if self.m_codeDrawer.getIgnoreZ():
                 self.m_selectionDrawer.setEndPosition(QVector3D(pos.x(), pos.y(), 0))
             else:
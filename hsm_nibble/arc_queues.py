@@ -0,0 +1,85 @@
+"""
+    A CAM library for generating HSM "peeling" toolpaths from supplied geometry.
+
+    Index of the arcs waiting in the queues, in tiles.
+"""
+
+from typing import Dict, List, Set, Tuple
+
+import math
+
+from shapely.geometry.base import BaseGeometry  # type: ignore
+
+TileRange = Tuple[int, int, int, int]
+Tile = Tuple[int, int]
+
+
+class ArcQueueIndex:
+    """
+    The arcs of the pending queues and the last arc of each queue, indexed by
+    the square tiles their bounds overlap.
+
+    Queues are identified by a key (id() of the queue: a queue is in the index
+    only while it is pending.) The queries return candidates: anything within
+    the distance of the geometry is in them, the caller does the exact
+    distance / intersection tests on these only.
+    """
+
+    def __init__(self, tile_size: float) -> None:
+        self.tile_size = tile_size
+
+        # tile -> (queue key, arc path) of all the queued arcs.
+        self.arcs: Dict[Tile, List[Tuple[int, BaseGeometry]]] = {}
+        # tile -> keys of the queues whose last arc overlaps the tile.
+        self.tails: Dict[Tile, Set[int]] = {}
+
+        # queue key -> tiles of its arcs, tiles of its last arc.
+        self.queue_tiles: Dict[int, Set[Tile]] = {}
+        self.tail_tiles: Dict[int, List[Tile]] = {}
+
+    def _tiles(self, bounds: Tuple[float, float, float, float], distance: float = 0.0) -> List[Tile]:
+        min_x, min_y, max_x, max_y = bounds
+        size = self.tile_size
+        tile_range: TileRange = (
+                math.floor((min_x - distance) / size), math.floor((min_y - distance) / size),
+                math.floor((max_x + distance) / size), math.floor((max_y + distance) / size))
+        return [(tile_x, tile_y)
+                for tile_x in range(tile_range[0], tile_range[2] + 1)
+                for tile_y in range(tile_range[1], tile_range[3] + 1)]
+
+    def append(self, key: int, path: BaseGeometry) -> None:
+        """ An arc appended to a queue: it becomes the last one. """
+        tiles = self._tiles(path.bounds)
+
+        queue_tiles = self.queue_tiles.setdefault(key, set())
+        for tile in tiles:
+            self.arcs.setdefault(tile, []).append((key, path))
+            queue_tiles.add(tile)
+
+        for tile in self.tail_tiles.get(key, ()):
+            self.tails[tile].discard(key)
+        for tile in tiles:
+            self.tails.setdefault(tile, set()).add(key)
+        self.tail_tiles[key] = tiles
+
+    def remove(self, key: int) -> None:
+        """ A queue is no longer pending. """
+        for tile in self.queue_tiles.pop(key, ()):
+            self.arcs[tile] = [entry for entry in self.arcs[tile] if entry[0] != key]
+        for tile in self.tail_tiles.pop(key, ()):
+            self.tails[tile].discard(key)
+
+    def near_tails(self, geom: BaseGeometry, distance: float) -> Set[int]:
+        """ Keys of the queues whose last arc may be within distance of geom. """
+        keys: Set[int] = set()
+        for tile in self._tiles(geom.bounds, distance):
+            keys.update(self.tails.get(tile, ()))
+        return keys
+
+    def near_arcs(self, geom: BaseGeometry) -> List[Tuple[int, BaseGeometry]]:
+        """ (queue key, arc path) of the queued arcs that may intersect geom. """
+        found: Dict[int, Tuple[int, BaseGeometry]] = {}
+        for tile in self._tiles(geom.bounds):
+            for entry in self.arcs.get(tile, ()):
+                found[id(entry[1])] = entry
+        return list(found.values())
@@ -0,0 +1,129 @@
+"""
+    A CAM library for generating HSM "peeling" toolpaths from supplied geometry.
+
+    Tracking of the area cut (or calculated) so far, in tiles.
+"""
+
+from typing import Dict, List, Optional, Tuple, Union
+
+import math
+
+import shapely  # type: ignore
+from shapely.geometry import MultiPolygon, Polygon  # type: ignore
+from shapely.geometry.base import BaseGeometry  # type: ignore
+
+# Tile size, in step sizes.
+TILE_STEPS = 8
+
+# Tiles added around a query when the window moves.
+WINDOW_MARGIN = 1
+
+TileRange = Tuple[int, int, int, int]
+
+
+class CutArea:
+    """
+    An area growing by the union of many polygons (circles, arc sections...).
+
+    The polygons are indexed by the square tiles they overlap. Any polygon
+    intersecting a geometry is in one of the tiles under the geometry's
+    bounds, so the union of the polygons of these tiles gives the same
+    answers as the whole area for union, difference, intersection and
+    covered_by with that geometry, but with the vertices of its
+    neighbourhood only.
+
+    The union of the polygons of a window of tiles is kept up to date as
+    polygons are added: successive queries near the tool reuse it, and a
+    query outside it moves the window.
+    """
+
+    def __init__(
+            self,
+            tile_size: float,
+            area: Optional[Union[Polygon, MultiPolygon]] = None
+    ) -> None:
+        self.tile_size = tile_size
+
+        self.polygons: List[BaseGeometry] = []
+        # Indexes in self.polygons of the polygons overlapping each tile.
+        self.tiles: Dict[Tuple[int, int], List[int]] = {}
+
+        self.window: Optional[TileRange] = None
+        self.window_area: BaseGeometry = Polygon()
+
+        self._total: Optional[BaseGeometry] = Polygon()
+
+        if area is not None:
+            self.add(area)
+
+    def _range(self, bounds: Tuple[float, float, float, float]) -> TileRange:
+        min_x, min_y, max_x, max_y = bounds
+        size = self.tile_size
+        return (math.floor(min_x / size), math.floor(min_y / size),
+                math.floor(max_x / size), math.floor(max_y / size))
+
+    @staticmethod
+    def _overlap(range_a: TileRange, range_b: TileRange) -> bool:
+        return (range_a[0] <= range_b[2] and range_b[0] <= range_a[2] and
+                range_a[1] <= range_b[3] and range_b[1] <= range_a[3])
+
+    @staticmethod
+    def _inside(range_a: TileRange, range_b: TileRange) -> bool:
+        return (range_b[0] <= range_a[0] and range_a[2] <= range_b[2] and
+                range_b[1] <= range_a[1] and range_a[3] <= range_b[3])
+
+    def add(self, polygon: Union[Polygon, MultiPolygon]) -> None:
+        """ Union of the polygon to the area. """
+        if polygon.is_empty:
+            return
+
+        index = len(self.polygons)
+        self.polygons.append(polygon)
+
+        tile_range = self._range(polygon.bounds)
+        for tile_x in range(tile_range[0], tile_range[2] + 1):
+            for tile_y in range(tile_range[1], tile_range[3] + 1):
+                self.tiles.setdefault((tile_x, tile_y), []).append(index)
+
+        if self.window is not None and self._overlap(tile_range, self.window):
+            self.window_area = self.window_area.union(polygon)
+
+        self._total = None
+
+    def around(self, geom: BaseGeometry) -> BaseGeometry:
+        """
+        The part of the area made of the polygons near geom: the same as the
+        whole area for any operation with geom.
+        """
+        if geom.is_empty or not self.polygons:
+            return Polygon()
+
+        tile_range = self._range(geom.bounds)
+        if self.window is not None and self._inside(tile_range, self.window):
+            return self.window_area
+
+        self.window = (tile_range[0] - WINDOW_MARGIN, tile_range[1] - WINDOW_MARGIN,
+                       tile_range[2] + WINDOW_MARGIN, tile_range[3] + WINDOW_MARGIN)
+
+        indexes = set()
+        for tile_x in range(self.window[0], self.window[2] + 1):
+            for tile_y in range(self.window[1], self.window[3] + 1):
+                indexes.update(self.tiles.get((tile_x, tile_y), ()))
+
+        if indexes:
+            self.window_area = shapely.union_all(
+                    [self.polygons[index] for index in sorted(indexes)])
+        else:
+            self.window_area = Polygon()
+
+        return self.window_area
+
+    def total(self) -> BaseGeometry:
+        """ The whole area. """
+        if self._total is None:
+            self._total = shapely.union_all(self.polygons)
+
+        return self._total
+
+    def is_empty(self) -> bool:
+        return not self.polygons
@@ -23,15 +23,20 @@
 
 from typing import Dict, Generator, List, NamedTuple, Optional, Set, Tuple, Union
 
+from bisect import bisect_right
 from enum import Enum
 import math
 import time
 
+import shapely  # type: ignore
+
 from shapely.affinity import rotate  # type: ignore
 from shapely.geometry import box, GeometryCollection, LinearRing, LineString, MultiLineString, MultiPoint, MultiPolygon, Point, Polygon  # type: ignore
 from shapely.ops import linemerge, split, unary_union  # type: ignore
 from shapely.errors import GeometryTypeError
 
+from hsm_nibble.arc_queues import ArcQueueIndex
+from hsm_nibble.cut_area import CutArea, TILE_STEPS
 from hsm_nibble.debug import Display
 from hsm_nibble.voronoi_centers import (
         round_coord, start_point_perimeter, start_point_widest, VoronoiCenters)  # type: ignore
@@ -49,6 +54,13 @@ SHORTEST_RAPID = 1e-6
 # with the best we have found so far.
 ITERATION_COUNT = 50
 
+# Number of bisections of the analytic estimate of the next arc position.
+GUESS_ITERATION_COUNT = 40
+
+# Extrapolation of the voronoi edges, giving room to overshoot while converging
+# on the position of an arc.
+EDGE_EXTENSION = 100000
+
 # Whether to visit short voronoi edges first (True) or try to execute longer
 # branches first.
 # TODO: We could use more long range path planning that take the shortest total
@@ -105,6 +117,18 @@ LineData = NamedTuple("Line", [
     ("move_style", MoveStyle),
 ])
 
+# A voronoi edge and what the arcs along it need: see Pocket._edge_profile().
+EdgeProfile = NamedTuple("EdgeProfile", [
+    ("edge", LineString),
+    # The edge extrapolated by EDGE_EXTENSION at both ends.
+    ("extended", LineString),
+    # Cumulative lengths, coordinates and distance to the pocket edges of its vertices.
+    ("lengths", List[float]),
+    ("xs", List[float]),
+    ("ys", List[float]),
+    ("radii", List[float]),
+])
+
 
 def clean_linear_ring(ring: LinearRing) -> LinearRing:
     """ Remove duplicate points in a LinearRing. """
@@ -431,9 +455,9 @@ def split_line_by_poly(line: LineString, poly: Union[Polygon, MultiPolygon]) ->
 
 class BaseGeometry:
     # Area we have calculated arcs for. Calculated by appending full circles.
-    calculated_area_total: Polygon
+    calculated_area_total: CutArea
     # Area we have stored the toolpath for. Calculated by appending full circles.
-    cut_area_total: Polygon
+    cut_area_total: CutArea
 
     starting_cut_area: Polygon
 
@@ -452,11 +476,12 @@ class BaseGeometry:
         self.starting_cut_area = already_cut
         self.path: List[Union[ArcData, LineData]] = []
         self.pending_arc_queues: List[List[ArcData]] = []
+        # The arcs of the pending queues, for the nearest queue and overlap checks.
+        self.arc_queue_index = ArcQueueIndex(step * TILE_STEPS)
         self.last_arc: Optional[ArcData] = None
 
-        self.calculated_area_total = self.starting_cut_area
-        self.cut_area_total = Polygon(self.starting_cut_area)
-        assert self.calculated_area_total is not self.cut_area_total
+        self.calculated_area_total = CutArea(step * TILE_STEPS, self.starting_cut_area)
+        self.cut_area_total = CutArea(step * TILE_STEPS, self.starting_cut_area)
 
         self._filter_input_geometry()
         self.dilated_starting_polygon = self.polygon.buffer(self.step / 10)
@@ -473,23 +498,33 @@ class BaseGeometry:
 
     def _flush_arc_queues(self) -> None:
         while self.pending_arc_queues:
-            to_process = self.pending_arc_queues.pop(0)
-            self._arcs_to_path(to_process)
+            self._arcs_to_path(self._pop_arc_queue())
 
-    def _check_queue_overlap(self, arc: ArcData, queue_index: int) -> bool:
+    def _pop_arc_queue(self) -> List[ArcData]:
+        """ Remove the oldest queue from the pending ones. """
+        to_process = self.pending_arc_queues.pop(0)
+        self.arc_queue_index.remove(id(to_process))
+        return to_process
+
+    def _blocking_queues(self, arc: ArcData) -> Set[int]:
+        """ Keys of the pending queues with an arc within step of this arc. """
+        dilated_arc = arc.path.buffer(self.step)
+        return {key for key, existing_path in self.arc_queue_index.near_arcs(dilated_arc)
+                if existing_path.intersects(dilated_arc)}
+
+    def _check_queue_overlap(self, arc: ArcData, queue_index: int, blocking: Set[int]) -> bool:
         """
         Arcs should only be added if the area inside them has been cleared.
         This checks for overlaps between the specified arc and those that are
         to be cut /after/ it.
+        blocking: the queues with an arc overlapping this one. (See _blocking_queues().)
         Returns:
             True: If no overlap occurs.
             False: If the proposed arc is blocked for this queue by as yet uncut arcs.
         """
-        dilated_arc = arc.path.buffer(self.step)
         for queue in self.pending_arc_queues[queue_index + 1:]:
-            for existing_arc in queue:
-                if existing_arc.path.intersects(dilated_arc):
-                    return False
+            if id(queue) in blocking:
+                return False
         return True
 
     def _queue_arcs(self, new_arcs: List[ArcData]) -> None:
@@ -513,8 +548,7 @@ class BaseGeometry:
             # Since there are no other queues depending on our remaining one,
             # it is safe to drain it,
             self.pending_arc_queues[0].append(new_arcs[0])
-            to_process = self.pending_arc_queues.pop(0)
-            self._arcs_to_path(to_process)
+            self._arcs_to_path(self._pop_arc_queue())
             return
         else:
             closest_queue: Optional[List[ArcData]]
@@ -522,6 +556,11 @@ class BaseGeometry:
                 closest_queue = None
                 closest_queue_index = None
                 closest_dist = self.step
+                # Only the queues ending within step of the arc can be closer
+                # than step: the distance to the others is not needed while
+                # closest_dist is no more than step.
+                near_queues = self.arc_queue_index.near_tails(arc.path, self.step)
+                blocking: Optional[Set[int]] = None
                 for queue_index, queue in enumerate(self.pending_arc_queues):
                     if self.winding_dir == ArcDir.Closest:
                         combined_dist = 1
@@ -536,9 +575,16 @@ class BaseGeometry:
                         combined_dist = (
                                 queue[-1].start.distance(arc.end) + queue[-1].end.distance(arc.start))
 
+                    if (id(queue) not in near_queues and
+                            closest_dist <= self.step and
+                            combined_dist >= seperate_dist):
+                        continue
+
                     seperation = arc.path.distance(queue[-1].path)
                     if seperation < closest_dist or combined_dist < seperate_dist:
-                        if self._check_queue_overlap(arc, queue_index):
+                        if blocking is None:
+                            blocking = self._blocking_queues(arc)
+                        if self._check_queue_overlap(arc, queue_index, blocking):
                             closest_dist = seperation
                             closest_queue = queue
                             closest_queue_index = queue_index
@@ -548,6 +594,7 @@ class BaseGeometry:
                     closest_queue_index = len(self.pending_arc_queues)
                     self.pending_arc_queues.append(closest_queue)
                 closest_queue.append(arc)
+                self.arc_queue_index.append(id(closest_queue), arc.path)
                 modified_queues_indexes.add(closest_queue_index)
                 assert closest_queue_index is not None
                 assert closest_queue is self.pending_arc_queues[closest_queue_index]
@@ -560,8 +607,7 @@ class BaseGeometry:
         # we could process the contents of all the older queues even though they
         # are still being appended to before processing the un-modifies queue(s).
         if modified_queues_indexes and 0 not in modified_queues_indexes:
-            to_process = self.pending_arc_queues.pop(0)
-            self._arcs_to_path(to_process)
+            self._arcs_to_path(self._pop_arc_queue())
 
     def _arcs_to_path(self, arcs: List[ArcData]) -> None:
         """
@@ -624,10 +670,13 @@ class BaseGeometry:
 
         # Add a section of the full circle to the cut area.
         arc_poly = Polygon(list(next_arc.path.coords) + [next_arc.origin]).buffer(self.step / 20)
-        to_cut_area_total = self.cut_area_total.union(arc_poly)
 
         lines = []
         path = LineString([self.last_arc.end, next_arc.start])
+
+        # Only the cut area around the path matters here.
+        cut_area_total = self.cut_area_total.around(path)
+        to_cut_area_total = cut_area_total.union(arc_poly)
         inside_pocket = (
                 path.covered_by(self.dilated_starting_polygon)
                 or path.covered_by(to_cut_area_total)
@@ -653,15 +702,15 @@ class BaseGeometry:
 
             remaining_path = LineString([self.last_arc.end, split_for_last])
 
-            split_path = split_line_by_poly(remaining_path, self.cut_area_total)
+            split_path = split_line_by_poly(remaining_path, cut_area_total)
 
             for part in split_path.geoms:
                 assert part.type == "LineString"
                 assert len(part.coords) == 2
 
                 move_style = MoveStyle.CUT
-                if part.intersection(self.cut_area_total).length > part.length - self.step / 20:
-                #if part.covered_by(self.cut_area_total):
+                if part.intersection(cut_area_total).length > part.length - self.step / 20:
+                #if part.covered_by(cut_area_total):
                     move_style = MoveStyle.RAPID_INSIDE
 
                 line = LineData(
@@ -680,7 +729,7 @@ class BaseGeometry:
             if line.path.length > SHORTEST_RAPID:
                 lines.append(line)
 
-        self.cut_area_total = to_cut_area_total
+        self.cut_area_total.add(arc_poly)
 
         return lines
 
@@ -691,10 +740,10 @@ class BaseGeometry:
         It's important to keep the sequence of the order of the resulting sub arcs
         the same as the originals so the final path can pass through them in order.
         """
-        calculated_area_total = self.calculated_area_total
         split_arcs = []
         for full_arc in full_arcs:
-            new_arcs = arcs_from_circle_diff(full_arc, calculated_area_total)
+            new_arcs = arcs_from_circle_diff(
+                    full_arc, self.calculated_area_total.around(full_arc.path))
             if not new_arcs:
                 continue
 
@@ -822,6 +871,8 @@ class Pocket(BaseGeometry):
         self.path_fail_count: int = 0
         self.loop_count: int = 0
 
+        self.edge_profile: Optional[EdgeProfile] = None
+
         self.visited_edges: Set[int] = set()
         self.open_paths: Dict[int, Tuple[float, float]] = {}
 
@@ -847,7 +898,7 @@ class Pocket(BaseGeometry):
                 self.start_radius,
                 self.step,
                 self.winding_dir,
-                already_cut=self.calculated_area_total,
+                already_cut=self.calculated_area_total.total(),
                 path=self.path)
         entry_circle.spiral()
         entry_circle.circle()
@@ -866,8 +917,7 @@ class Pocket(BaseGeometry):
 
         self.last_circle: Optional[ArcData] = create_circle(
             self.start_point, self.start_radius)
-        self.calculated_area_total = self.calculated_area_total.union(
-                Polygon(self.last_circle.path))
+        self.calculated_area_total.add(Polygon(self.last_circle.path))
 
     def calculate_path(self) -> None:
         """ Reset path and restart from beginning. """
@@ -987,6 +1037,92 @@ class Pocket(BaseGeometry):
 
         return (pos, radius)
 
+    def _edge_profile(self, voronoi_edge: LineString) -> EdgeProfile:
+        """
+        Calculated once for all the arcs along a voronoi edge.
+        """
+        if self.edge_profile is None or self.edge_profile.edge is not voronoi_edge:
+            coords = shapely.get_coordinates(voronoi_edge)
+            radii = shapely.distance(
+                    self.voronoi.polygon.boundary, shapely.points(coords))
+            lengths = [0.0]
+            for index in range(1, len(coords)):
+                lengths.append(lengths[-1] + math.dist(coords[index - 1], coords[index]))
+
+            edge_extended = self._extrapolate_line(EDGE_EXTENSION, voronoi_edge)
+            assert abs(edge_extended.length -
+                       (voronoi_edge.length + 2 * EDGE_EXTENSION)) < 0.0001
+
+            self.edge_profile = EdgeProfile(
+                    voronoi_edge,
+                    edge_extended,
+                    lengths,
+                    coords[:, 0].tolist(),
+                    coords[:, 1].tolist(),
+                    radii.tolist())
+
+        return self.edge_profile
+
+    def _guess_distance(
+            self,
+            voronoi_edge: LineString,
+            start_distance: float,
+            desired_step: float,
+    ) -> float:
+        """
+        Estimate the distance along the voronoi edge of the next arc.
+
+        The furthest point of a circle of center C and radius R from the center O
+        of the previous circle is at |C - O| + R from it, so the spacing from the
+        previous circle is |C - O| + R - previous radius. Interpolating C and R
+        along the voronoi edge makes it a cheap function of the distance along
+        the edge, solved by bisection.
+        The estimate is never further than the fixed step: where the edge bends
+        back towards the previous circle, a further fit would skip the material
+        in between.
+        This is only a first guess: _calculate_arc checks it against the real cut
+        and falls back to the fixed step when it does not hold.
+        """
+        if self.last_circle is None:
+            return start_distance + desired_step
+
+        _, _, lengths, xs, ys, radii = self._edge_profile(voronoi_edge)
+        last_origin = self.last_circle.origin
+        last_radius = self.last_circle.radius
+        corner_zoom = CORNER_ZOOM * self.step
+
+        def spacing_error(distance: float) -> float:
+            index = min(max(bisect_right(lengths, distance) - 1, 0), len(lengths) - 2)
+            segment_length = lengths[index + 1] - lengths[index]
+            ratio = (distance - lengths[index]) / segment_length if segment_length else 0.0
+            pos_x = xs[index] + (xs[index + 1] - xs[index]) * ratio
+            pos_y = ys[index] + (ys[index + 1] - ys[index]) * ratio
+            radius = radii[index] + (radii[index + 1] - radii[index]) * ratio
+
+            desired = desired_step
+            if radius < corner_zoom:
+                multiplier = (corner_zoom - radius) / corner_zoom
+                desired = self.step * (1 - CORNER_ZOOM_EFFECT * multiplier)
+
+            spacing = math.hypot(pos_x - last_origin.x, pos_y - last_origin.y) + radius - last_radius
+            return spacing - desired
+
+        low = start_distance
+        high = min(start_distance + desired_step, lengths[-1])
+        if spacing_error(high) <= 0 or spacing_error(low) >= 0:
+            return start_distance + desired_step
+
+        for _ in range(GUESS_ITERATION_COUNT):
+            middle = (low + high) / 2
+            if spacing_error(middle) < 0:
+                low = middle
+            else:
+                high = middle
+            if high - low < self.step / 1000:
+                break
+
+        return (low + high) / 2
+
     def _furthest_spacing_arcs(self, arcs: List[ArcData], last_circle: ArcData) -> float:
         """
         Calculate maximum step_over between 2 arcs.
@@ -1028,13 +1164,9 @@ class Pocket(BaseGeometry):
             if not arc.path:
                 continue
 
-            # This is expensive but yields good results.
-            # Probably want to do a binary search version?
-
-            for index in range(0, len(arc.path.coords), 1):
-                coord = arc.path.coords[index]
-                #spacing = max(spacing, Point(coord).distance(polygon))
-                spacing = max(spacing, polygon.distance(Point(coord)))
+            # Distances to all the vertices at once.
+            points = shapely.points(shapely.get_coordinates(arc.path))
+            spacing = max(spacing, float(shapely.distance(polygon, points).max()))
 
         return spacing
 
@@ -1062,9 +1194,10 @@ class Pocket(BaseGeometry):
           of the cut pocket should be the same as the distance from the center of
           the arc to the point described in 1).
 
-        Rather than work out the new arc centre position with maths, it is quicker
-        and easier to use a binary search, moving the proposed centre repeatedly
-        and seeing if the arc fits.
+        The new arc centre position is first estimated with maths, from the
+        previous circle and the radii along the voronoi edge (see _guess_distance).
+        The proposed centre is then moved repeatedly until the arc fits; usually
+        the estimate fits at once.
 
         Arguments:
             voronoi_edge: The line of mid-way points between the edges of desired
@@ -1099,7 +1232,8 @@ class Pocket(BaseGeometry):
 
         desired_step = min(self.step, (voronoi_edge.length - start_distance))
 
-        distance = start_distance + desired_step
+        distance = self._guess_distance(voronoi_edge, start_distance, desired_step)
+        guessed = distance != start_distance + desired_step
 
         count: int = 0
         circle: Optional[ArcData] = None
@@ -1107,18 +1241,14 @@ class Pocket(BaseGeometry):
         progress: float = 0.0
         best_progress: float = 0.0
         best_distance: float = 0.0
-        dist_offset: int = 100000
+        dist_offset: int = EDGE_EXTENSION
         corner_zoom = CORNER_ZOOM * self.step
 
         # Extrapolate line beyond it's actual distance to give the algorithm
         # room to overshoot while converging on an optimal position for the new arc.
-        edge_extended: LineString = self._extrapolate_line(
-            dist_offset, voronoi_edge)
-        assert abs(edge_extended.length -
-                   (voronoi_edge.length + 2 * dist_offset)) < 0.0001
+        edge_extended: LineString = self._edge_profile(voronoi_edge).extended
 
-        assert self.calculated_area_total
-        assert self.calculated_area_total.is_valid
+        assert not self.calculated_area_total.is_empty()
 
         # Loop multiple times, trying to converge on a distance along the voronoi
         # edge that provides the correct step size.
@@ -1133,6 +1263,11 @@ class Pocket(BaseGeometry):
             # Compare proposed arc to cut area.
             # We are only interested in sections that have not been cut yet.
             arcs = self._split_arcs([circle])
+            if not arcs and guessed:
+                # Try the fixed step before giving up.
+                guessed = False
+                distance = start_distance + desired_step
+                continue
             if not arcs:
                 # arc is entirely hidden by previous cut geometry.
 
@@ -1152,7 +1287,8 @@ class Pocket(BaseGeometry):
             if self.last_circle:
                 progress = self._furthest_spacing_arcs(arcs, self.last_circle)
             else:
-                progress = self._furthest_spacing_shapely(arcs, self.calculated_area_total)
+                progress = self._furthest_spacing_shapely(
+                        arcs, self.calculated_area_total.total())
 
             desired_step = min(self.step, (voronoi_edge.length - start_distance))
             if radius < corner_zoom:
@@ -1160,6 +1296,18 @@ class Pocket(BaseGeometry):
                 multiplier = (corner_zoom - radius) / corner_zoom
                 desired_step = self.step * (1 - CORNER_ZOOM_EFFECT * multiplier)
 
+            if guessed:
+                guessed = False
+                # The estimate only holds if the new arc is no further than the
+                # step from the real cut, not just from the previous circle.
+                # The distances to the cut area near the arc are no less than to
+                # the whole of it: this never accepts a wider gap.
+                gap = self._furthest_spacing_shapely(
+                        arcs, self.calculated_area_total.around(circle.path))
+                if gap > desired_step * (1 + 1 / 20):
+                    distance = start_distance + desired_step
+                    continue
+
             if abs(desired_step - progress) < abs(desired_step - best_progress):
                 # Better fit.
                 best_progress = progress
@@ -1205,8 +1353,7 @@ class Pocket(BaseGeometry):
 
         assert circle is not None
         self.last_circle = circle
-        self.calculated_area_total = self.calculated_area_total.union(
-                Polygon(circle.path))
+        self.calculated_area_total.add(Polygon(circle.path))
 
         filtered_arcs = []
         for arc in arcs:
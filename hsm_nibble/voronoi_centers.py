@@ -22,6 +22,8 @@ from typing import Dict, List, Optional, Set, Tuple, Union
 
 import math
 
+import numpy as np
+import shapely  # type: ignore
 from shapely.geometry.base import BaseGeometry  # type: ignore
 from shapely.geometry import box, LineString, Point, Polygon  # type: ignore
 from shapely.ops import linemerge, nearest_points  # type: ignore
@@ -54,6 +56,13 @@ def round_coord(value: Tuple[float, float], dp: int = ROUND_DP) -> Tuple[float,
     return (round(value[0], dp), round(value[1], dp))
 
 
+def retrieve_scaled_segment(pv: pyvoronoi.Pyvoronoi, cell):
+    # Newer pyvoronoi fixed the typo in the method name.
+    if hasattr(pv, "RetrieveScaledSegment"):
+        return pv.RetrieveScaledSegment(cell)
+    return pv.RetriveScaledSegment(cell)
+
+
 class VoronoiCenters:
     """
     A wrapper for pyvoronoi that calculates midpoints equidistant to 2 or more polygon
@@ -108,7 +117,7 @@ class VoronoiCenters:
         # Generate voronoi diagram.
         pv = pyvoronoi.Pyvoronoi(VORONOI_RES)
         for segment in geom_primatives:
-            pv.AddSegment(segment)
+            pv.AddSegment([list(segment[0]), list(segment[1])])
         pv.Construct()
 
         edges = pv.GetEdges()
@@ -121,6 +130,9 @@ class VoronoiCenters:
         self.edge_to_vertex: Dict[int, Tuple[Vertex, Vertex]] = {}
 
         self.edge_count = 0
+
+        # Candidate edges: one of each pair of twins, primary.
+        candidates: List[int] = []
         visited_edges: Set[int] = set()
         for edge_index, edge in enumerate(edges):
             if edge_index in visited_edges:
@@ -128,62 +140,68 @@ class VoronoiCenters:
             visited_edges.add(edge_index)
             visited_edges.add(edge.twin)
 
-            start_vert = vertices[edge.start]
-            end_vert = vertices[edge.end]
             if edge.twin and edge.is_primary:
-                p_start = Point(round_coord((start_vert.X, start_vert.Y)))
-                p_end = Point(round_coord((end_vert.X, end_vert.Y)))
-                if (p_start.distance(self.polygon) <= EPS and
-                        p_end.distance(self.polygon) <= EPS):
-                    if edge.is_linear:
-                        line = LineString((
-                            round_coord((start_vert.X, start_vert.Y)),
-                            round_coord((end_vert.X, end_vert.Y))
-                        ))
-                        self._store_edge(line)
-                    else:
-                        cell = cells[edge.cell]
-                        cell_twin = cells[edges[edge.twin].cell]
-
-                        geom_points = []
-                        geom_edges = []
-                        if cell.contains_point:
-                            geom_points.append(pv.RetrieveScaledPoint(cell))
-                        if cell_twin.contains_point:
-                            geom_points.append(
-                                pv.RetrieveScaledPoint(cell_twin))
-                        if cell.contains_segment:
-                            geom_edges.append(pv.RetriveScaledSegment(cell))
-                        if cell_twin.contains_segment:
-                            geom_edges.append(
-                                pv.RetriveScaledSegment(cell_twin))
-                        assert len(geom_edges) > 0
-                        assert len(geom_points) + len(geom_edges) == 2
-
-                        if len(geom_points) == 1 and len(geom_edges) == 1:
-                            start_point = Point(round_coord(
-                                (start_vert.X, start_vert.Y)))
-                            end_point = Point(round_coord(
-                                (end_vert.X, end_vert.Y)))
-                            max_distance = start_point.distance(end_point) / 10 + 0.01
-                            points = (round_coord(point)
-                                      for point in
-                                      pv.DiscretizeCurvedEdge(edge_index, max_distance))
-                            self._store_edge(LineString(points))
-                        else:
-                            # A parabola between 2 lines (as opposed to 1 line and one point)
-                            # leaves the DiscretizeCurvedEdge() function broken sometimes.
-                            # Let's just assume a straight line edge in these cases.
-                            # This is a particular problem when duplicate points in
-                            # input data create a line of zero length.
-                            log("BORKED VORONOI: \t"
-                                "geom_points: {geom_points}\tgeom_edges: {geom_edges}")
-                            line = LineString((
-                                round_coord((start_vert.X, start_vert.Y)),
-                                round_coord((end_vert.X, end_vert.Y))
-                            ))
-                            self._store_edge(line)
-                        continue
+                candidates.append(edge_index)
+
+        # Keep the edges with both ends inside the polygon: all the vertices are
+        # checked at once.
+        rounded_vertices = [round_coord((vertex.X, vertex.Y)) for vertex in vertices]
+        vertices_xy = np.array(rounded_vertices, dtype=float).reshape(-1, 2)
+        inside = self._vertices_inside(vertices_xy)
+
+        starts = np.array([edges[edge_index].start for edge_index in candidates], dtype=int)
+        ends = np.array([edges[edge_index].end for edge_index in candidates], dtype=int)
+        kept = inside[starts] & inside[ends] if candidates else np.zeros(0, dtype=bool)
+
+        # The straight edges, built at once.
+        lines = shapely.linestrings(
+                np.stack([vertices_xy[starts], vertices_xy[ends]], axis=1)) \
+            if candidates else []
+
+        for candidate, edge_index in enumerate(candidates):
+            if not kept[candidate]:
+                continue
+
+            edge = edges[edge_index]
+            start_coord = rounded_vertices[edge.start]
+            end_coord = rounded_vertices[edge.end]
+            if edge.is_linear:
+                self._store_edge(lines[candidate], vertices=(start_coord, end_coord))
+                continue
+
+            cell = cells[edge.cell]
+            cell_twin = cells[edges[edge.twin].cell]
+
+            geom_points = []
+            geom_edges = []
+            if cell.contains_point:
+                geom_points.append(pv.RetrieveScaledPoint(cell))
+            if cell_twin.contains_point:
+                geom_points.append(
+                    pv.RetrieveScaledPoint(cell_twin))
+            if cell.contains_segment:
+                geom_edges.append(retrieve_scaled_segment(pv, cell))
+            if cell_twin.contains_segment:
+                geom_edges.append(
+                    retrieve_scaled_segment(pv, cell_twin))
+            assert len(geom_edges) > 0
+            assert len(geom_points) + len(geom_edges) == 2
+
+            if len(geom_points) == 1 and len(geom_edges) == 1:
+                max_distance = math.dist(start_coord, end_coord) / 10 + 0.01
+                points = (round_coord(point)
+                          for point in
+                          pv.DiscretizeCurvedEdge(edge_index, max_distance))
+                self._store_edge(LineString(points))
+            else:
+                # A parabola between 2 lines (as opposed to 1 line and one point)
+                # leaves the DiscretizeCurvedEdge() function broken sometimes.
+                # Let's just assume a straight line edge in these cases.
+                # This is a particular problem when duplicate points in
+                # input data create a line of zero length.
+                log("BORKED VORONOI: \t"
+                    "geom_points: {geom_points}\tgeom_edges: {geom_edges}")
+                self._store_edge(lines[candidate], vertices=(start_coord, end_coord))
 
         preserve = set()
         if preserve_widest:
@@ -217,6 +235,23 @@ class VoronoiCenters:
 
         self._check_data()
 
+    def _vertices_inside(self, vertices_xy: np.ndarray) -> np.ndarray:
+        """
+        Which of the voronoi vertices are inside the polygon (or on its edge,
+        within EPS), all at once.
+        """
+        shapely.prepare(self.polygon)
+
+        inside = shapely.contains_xy(self.polygon, vertices_xy[:, 0], vertices_xy[:, 1])
+
+        # The others may be on the edge.
+        outside = np.flatnonzero(~inside)
+        if len(outside):
+            distances = shapely.distance(self.polygon, shapely.points(vertices_xy[outside]))
+            inside[outside] = distances <= EPS
+
+        return inside
+
     def _check_data(self) -> None:
         """ Sanity check data structures. """
         for edge_i, edge in self.edges.items():
@@ -274,19 +309,31 @@ class VoronoiCenters:
         # .simplify(...) will fix issues caused by input coordinate jitter.
         self.polygon = self.polygon.simplify(0.05)
 
-    def _store_edge(self, edge: LineString, replace_index=None):
+    def _store_edge(
+            self,
+            edge: LineString,
+            replace_index=None,
+            vertices: Optional[Tuple[Vertex, Vertex]] = None
+    ):
         """
         Store a vorinoi edge and associated vertices in out internal data structures.
+        The vertices of a straight edge can be given, rather than read back
+        from the LineString.
         """
-        if edge.length == 0:
-            return
+        if vertices is not None:
+            if vertices[0] == vertices[1]:
+                return
+            vert_index_a, vert_index_b = vertices
+        else:
+            if edge.length == 0:
+                return
+            vert_index_a = (edge.coords[0][0], edge.coords[0][1])
+            vert_index_b = (edge.coords[-1][0], edge.coords[-1][1])
 
         edge_index = replace_index
         if edge_index is None:
             edge_index = self.edge_count
             self.edge_count += 1
-        vert_index_a = (edge.coords[0][0], edge.coords[0][1])
-        vert_index_b = (edge.coords[-1][0], edge.coords[-1][1])
 
         self.edges[edge_index] = edge
         if edge_index not in self.vertex_to_edges:
@@ -60,6 +60,8 @@ from gcode_generator import Tab
 
 from gcode_generator import GcodeGenerator
 
+from toolpaths_cache import ToolpathsCache
+
 import resources_rc
 from ui_mainwindow import Ui_mainwindow
 
@@ -144,6 +146,22 @@ class PyCutMainWindow(QtWidgets.QMainWindow):
         # a job to keep the generated gcode in memory (and save it)
         self.job = None
 
+        # the run time estimate, fed with the gcode as it is generated
+        self.gcode_statistics = GcodeMiniParser()
+
+        # the toolpaths of the operations whose inputs did not change are not recalculated
+        self.toolpaths_cache = ToolpathsCache()
+
+        # the simulator vertex buffers of the gcode already simulated, on disk
+        gcodesimulator_python_glviewer.Scene.set_cache_dir(
+            os.path.join(
+                QtCore.QStandardPaths.writableLocation(
+                    QtCore.QStandardPaths.CacheLocation
+                ),
+                "simulator",
+            )
+        )
+
         # open/read/write project settings
         self.projfilename = None
 
@@ -219,15 +237,17 @@ class PyCutMainWindow(QtWidgets.QMainWindow):
         self.ui.GCodeGeneration_SpindleControl.clicked.connect(self.cb_spindle_control)
 
         self.ui.GCodeConversion_ZeroTopLeftOfMaterial.clicked.connect(
-            self.cb_generate_gcode
+            self.cb_regenerate_gcode
         )
         self.ui.GCodeConversion_ZeroLowerLeftOfMaterial.clicked.connect(
-            self.cb_generate_gcode
+            self.cb_regenerate_gcode
         )
         self.ui.GCodeConversion_ZeroLowerLeftOfOp.clicked.connect(
-            self.cb_generate_gcode
+            self.cb_regenerate_gcode
+        )
+        self.ui.GCodeConversion_ZeroCenterOfOp.clicked.connect(
+            self.cb_regenerate_gcode
         )
-        self.ui.GCodeConversion_ZeroCenterOfOp.clicked.connect(self.cb_generate_gcode)
 
         self.ui.GCodeConversion_ZeroTopLeftOfMaterial.setIcon(
             QtGui.QIcon(self.IMG_TANGO_VIEW_REFRESH)
@@ -350,7 +370,7 @@ class PyCutMainWindow(QtWidgets.QMainWindow):
         self.ui.GCodeConversion_YOffset.valueChanged.connect(
             self.cb_generate_gcode_y_offset
         )
-        self.ui.GCodeConversion_FlipXY.clicked.connect(self.cb_generate_gcode)
+        self.ui.GCodeConversion_FlipXY.clicked.connect(self.cb_regenerate_gcode)
 
         self.setWindowState(QtCore.Qt.WindowMaximized)
 
@@ -840,7 +860,9 @@ class PyCutMainWindow(QtWidgets.QMainWindow):
         self.ui.GCodeConversion_YOffset.valueChanged.disconnect(
             self.cb_generate_gcode_y_offset
         )
-        self.ui.GCodeConversion_FlipXY.clicked.disconnect(self.cb_generate_gcode)
+        self.ui.GCodeConversion_FlipXY.clicked.disconnect(
+            self.cb_regenerate_gcode
+        )
 
         self.open_project(projfilename)
 
@@ -850,7 +872,7 @@ class PyCutMainWindow(QtWidgets.QMainWindow):
         self.ui.GCodeConversion_YOffset.valueChanged.connect(
             self.cb_generate_gcode_y_offset
         )
-        self.ui.GCodeConversion_FlipXY.clicked.connect(self.cb_generate_gcode)
+        self.ui.GCodeConversion_FlipXY.clicked.connect(self.cb_regenerate_gcode)
 
     def cb_open_project(self):
         """ """
@@ -869,7 +891,9 @@ class PyCutMainWindow(QtWidgets.QMainWindow):
             self.ui.GCodeConversion_YOffset.valueChanged.disconnect(
                 self.cb_generate_gcode_y_offset
             )
-            self.ui.GCodeConversion_FlipXY.clicked.disconnect(self.cb_generate_gcode)
+            self.ui.GCodeConversion_FlipXY.clicked.disconnect(
+                self.cb_regenerate_gcode
+            )
         except Exception as e:
             print(e)
             pass
@@ -882,7 +906,7 @@ class PyCutMainWindow(QtWidgets.QMainWindow):
         self.ui.GCodeConversion_YOffset.valueChanged.connect(
             self.cb_generate_gcode_y_offset
         )
-        self.ui.GCodeConversion_FlipXY.clicked.connect(self.cb_generate_gcode)
+        self.ui.GCodeConversion_FlipXY.clicked.connect(self.cb_regenerate_gcode)
 
     def open_project(self, projfilename: str):
         cwd = os.getcwd()
@@ -1495,8 +1519,11 @@ class PyCutMainWindow(QtWidgets.QMainWindow):
 
         return cnc_ops
 
-    def get_jobmodel(self) -> JobModel:
-        """ """
+    def get_jobmodel(self, reuse_toolpaths: bool = False) -> JobModel:
+        """
+        with reuse_toolpaths, the toolpaths of the current job are kept
+        if they do not depend on the changed settings
+        """
         settings = self.get_current_settings()
 
         svg_model = SvgModel()
@@ -1570,6 +1597,8 @@ class PyCutMainWindow(QtWidgets.QMainWindow):
             tool_model,
             tabsmodel,
             gcode_model,
+            previous_job=self.job if reuse_toolpaths else None,
+            toolpaths_cache=self.toolpaths_cache,
         )
 
         return job
@@ -1586,20 +1615,40 @@ class PyCutMainWindow(QtWidgets.QMainWindow):
         if not ok:
             return
 
-        generator = GcodeGenerator(job)
+        generator = self.new_gcode_generator(job)
+        generator.generate_gcode()
+
+        self.after_gcode_generation(generator)
+
+    def cb_regenerate_gcode(self):
+        """
+        gcode conversion settings changed (flip, zero reference):
+        the toolpaths are not recalculated, only the gcode
+        """
+        self.job = job = self.get_jobmodel(reuse_toolpaths=True)
+
+        ok = self.jobmodel_check_operations()
+        if not ok:
+            return
+
+        ok = self.jobmodel_check_toolpaths()
+        if not ok:
+            return
+
+        generator = self.new_gcode_generator(job)
         generator.generate_gcode()
 
         self.after_gcode_generation(generator)
 
     def cb_generate_gcode_x_offset(self):
         """ """
-        self.job = job = self.get_jobmodel()
+        self.job = job = self.get_jobmodel(reuse_toolpaths=True)
 
         ok = self.jobmodel_check_toolpaths()
         if not ok:
             return
 
-        generator = GcodeGenerator(job)
+        generator = self.new_gcode_generator(job)
         generator.set_x_offset(self.ui.GCodeConversion_XOffset.value())
         # generator.generate_gcode()
 
@@ -1607,13 +1656,13 @@ class PyCutMainWindow(QtWidgets.QMainWindow):
 
     def cb_generate_gcode_y_offset(self):
         """ """
-        self.job = job = self.get_jobmodel()
+        self.job = job = self.get_jobmodel(reuse_toolpaths=True)
 
         ok = self.jobmodel_check_toolpaths()
         if not ok:
             return
 
-        generator = GcodeGenerator(job)
+        generator = self.new_gcode_generator(job)
         generator.set_y_offset(self.ui.GCodeConversion_YOffset.value())
         # generator.generate_gcode()
 
@@ -1653,6 +1702,13 @@ class PyCutMainWindow(QtWidgets.QMainWindow):
 
         return has_toolpaths
 
+    def new_gcode_generator(self, job: JobModel) -> GcodeGenerator:
+        """
+        a generator feeding the run time estimate chunk by chunk
+        """
+        self.gcode_statistics = GcodeMiniParser()
+        return GcodeGenerator(job, self.gcode_statistics.parse_gcode_chunk)
+
     def after_gcode_generation(self, generator: GcodeGenerator):
         """ """
         # with the resulting calculation, we can fill the min/max in X/Y as well as the offsets
@@ -1683,10 +1739,9 @@ class PyCutMainWindow(QtWidgets.QMainWindow):
         # gcode viewer/simulator
         gcode = generator.gcode
 
-        # quick stats
-        miniparser = GcodeMiniParser()
-        miniparser.parse_gcode(gcode)
-        path_time = math.floor(miniparser.path_time)
+        # quick stats: the chunks were parsed during the generation
+        self.gcode_statistics.end_gcode_chunks()
+        path_time = math.floor(self.gcode_statistics.path_time)
         self.ui.GCodeStatistics_RunTime.setText(
             f"{path_time//60} [min] {path_time%60} [s]"
         )
@@ -0,0 +1,476 @@
+# This Python file uses the following encoding: utf-8
+
+"""
+PyCut batch mode: generate the gcode of PyCut projects without any GUI.
+
+The project json file is read, the models (tool, material, tabs, gcode conversion)
+are built directly from the project settings, the svg shapes are read from the svg
+file of the project and the gcode is written into a ".nc" file.
+
+No Qt application is started, so this runs on servers without display.
+
+    > python pycut_batch.py projects/cnc_three_rects.json
+    > python pycut_batch.py -j 8 -o out projects/*.json
+    > python pycut_batch.py --ops op1 op2 projects/cnc_three_rects.json
+    > python pycut_batch.py --cache projects/cnc_three_rects.json
+"""
+
+import sys
+import os
+import json
+import argparse
+import time
+
+import concurrent.futures
+import xml.etree.ElementTree as etree
+
+from typing import List
+from typing import Dict
+from typing import Any
+
+import shapely_svgpath_io
+from shapely_svgpath_io import SvgPath
+
+from val_with_unit import ValWithUnit
+
+from gcode_generator import GcodeModel
+from gcode_generator import ToolModel
+from gcode_generator import SvgModel
+from gcode_generator import MaterialModel
+from gcode_generator import TabsModel
+from gcode_generator import CncOp
+from gcode_generator import JobModel
+from gcode_generator import GcodeGenerator
+
+from toolpaths_cache import ToolpathsCache
+
+VERSION = "0_6_5_RC3"
+
+
+class SvgShapes:
+    """
+    The svg shapes of a svg file - what the SvgViewer offers to the JobModel
+    (the "svg_shapes" dict and the svg size) without any widget.
+    """
+
+    def __init__(self, svg: str):
+        self.svg = svg
+
+        # path id -> SvgPath
+        self.svg_shapes: Dict[str, SvgPath] = SvgPath.read_svg_shapes_and_paths(svg)
+
+    def get_svg_size_x(self) -> ValWithUnit | None:
+        """
+        get the width of the svg given in units "mm", "cm" or "in" (see Inkscape)
+        """
+        root = etree.fromstring(self.svg)
+
+        return self.size_with_units(root.attrib["width"])
+
+    def get_svg_size_y(self) -> ValWithUnit | None:
+        """
+        get the height of the svg given in units "mm", "cm" or "in" (see Inkscape)
+        """
+        root = etree.fromstring(self.svg)
+
+        return self.size_with_units(root.attrib["height"])
+
+    @staticmethod
+    def size_with_units(size: str) -> ValWithUnit | None:
+        """ """
+        if "mm" in size:
+            return ValWithUnit(float(size.split("mm")[0]), "mm")
+        elif "cm" in size:
+            return ValWithUnit(10 * float(size.split("cm")[0]), "mm")
+        elif "in" in size:
+            return ValWithUnit(float(size.split("in")[0]), "inch")
+
+        return None
+
+
+class BatchProject:
+    """
+    A PyCut project (json file) processed without GUI
+    """
+
+    def __init__(
+        self,
+        projfilename: str,
+        op_names: List[str] | None = None,
+        nb_workers: int = 1,
+        cache_toolpaths: bool = False,
+    ):
+        self.projfilename = projfilename
+
+        with open(projfilename) as f:
+            self.project = json.load(f)
+
+        self.settings = self.project["settings"]
+
+        # if given, only these operations - otherwise all operations of the project
+        self.op_names = op_names
+
+        # the toolpaths of the operations calculated in worker processes if > 1
+        self.nb_workers = nb_workers
+
+        # the toolpaths kept on disk next to the project, for the next runs
+        self.toolpaths_cache = (
+            ToolpathsCache.for_project(projfilename) if cache_toolpaths else None
+        )
+
+    def svg_filename(self) -> str:
+        """
+        the svg file is relativ to the project file - or absolute
+        """
+        svg_file = self.project["svg_file"]
+
+        if os.path.isabs(svg_file):
+            return svg_file
+
+        projdir = os.path.dirname(os.path.abspath(self.projfilename))
+
+        return os.path.join(projdir, svg_file)
+
+    def apply_curve_to_line_conversion(self):
+        """
+        as the main window does when its spinboxes are set
+        """
+        settings = self.settings.get("CurveToLineConversion", {})
+
+        if "minimum_segments" in settings:
+            shapely_svgpath_io.SvgPathDiscretizer.set_arc_min_nb_segments(
+                settings["minimum_segments"]
+            )
+        if settings.get("minimum_segments_length", 0) != 0:
+            shapely_svgpath_io.SvgPathDiscretizer.set_arc_precision(
+                settings["minimum_segments_length"]
+            )
+
+    def make_material_model(self, svg_shapes: SvgShapes) -> MaterialModel:
+        """ """
+        settings = self.settings["Material"]
+
+        material_model = MaterialModel()
+        material_model.mat_units = settings["units"]
+        material_model.mat_thickness = ValWithUnit(
+            settings["thickness"], material_model.mat_units
+        )
+        material_model.mat_z_origin = settings["z_origin"]
+        material_model.mat_clearance = ValWithUnit(
+            settings["clearance"], material_model.mat_units
+        )
+
+        # the SVG dimensions
+        size_x = svg_shapes.get_svg_size_x()
+        size_y = svg_shapes.get_svg_size_y()
+        if size_x is not None:
+            material_model.set_material_size_x(size_x)
+        if size_y is not None:
+            material_model.set_material_size_y(size_y)
+
+        return material_model
+
+    def make_tool_model(self) -> ToolModel:
+        """ """
+        settings = self.settings["Tool"]
+
+        tool_model = ToolModel()
+        tool_model.units = settings["units"]
+        tool_model.diameter = ValWithUnit(settings["diameter"], tool_model.units)
+        tool_model.angle = settings["angle"]
+        tool_model.passdepth = ValWithUnit(settings["passdepth"], tool_model.units)
+        tool_model.overlap = settings["overlap"]
+        tool_model.rapid_rate = ValWithUnit(settings["rapid"], tool_model.units)
+        tool_model.plunge_rate = ValWithUnit(settings["plunge"], tool_model.units)
+        tool_model.cut_rate = ValWithUnit(settings["cut"], tool_model.units)
+        tool_model.helix_pitch = ValWithUnit(
+            settings.get("helix_pitch", 0.1), tool_model.units
+        )
+
+        return tool_model
+
+    def make_tabs_model(self) -> TabsModel:
+        """ """
+        settings = self.settings["Tabs"]
+
+        tabs = settings.get("tabs", [])
+
+        tabs_model = TabsModel([tab for tab in tabs if tab["enabled"] == True])
+        tabs_model.units = settings["units"]
+        tabs_model.height = ValWithUnit(settings["height"], tabs_model.units)
+
+        return tabs_model
+
+    def make_gcode_model(self) -> GcodeModel:
+        """ """
+        conversion = self.settings["GCodeConversion"]
+        generation = self.settings["GCodeGeneration"]
+
+        gcode_model = GcodeModel()
+        gcode_model.units = conversion["units"]
+        gcode_model.flip_xy = conversion["flip_xy"]
+        gcode_model.use_offset = conversion["use_offset"]
+        gcode_model.x_offset = conversion["x_offset"]
+        gcode_model.y_offset = conversion["y_offset"]
+        gcode_model.return_to_zero_at_end = generation["return_to_zero_at_end"]
+        gcode_model.spindle_control = generation["spindle_control"]
+        gcode_model.spindle_speed = generation["spindle_speed"]
+        gcode_model.program_end = generation["program_end"]
+
+        gcode_model.gcode_zero_ref = GcodeModel.ZERO_TOP_LEFT_OF_MATERIAL
+        for zero_ref, name in GcodeModel.GCODE_ZERO_REF_STRINGS.items():
+            if name == conversion["xy_reference"]:
+                gcode_model.gcode_zero_ref = zero_ref
+
+        return gcode_model
+
+    def make_cnc_ops(self) -> List[CncOp]:
+        """
+        The "enabled" flag is not saved in the project: all the operations
+        are enabled, or only the selected ones
+        """
+        cnc_ops: List[CncOp] = []
+
+        for operation in self.project["operations"]:
+            if self.op_names and operation["name"] not in self.op_names:
+                continue
+
+            cnc_op = CncOp(
+                {
+                    "units": operation.get("units", "mm"),
+                    "name": operation["name"],
+                    "paths": operation["paths"],
+                    "combinaison": operation.get("combinaison", "Union"),
+                    "ramp_plunge": operation.get("ramp_plunge", False),
+                    "type": operation["type"],
+                    "direction": operation.get("direction", "Conventional"),
+                    "cut_depth": operation["cut_depth"],
+                    "margin": operation.get("margin", 0.0),
+                    "width": operation.get("width", 0.0),
+                    "enabled": True,
+                }
+            )
+
+            cnc_ops.append(cnc_op)
+
+        return cnc_ops
+
+    def make_jobmodel(self) -> JobModel:
+        """
+        build the job - the toolpaths are calculated here
+        """
+        self.apply_curve_to_line_conversion()
+
+        with open(self.svg_filename()) as f:
+            svg_shapes = SvgShapes(f.read())
+
+        material_model = self.make_material_model(svg_shapes)
+
+        SvgModel.size_x = material_model.size_x
+        SvgModel.size_y = material_model.size_y
+
+        svg_model = SvgModel()
+        svg_model.px_per_inch = self.settings.get("svg", {}).get("px_per_inch", 96)
+
+        return JobModel(
+            svg_shapes,
+            self.make_cnc_ops(),
+            material_model,
+            svg_model,
+            self.make_tool_model(),
+            self.make_tabs_model(),
+            self.make_gcode_model(),
+            nb_workers=self.nb_workers,
+            toolpaths_cache=self.toolpaths_cache,
+        )
+
+    def generate_gcode(self) -> str:
+        """ """
+        job = self.make_jobmodel()
+
+        generator = GcodeGenerator(job)
+        generator.generate_gcode()
+
+        return generator.gcode
+
+    def write_gcode(self, filename: str) -> int:
+        """
+        stream the gcode into the file - returns the number of lines
+        """
+        job = self.make_jobmodel()
+
+        generator = GcodeGenerator(job)
+
+        if len(generator.cnc_ops_with_toolpaths()) == 0:
+            raise ValueError("no toolpaths - nothing to generate")
+
+        with open(filename, "w") as fp:
+            generator.generate_gcode(fp)
+
+        return generator.nb_lines
+
+
+def nc_filename(projfilename: str, output_dir: str | None) -> str:
+    """
+    the gcode file has the name of the project, with extension ".nc"
+    """
+    projname = os.path.splitext(os.path.basename(projfilename))[0]
+
+    if output_dir is None:
+        output_dir = os.path.dirname(projfilename)
+
+    return os.path.join(output_dir, "%s.nc" % projname)
+
+
+def process_project(
+    projfilename: str,
+    output_dir: str | None,
+    op_names: List[str] | None,
+    nb_op_workers: int = 1,
+    cache_toolpaths: bool = False,
+) -> Dict[str, Any]:
+    """
+    generate and write the gcode of a project - runs in a worker process
+    (or uses worker processes for its operations if nb_op_workers > 1)
+    """
+    result = {
+        "project": projfilename,
+        "nc_file": None,
+        "nb_lines": 0,
+        "duration": 0.0,
+        "error": None,
+    }
+
+    t0 = time.time()
+
+    try:
+        filename = nc_filename(projfilename, output_dir)
+
+        project = BatchProject(projfilename, op_names, nb_op_workers, cache_toolpaths)
+
+        result["nb_lines"] = project.write_gcode(filename)
+        result["nc_file"] = filename
+    except Exception as e:
+        result["error"] = "%s: %s" % (type(e).__name__, e)
+
+    result["duration"] = time.time() - t0
+
+    return result
+
+
+def run(
+    projfilenames: List[str],
+    output_dir: str | None = None,
+    op_names: List[str] | None = None,
+    nb_workers: int = 1,
+    cache_toolpaths: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    process all the projects, in a pool of worker processes if nb_workers > 1.
+    A single project uses the worker processes for its operations.
+
+    The results are in the order of the given projects
+    """
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    if len(projfilenames) == 1:
+        return [
+            process_project(
+                projfilenames[0], output_dir, op_names, nb_workers, cache_toolpaths
+            )
+        ]
+
+    if nb_workers <= 1:
+        return [
+            process_project(projfilename, output_dir, op_names, 1, cache_toolpaths)
+            for projfilename in projfilenames
+        ]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=nb_workers) as executor:
+        futures = [
+            executor.submit(
+                process_project, projfilename, output_dir, op_names, 1, cache_toolpaths
+            )
+            for projfilename in projfilenames
+        ]
+
+        return [future.result() for future in futures]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="PyCut-batch",
+        description="PyCut gcode generation of projects, without GUI",
+    )
+
+    parser.add_argument(
+        "projects",
+        nargs="+",
+        help="project files (json)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        dest="output_dir",
+        default=None,
+        help="directory of the generated gcode files | the project directory",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (projects, or operations of a single "
+        "project, or polygons of its single hsm pocket) | number of cpus",
+    )
+    parser.add_argument(
+        "--ops",
+        dest="ops",
+        nargs="+",
+        default=None,
+        help="names of the operations to generate | all",
+    )
+    parser.add_argument(
+        "--cache",
+        dest="cache",
+        action="store_true",
+        help="keep the toolpaths in a cache directory next to the project, "
+        "only the operations that changed are calculated again",
+    )
+
+    # version info
+    parser.add_argument("--version", action="version", version=f"{VERSION}")
+
+    options = parser.parse_args()
+
+    results = run(
+        options.projects, options.output_dir, options.ops, options.jobs, options.cache
+    )
+
+    nb_errors = 0
+
+    for result in results:
+        if result["error"] is not None:
+            nb_errors += 1
+            print(
+                "FAILED  %s : %s" % (result["project"], result["error"]),
+                file=sys.stderr,
+            )
+        else:
+            print(
+                "OK      %s -> %s (%d lines, %.1f s)"
+                % (
+                    result["project"],
+                    result["nc_file"],
+                    result["nb_lines"],
+                    result["duration"],
+                )
+            )
+
+    sys.exit(1 if nb_errors > 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,8 @@
 
 import sys
 import math
+import multiprocessing
+import concurrent.futures
 
 from math import sqrt
 
@@ -24,18 +26,18 @@ from typing import List
 from typing import Dict
 from typing import Tuple
 from typing import Any
+from typing import Iterator
 
 import numpy as np
 import matplotlib.pyplot as plt
 from shapely_svgpath_io import SvgPath
 
-from val_with_unit import ValWithUnit
-
 import shapely
 import shapely.geometry
 import shapely.ops
 
 from shapely_utils import ShapelyUtils
+from shapely_utils import ShapelyLinkChecker
 from shapely_ext import ShapelyMultiPolygonOffset
 from shapely_ext import ShapelyMultiPolygonOffsetInteriors
 from shapely_matplotlib import MatplotLibUtils
@@ -50,19 +52,146 @@ class CamPath:
     CamPath has this format: {
       path:               Shapely LineString
       safe_to_close:      Is it safe to close the path without retracting?
+      arcs:               The parts of the path on circle arcs
     }
     """
 
-    def __init__(self, path: shapely.geometry.LineString, safe_to_close: bool = True):
+    def __init__(
+        self,
+        path: shapely.geometry.LineString,
+        safe_to_close: bool = True,
+        arcs: List[Tuple[int, int, float, float]] | None = None,
+    ):
         # shapely linestring
         self.path = path
         # is it safe to close the path without retracting?
         self.safe_to_close = safe_to_close
+        # (first point index, last point index, center x, center y) of the
+        # arcs of the path, in the path order: cut with G2/G3 in the gcode
+        self.arcs = arcs if arcs is not None else []
+
+
+class NearestPointFinder:
+    """
+    Search of the closest point among the points of paths, when the paths
+    are taken one after the other (merge paths).
+
+    The points are in a STRtree: the search is restricted to the points
+    around the current point, and the taken paths are removed from the search
+    (the tree is rebuilt when they are too many). For few points, all the
+    points of the remaining paths are scanned with numpy.
+
+    Same result as the scan of all the points of the remaining paths with
+    cam.distP: the first path, then the first point of the closest ones.
+    """
+
+    # slack on the search radius: the GEOS distances and the squared
+    # distances of cam.distP must agree on the candidates
+    RADIUS_SLACK = 1.0e-9
+
+    # below, a plain (numpy) scan of the points is faster than the tree
+    SCAN_MAX_NB_POINTS = 20000
+
+    def __init__(self, paths: List[List[Tuple[float, float]]]):
+        self.nb_points = np.array([len(path) for path in paths], dtype=np.int64)
+
+        self.path_index = np.repeat(np.arange(len(paths)), self.nb_points)
+        self.point_index = np.arange(len(self.path_index)) - np.repeat(
+            np.cumsum(self.nb_points) - self.nb_points, self.nb_points
+        )
+
+        self.xy = np.array(
+            [(pt[0], pt[1]) for path in paths for pt in path], dtype=float
+        ).reshape(-1, 2)
+
+        self.alive = np.ones(len(paths), dtype=bool)
+
+        # first search radius
+        if len(self.xy) > 0:
+            extent = np.max(self.xy.max(axis=0) - self.xy.min(axis=0))
+            self.min_radius = max(extent / math.sqrt(len(self.xy)), 1.0e-6)
+        else:
+            self.min_radius = 1.0e-6
+
+        self.build_tree()
+
+    def build_tree(self):
+        """
+        the tree of the points of the remaining paths
+        """
+        self.tree = None
+        self.nb_removed_in_tree = 0
+
+        if len(self.xy) <= self.SCAN_MAX_NB_POINTS:
+            return
+
+        self.tree_ids = np.flatnonzero(self.alive[self.path_index])
+        self.tree = shapely.STRtree(shapely.points(self.xy[self.tree_ids]))
+
+    def remove_path(self, path_index: int):
+        """
+        the points of this path are not searched anymore
+        """
+        self.alive[path_index] = False
+
+        if self.tree is not None:
+            self.nb_removed_in_tree += self.nb_points[path_index]
+
+            if 2 * self.nb_removed_in_tree > len(self.tree_ids):
+                self.build_tree()
+
+    def closest(self, current_point: Tuple[float, float]) -> Tuple[int, int]:
+        """
+        returns (path index, point index) of the closest point of the remaining paths
+        """
+        if self.tree is None:
+            ids = np.flatnonzero(self.alive[self.path_index])
+        else:
+            ids = self.candidates(current_point)
+
+        # exactly the distance of cam.distP - argmin: the first of the closest ones
+        dx = self.xy[ids, 0] - current_point[0]
+        dy = self.xy[ids, 1] - current_point[1]
+        best = ids[np.argmin(dx * dx + dy * dy)]
+
+        return int(self.path_index[best]), int(self.point_index[best])
+
+    def candidates(self, current_point: Tuple[float, float]) -> np.ndarray:
+        """
+        the points of the remaining paths around the current point - the closest
+        ones are among them
+        """
+        point = shapely.Point(current_point[0], current_point[1])
+
+        # the closest point in the tree - maybe of a removed path
+        nearest = self.tree.query_nearest(point, return_distance=True)
+        radius = float(nearest[1][0]) if len(nearest[1]) > 0 else self.min_radius
+
+        while True:
+            found = self.tree.query(
+                point,
+                predicate="dwithin",
+                distance=radius * (1.0 + self.RADIUS_SLACK) + self.RADIUS_SLACK,
+            )
+            ids = self.tree_ids[np.sort(found)]
+            ids = ids[self.alive[self.path_index[ids]]]
+
+            if len(ids) > 0:
+                break
+
+            radius = max(2 * radius, self.min_radius)
+
+        return ids
 
 
 class cam:
     """ """
 
+    # relative tolerance on the radius of the points of an arc, to cut it with G2/G3
+    ARC_TOLERANCE = 0.01
+    # the arcs spanning more than this angle are cut in 2 parts
+    ARC_MAX_SPAN_DEGREES = 300
+
     @classmethod
     def drill(
         cls, multipoint: shapely.geometry.MultiPoint, cutter_dia: float
@@ -169,6 +298,7 @@ class cam:
         cutter_dia: float,
         overlap: float,
         climb: bool,
+        nb_workers: int = 1,
     ) -> List[CamPath]:
         """
         Compute paths for pocket operation on Shapely multipolygon.
@@ -177,8 +307,9 @@ class cam:
 
         cutter_dia is in "UserUnit" units.
         overlap is in the range [0, 1).
+        With nb_workers > 1, the polygons are pocketed in worker processes.
         """
-        pc = NibblePocketCalculator(multipoly, cutter_dia, overlap, climb)
+        pc = NibblePocketCalculator(multipoly, cutter_dia, overlap, climb, nb_workers)
         pc.pocket()
         return pc.cam_paths
 
@@ -526,51 +657,63 @@ class cam:
                 current_path = current_path + [path_start_point]
 
         current_point = current_path[-1]
-        paths[0] = []  # empty
 
-        merged_paths: List[shapely.geometry.LineString] = []
+        # the order of the paths: the next one is the closest to the current point,
+        # and it starts at its closest point (which is then the current point)
+        order: List[Tuple[int, int]] = []
+        links: List[Tuple[Tuple[float, float], Tuple[float, float]]] = []
+
+        finder = NearestPointFinder(paths)
+        finder.remove_path(0)
+
         num_left = len(paths) - 1
 
         while num_left > 0:
-            closest_path_index = -1
-            closest_point_index = -1
-            closest_point_dist = float(sys.maxsize)
-            for path_index, path in enumerate(paths):
-                for point_index, point in enumerate(path):
-                    dist = cam.distP(current_point, point)
-                    if dist < closest_point_dist:
-                        closest_path_index = path_index
-                        closest_point_index = point_index
-                        closest_point_dist = dist
-
-            path = paths[closest_path_index]
-            paths[closest_path_index] = []  # empty
+            closest_path_index, closest_point_index = finder.closest(current_point)
+            finder.remove_path(closest_path_index)
             num_left -= 1
-            need_new = ShapelyUtils.crosses(
-                ext_lines, current_point, path[closest_point_index]
+
+            closest_point = paths[closest_path_index][closest_point_index]
+
+            order.append((closest_path_index, closest_point_index))
+            links.append((current_point, closest_point))
+
+            current_point = closest_point
+
+        # a link crossing outside of bounds or the interior polygons starts a new path
+        links_start = [link[0] for link in links]
+        links_end = [link[1] for link in links]
+
+        need_new = ShapelyLinkChecker(ext_lines).crosses(links_start, links_end)
+        if int_multipoly:
+            need_new |= ShapelyLinkChecker(int_multipoly).crosses(
+                links_start, links_end
             )
-            if (not need_new) and int_multipoly:
-                need_new = ShapelyUtils.crosses(
-                    int_multipoly, current_point, path[closest_point_index]
-                )
+
+        merged_paths: List[List[Tuple[float, float]]] = []
+
+        for (path_index, point_index), new in zip(order, need_new):
+            path = paths[path_index]
 
             # JSCUT path = path.slice(closest_point_index, len(path)).concat(path.slice(0, closest_point_index))
-            path = path[closest_point_index:] + path[:closest_point_index]
+            path = path[point_index:] + path[:point_index]
             path.append(path[0])
 
-            if need_new:
+            if new:
                 merged_paths.append(current_path)
                 current_path = path
-                current_point = current_path[-1]
             else:
                 current_path = current_path + path
-                current_point = current_path[-1]
 
         merged_paths.append(current_path)
 
+        crosses = ShapelyLinkChecker(bounds).crosses(
+            [path[0] for path in merged_paths], [path[-1] for path in merged_paths]
+        )
+
         cam_paths: List[CamPath] = []
-        for path in merged_paths:
-            safe_to_close = not ShapelyUtils.crosses(bounds, path[0], path[-1])
+        for path, crossing in zip(merged_paths, crosses):
+            safe_to_close = not crossing
 
             if closed_path == False:
                 safe_to_close = False
@@ -592,10 +735,11 @@ class cam:
         return dx * dx + dy * dy
 
     @classmethod
-    def get_gcode(cls, args) -> List[str]:
+    def get_gcode(cls, args) -> Iterator[str]:
         """
         Convert paths to gcode. the function assumes that the current Z position is at safeZ.
         get_gcode()'s gcode returns Z to this position at the end.
+        The gcode lines are yielded one after the other (no trailing newline).
         args must have:
           optype:            Type of Op.
           paths:             Array of CamPath
@@ -614,7 +758,7 @@ class cam:
           tool_diameter:
           helix_pitch:       Depth of an helix revolution
           helix_plunge_rate: Helix plunge rate
-          tabs:              List of tabs
+          tabs:              List of tabs, or their TabsIndex
           tabZ:              Level below which tabs are to be processed
           peckZ:             Level to retract when pecking
           flip_xy            Toggle X with Y
@@ -641,14 +785,14 @@ class cam:
         rapid_feed = args["rapid_feed"]
 
         tabs = args["tabs"]
+        if not isinstance(tabs, TabsIndex):
+            tabs = TabsIndex(tabs)
         tabZ = args["tabZ"]
 
         peckZ = args["peckZ"]
 
         flip_xy = args["flip_xy"]
 
-        gcode = []
-
         retract_gcode = [
             "; Retract",
             "G1 Z" + safeZ.to_fixed(decimal) + f"{rapid_feed_gcode}",
@@ -670,52 +814,150 @@ class cam:
         def get_y(p: Tuple[float, float]):
             return -p[1] + y_offset
 
+        # same format as ValWithUnit.to_fixed(decimal), without building
+        # a ValWithUnit for each coordinate
+        fixed_format = "%%4.%df" % decimal
+        xy_format = " X" + fixed_format + " Y" + fixed_format
+        xyz_format = xy_format + " Z" + fixed_format
+
+        def to_fixed(value: float) -> str:
+            return fixed_format % value
+
         def convert_point(p: Tuple[float, float] | Tuple[float, float, float]):
             x = p[0] + x_offset
             y = -p[1] + y_offset
 
             if flip_xy is False:
-                result = (
-                    " X"
-                    + ValWithUnit(x, "-").to_fixed(decimal)
-                    + " Y"
-                    + ValWithUnit(y, "-").to_fixed(decimal)
-                )
+                return xy_format % (x, y)
             else:
-                result = (
-                    " X"
-                    + ValWithUnit(-y, "-").to_fixed(decimal)
-                    + " Y"
-                    + ValWithUnit(x, "-").to_fixed(decimal)
-                )
+                return xy_format % (-y, x)
 
-            return result
+        ij_format = " I" + fixed_format + " J" + fixed_format
 
-        def convert_point_3D(p: Tuple[float, float, float]):
-            x = p[0] + x_offset
-            y = -p[1] + y_offset
-            z = p[2]
+        def machine_points(pts: np.ndarray) -> np.ndarray:
+            """
+            the points with the offsets and the flip applied
+            """
+            x = pts[:, 0] + x_offset
+            y = -pts[:, 1] + y_offset
 
             if flip_xy is False:
-                result = (
-                    " X"
-                    + ValWithUnit(x, "-").to_fixed(decimal)
-                    + " Y"
-                    + ValWithUnit(y, "-").to_fixed(decimal)
-                    + " Z"
-                    + ValWithUnit(z, "-").to_fixed(decimal)
-                )
+                return np.column_stack([x, y])
             else:
-                result = (
-                    " X"
-                    + ValWithUnit(-y, "-").to_fixed(decimal)
-                    + " Y"
-                    + ValWithUnit(x, "-").to_fixed(decimal)
-                    + " Z"
-                    + ValWithUnit(z, "-").to_fixed(decimal)
+                return np.column_stack([-y, x])
+
+        def convert_arc(
+            pts: np.ndarray, xy: np.ndarray, first: int, last: int, center: np.ndarray
+        ) -> List[str]:
+            """
+            the "G2"/"G3" line of the points first..last of a path, on an arc
+            around center (machine coordinates) - in 2 parts if it spans more
+            than ARC_MAX_SPAN_DEGREES, or "G1" lines if the points are not on
+            an arc
+            """
+            if last - first < 2:
+                return convert_points(pts[first + 1 : last + 1])
+
+            start = xy[first]
+            end = xy[last]
+
+            # the angular span of the points around the center
+            arc_xy = xy[first : last + 1] - center
+            span = np.abs(
+                np.sum(
+                    np.arctan2(
+                        arc_xy[:-1, 0] * arc_xy[1:, 1] - arc_xy[:-1, 1] * arc_xy[1:, 0],
+                        np.einsum("ij,ij->i", arc_xy[:-1], arc_xy[1:]),
+                    )
                 )
+            )
+
+            if span > math.radians(cls.ARC_MAX_SPAN_DEGREES):
+                middle = (first + last) // 2
+                return convert_arc(pts, xy, first, middle, center) + convert_arc(
+                    pts, xy, middle, last, center
+                )
+
+            chord = end - start
+            chord_len = math.hypot(chord[0], chord[1])
+
+            if chord_len == 0:
+                return convert_points(pts[first + 1 : last + 1])
+
+            # the center moved on the bisector of the chord: the arc goes
+            # exactly through its start and end points (no radius error)
+            middle_pt = (start + end) / 2
+            normal = np.array([-chord[1], chord[0]]) / chord_len
+            center = middle_pt + normal * np.dot(center - middle_pt, normal)
+            radius = math.hypot(*(start - center))
+
+            arc_xy = xy[first : last + 1] - center
+            deviation = np.abs(np.hypot(arc_xy[:, 0], arc_xy[:, 1]) - radius)
+            cross = arc_xy[:-1, 0] * arc_xy[1:, 1] - arc_xy[:-1, 1] * arc_xy[1:, 0]
+
+            if np.max(deviation) > cls.ARC_TOLERANCE * radius or (
+                np.any(cross > 0) and np.any(cross < 0)
+            ):
+                return convert_points(pts[first + 1 : last + 1])
+
+            gcode = "G3" if cross.sum() > 0 else "G2"
+            ij = center - start
+
+            return [gcode + xy_format % (end[0], end[1]) + ij_format % (ij[0], ij[1])]
+
+        def convert_path_points(
+            pts: np.ndarray, arcs: List[Tuple[int, int, float, float]]
+        ) -> List[str]:
+            """
+            the cut lines of a path, from its first point: "G1" lines,
+            and "G2"/"G3" lines for its arcs
+            """
+            if not arcs:
+                return convert_points(pts[1:])
+
+            xy = machine_points(pts)
+            centers = machine_points(np.array([arc[2:] for arc in arcs]))
+
+            lines = []
+            current = 0
+            for (first, last, _, _), center in zip(arcs, centers):
+                if first < current or last >= len(pts):
+                    continue
+                lines += convert_points(pts[current + 1 : first + 1])
+                lines += convert_arc(pts, xy, first, last, center)
+                current = last
+
+            lines += convert_points(pts[current + 1 :])
+
+            return lines
+
+        def convert_points(pts: np.ndarray) -> List[str]:
+            """
+            the "G1" lines of all the points (2D or 3D) of a path: the offsets
+            and the flip are applied on the whole array and the lines are
+            formatted with a single format operation.
+            Same text as convert_point point by point.
+            """
+            if len(pts) == 0:
+                return []
+
+            x = pts[:, 0] + x_offset
+            y = -pts[:, 1] + y_offset
+
+            if flip_xy is False:
+                columns = [x, y]
+            else:
+                columns = [-y, x]
 
-            return result
+            if pts.shape[1] == 3:
+                columns.append(pts[:, 2])
+                line_format = "G1" + xyz_format
+            else:
+                line_format = "G1" + xy_format
+
+            values = np.column_stack(columns).ravel().tolist()
+
+            return ("\n".join([line_format] * len(pts)) % tuple(values)).split("\n")
 
         # special case
         if optype == "Helix":
@@ -795,27 +1037,23 @@ class cam:
                     pts.append((xx, yy, z))
 
                 # the gcode
-                gcode.append("; Rapid to op center position")
-                gcode.append("G1" + convert_point(center) + rapid_feed_gcode)
+                yield "; Rapid to op center position"
+                yield "G1" + convert_point(center) + rapid_feed_gcode
 
-                gcode.append("; Slow to op initial position")
+                yield "; Slow to op initial position"
                 pt0 = pts[0]
-                gcode.append("G1" + convert_point(pt0) + cut_feed_gcode)
+                yield "G1" + convert_point(pt0) + cut_feed_gcode
 
-                for k, pt in enumerate(pts):
-                    if k == 0:
-                        gcode.append(
-                            "G1" + convert_point_3D(pt) + f" F{helix_plunge_rate}"
-                        )
-                    else:
-                        gcode.append("G1" + convert_point_3D(pt))
+                helix_gcode = convert_points(np.array(pts))
+                helix_gcode[0] += f" F{helix_plunge_rate}"
+                yield from helix_gcode
 
-            gcode.extend(retract_gcode)
+            yield from retract_gcode
 
-            gcode.append("; Rapid to op center position")
-            gcode.append("G1" + convert_point(center) + rapid_feed_gcode)
+            yield "; Rapid to op center position"
+            yield "G1" + convert_point(center) + rapid_feed_gcode
 
-            return gcode
+            return
 
         # tabs are globals - but maybe this path does not hits any tabs
         crosses_tabs = False
@@ -833,8 +1071,11 @@ class cam:
             separated_paths = tab_separator.separated_paths
             crosses_tabs = tab_separator.crosses_tabs
 
-            gcode.append("")
-            gcode.append(f"; Path {path_index+1}")
+            # path id -> (points, cut lines) - the same for all the passes
+            cut_gcode_cache: Dict[int, Tuple[np.ndarray, List[str]]] = {}
+
+            yield ""
+            yield f"; Path {path_index+1}"
 
             currentZ = safeZ
             finishedZ = topZ
@@ -856,17 +1097,17 @@ class cam:
 
                 if currentZ <= tabZ and ((not path.safe_to_close) or crosses_tabs):
                     if optype == "Peck":
-                        gcode.extend(retract_for_peck)
+                        yield from retract_for_peck
                         currentZ = peckZ
                     else:
-                        gcode.extend(retract_gcode)
+                        yield from retract_gcode
                         currentZ = safeZ
                 elif currentZ < safeZ and (not path.safe_to_close):
                     if optype == "Peck":
-                        gcode.extend(retract_for_peck)
+                        yield from retract_for_peck
                         currentZ = peckZ
                     else:
-                        gcode.extend(retract_gcode)
+                        yield from retract_gcode
                         currentZ = safeZ
 
                 # check this - what does it mean ???
@@ -875,24 +1116,20 @@ class cam:
                 else:
                     currentZ = max(finishedZ, tabZ)
 
-                gcode.append("; Rapid to initial position")
-                gcode.append(
-                    "G1" + convert_point(list(orig_path.coords)[0]) + rapid_feed_gcode
-                )
+                yield "; Rapid to initial position"
+                yield "G1" + convert_point(orig_path.coords[0]) + rapid_feed_gcode
 
                 in_tabs_height = False
 
                 if not crosses_tabs:
                     in_tabs_height = False
                     selected_paths = [orig_path]
-                    gcode.append("G1 Z" + ValWithUnit(currentZ, "-").to_fixed(decimal))
+                    yield "G1 Z" + to_fixed(currentZ)
                 else:
                     if nextZ >= tabZ:
                         in_tabs_height = False
                         selected_paths = [orig_path]
-                        gcode.append(
-                            "G1 Z" + ValWithUnit(currentZ, "-").to_fixed(decimal)
-                        )
+                        yield "G1 Z" + to_fixed(currentZ)
                     else:
                         in_tabs_height = True
                         selected_paths = separated_paths
@@ -901,48 +1138,52 @@ class cam:
                     if selected_path.is_empty:
                         continue
 
+                    if id(selected_path) not in cut_gcode_cache:
+                        selected_pts = shapely.get_coordinates(selected_path)
+                        # the separated paths (tabs) do not have the arcs indices
+                        arcs = path.arcs if selected_path is orig_path else []
+                        cut_gcode_cache[id(selected_path)] = (
+                            selected_pts,
+                            convert_path_points(selected_pts, arcs),
+                        )
+
+                    selected_pts, cut_gcode = cut_gcode_cache[id(selected_path)]
+
                     executed_ramp = False
                     min_plunge_time = (currentZ - nextZ) / plunge_feed
                     if ramp and min_plunge_time > 0:
                         min_plunge_time = (currentZ - nextZ) / plunge_feed
                         ideal_dist = cut_feed * min_plunge_time
                         total_dist = 0.0
-                        for end in range(1, len(list(selected_path.coords))):
+                        coords = selected_pts.tolist()
+                        for end in range(1, len(coords)):
                             if total_dist > ideal_dist:
                                 break
 
-                            pt1 = list(selected_path.coords)[end - 1]
-                            pt2 = list(selected_path.coords)[end]
+                            pt1 = coords[end - 1]
+                            pt2 = coords[end]
                             total_dist += 2 * cam.dist(
                                 get_x(pt1), get_y(pt1), get_x(pt2), get_y(pt2)
                             )
 
                         if total_dist > 0:
-                            ramp_path_forw = [
-                                list(selected_path.coords)[k] for k in range(0, end)
-                            ]
+                            ramp_path_forw = coords[0:end]
 
-                            ramp_path_backw = [
-                                list(selected_path.coords)[k] for k in range(0, end - 1)
-                            ]
+                            ramp_path_backw = coords[0 : end - 1]
                             ramp_path_backw.reverse()
 
                             ramp_path = ramp_path_forw + ramp_path_backw
 
                             if in_tabs_height:
                                 # move to initial point of partial path
-                                gcode.append(
+                                yield (
                                     "; Tab: move to first point of partial path at safe height"
                                 )
-                                gcode.append("G1" + convert_point(ramp_path[1]))
-                                gcode.append("; plunge")
-                                gcode.append(
-                                    "G1 Z"
-                                    + ValWithUnit(nextZ, "-").to_fixed(decimal)
-                                    + plunge_feed_gcode
-                                )
+                                yield "G1" + convert_point(ramp_path[1])
+                                yield "; plunge"
+                                yield "G1 Z" + to_fixed(nextZ) + plunge_feed_gcode
 
-                            gcode.append("; ramp")
+                            yield "; ramp"
                             executed_ramp = True
 
                             dist_travelled = 0.0
@@ -960,130 +1201,145 @@ class cam:
                                     "G1"
                                     + convert_point(ramp_path[i])
                                     + " Z"
-                                    + ValWithUnit(newZ, "-").to_fixed(decimal)
+                                    + to_fixed(newZ)
                                 )
                                 if i == 1:
-                                    gcode.append(
+                                    yield (
                                         gcode_line_start
                                         + " F"
-                                        + ValWithUnit(
+                                        + to_fixed(
                                             math.floor(
                                                 min(
                                                     total_dist / min_plunge_time,
                                                     cut_feed,
                                                 )
-                                            ),
-                                            "-",
-                                        ).to_fixed(decimal)
+                                            )
+                                        )
                                     )
                                 else:
-                                    gcode.append(gcode_line_start)
+                                    yield gcode_line_start
 
                     if not in_tabs_height:
                         if not executed_ramp:
-                            gcode.append("; plunge")
-                            gcode.append(
-                                "G1 Z"
-                                + ValWithUnit(nextZ, "-").to_fixed(decimal)
-                                + plunge_feed_gcode
-                            )
+                            yield "; plunge"
+                            yield "G1 Z" + to_fixed(nextZ) + plunge_feed_gcode
 
                     if in_tabs_height:
                         # move to initial point of partial path
-                        gcode.append(
+                        yield (
                             "; Tab: move to first point of partial path at safe height"
                         )
-                        gcode.append(
-                            "G1" + convert_point(list(selected_path.coords)[0])
-                        )
-                        gcode.append("; plunge")
-                        gcode.append(
-                            "G1 Z"
-                            + ValWithUnit(nextZ, "-").to_fixed(decimal)
-                            + plunge_feed_gcode
-                        )
+                        yield "G1" + convert_point(selected_pts[0])
+                        yield "; plunge"
+                        yield "G1 Z" + to_fixed(nextZ) + plunge_feed_gcode
 
                     currentZ = nextZ
 
-                    gcode.append("; cut")
+                    yield "; cut"
 
                     # on a given height, generate series of G1
-                    for i, pt in enumerate(selected_path.coords):
-                        if i == 0:
-                            continue
-
-                        gcode_line_start = "G1" + convert_point(pt)
-                        if i == 1:
-                            gcode.append(gcode_line_start + " " + cut_feed_gcode)
-                        else:
-                            gcode.append(gcode_line_start)
+                    if cut_gcode:
+                        yield cut_gcode[0] + " " + cut_feed_gcode
+                        yield from cut_gcode[1:]
 
                     if in_tabs_height:
                         # retract to safeZ before processing next separated_paths item
-                        gcode.extend(retract_gcode)
+                        yield from retract_gcode
 
                 finishedZ = nextZ
 
-            gcode.extend(retract_gcode)
+            yield from retract_gcode
 
-        return gcode
 
 
-class TabsSeparator:
-    """ """
+class TabsIndex:
+    """
+    the tabs of a job, built once for all the paths of a gcode generation:
+    - their union, prepared, to split the paths
+    - a STRtree of their discs, for the point queries
+    """
 
     def __init__(self, tabs: List[Dict[str, Any]]):
         self.tabs = tabs
 
-        self.separated_paths: List[shapely.geometry.LineString] = []
-        self.crosses_tabs = False  # init
+        self.centers = np.array(
+            [tab["center"] for tab in tabs], dtype=float
+        ).reshape(-1, 2)
+        self.radius = np.array([tab["radius"] for tab in tabs], dtype=float)
 
-    def separate(self, path: shapely.geometry.LineString):
+        # 1. from the tabs, build shapely tab polygons
+        shapely_tabs_: List[shapely.geometry.Polygon] = []
+        for tab in tabs:
+            svg_path = SvgPath.from_circle_def(tab["center"], tab["radius"])
+            shapely_tabs_ += svg_path.import_as_polygons_list()
+
+        # hey, multipolygons are good...
+        shapely_tabs_union = shapely.ops.unary_union(shapely_tabs_)
+        if shapely_tabs_union.geom_type == "MultiPolygon":
+            self.union = shapely_tabs_union
+        elif shapely_tabs_union.geom_type == "Polygon":
+            self.union = shapely.geometry.MultiPolygon([shapely_tabs_union])
+        else:
+            self.union = shapely.geometry.MultiPolygon(
+                [geom for geom in shapely_tabs_union.geoms if geom.geom_type == "Polygon"]
+            )
+
+        shapely.prepare(self.union)
+
+        self.tree = shapely.STRtree(
+            shapely.box(
+                self.centers[:, 0] - self.radius,
+                self.centers[:, 1] - self.radius,
+                self.centers[:, 0] + self.radius,
+                self.centers[:, 1] + self.radius,
+            )
+        )
+
+    def has_tabs(self) -> bool:
+        return len(self.tabs) > 0
+
+    def intersects(self, path: shapely.geometry.LineString) -> bool:
+        return self.has_tabs() and self.union.intersects(path)
+
+    def pos_in_tab(self, x: float, y: float) -> bool:
         """
-        from a "normal" tool path, split this path into a list of "partial" paths
-        avoiding the tabs areas
+        is the point (x,y) in the disc of a tab
         """
-        from gcode_generator import Tab
+        candidates = self.tree.query(shapely.Point(x, y))
+        if len(candidates) == 0:
+            return False
 
-        if len(self.tabs) == 0:
-            self.separated_paths = [path]
-            return
+        dx = self.centers[candidates, 0] - x
+        dy = self.centers[candidates, 1] - y
+        radius = self.radius[candidates]
 
-        pts = list(path.coords)
+        return bool(np.any(dx * dx + dy * dy <= radius * radius))
 
-        shapely_openpath = shapely.geometry.LineString(pts)
 
-        shapely_tabs_: List[shapely.geometry.Polygon] = []
-        # 1. from the tabs, build shapely tab polygons
-        for tab_def in self.tabs:
-            tab = Tab(tab_def)
-            shapely_tabs = tab.svg_path.import_as_polygons_list()
-            shapely_tabs_ += shapely_tabs
+class TabsSeparator:
+    """ """
 
-        # hey, multipolygons are good...
-        shapely_tabs_union = shapely.ops.unary_union(shapely_tabs_)
-        if shapely_tabs_union.geom_type == "MultiPolygon":
-            shapely_tabs = shapely_tabs_union
-        elif shapely_tabs_union.geom_type == "Polygon":
-            shapely_tabs = shapely.geometry.MultiPolygon([shapely_tabs_union])
-        elif shapely_tabs_union.geom_type == "GeometryCollection":
-            for geom in shapely_tabs_union.geoms:
-                if geom.geom_type == "MultiPolygon":
-                    shapely_tabs = geom
-                if geom.geom_type == "Polygon":
-                    shapely_tabs = geom
-
-        if not shapely_openpath.intersects(shapely_tabs):
+    def __init__(self, tabs_index: TabsIndex):
+        self.tabs_index = tabs_index
+
+        self.separated_paths: List[shapely.geometry.LineString] = []
+        self.crosses_tabs = False  # init
+
+    def separate(self, path: shapely.geometry.LineString):
+        """
+        from a "normal" tool path, split this path into a list of "partial" paths
+        avoiding the tabs areas
+        """
+        if not self.tabs_index.intersects(path):
             self.separated_paths = [path]
             return
 
         self.crosses_tabs = True
 
-        # 2. then "diff" the origin path with the tabs paths
-        shapely_splitted_paths = shapely_openpath.difference(shapely_tabs)
-
-        # 3. that's it
-        # print("splitted_paths", shapely_splitted_paths)
+        # "diff" the origin path with the tabs paths
+        shapely_splitted_paths = shapely.geometry.LineString(path.coords).difference(
+            self.tabs_index.union
+        )
 
         if shapely_splitted_paths.geom_type == "LineString":
             shapely_splitted_paths = shapely.geometry.MultiLineString(
@@ -1185,6 +1441,9 @@ class TabsSeparator:
 class PocketCalculator:
     """ """
 
+    # relative margin of the rings buffer over the cutter discs
+    REACH_SLACK = 0.01
+
     def __init__(
         self,
         multipoly: shapely.geometry.MultiPolygon,
@@ -1267,16 +1526,8 @@ class PocketCalculator:
             self.collect_paths(exteriors)
 
             # -------------------------------------------- break ?
-            if True:
-                cuts = []
-                for poly in current.geoms:
-                    cuts += [
-                        shapely.geometry.Point(xi, yi).buffer(self.cutter_dia / 2.0)
-                        for (xi, yi) in poly.exterior.coords
-                    ]
-                material_cut = shapely.ops.unary_union(cuts)
-                if current.covered_by(material_cut):
-                    break
+            if self.material_fully_cut(current):
+                break
             # ------------------------------------------- break ?
 
             current = self.offset_multipolygon(
@@ -1319,6 +1570,35 @@ class PocketCalculator:
 
         self.merge_paths(bounds, self.all_paths)
 
+    def material_fully_cut(self, current: shapely.geometry.MultiPolygon) -> bool:
+        """
+        the break condition: the polygons are covered by the cutter
+        discs centered on their exterior vertices.
+
+        These discs are inside the buffer of the exterior rings: as long as
+        this single buffer (a bit larger, for the discretisation of its round
+        parts) does not cover the polygons, no need to union all the discs.
+        """
+        radius = self.cutter_dia / 2.0
+
+        exteriors = shapely.get_exterior_ring(list(current.geoms))
+
+        reach = shapely.buffer(
+            shapely.multilinestrings(exteriors),
+            radius * (1 + self.REACH_SLACK),
+            quad_segs=16,
+        )
+        if not current.covered_by(reach):
+            return False
+
+        # same discs as Point(xi, yi).buffer(radius)
+        cuts = shapely.buffer(
+            shapely.points(shapely.get_coordinates(exteriors)), radius, quad_segs=16
+        )
+        material_cut = shapely.union_all(cuts)
+
+        return current.covered_by(material_cut)
+
     def offset_multipolygon(
         self,
         multipoly: shapely.geometry.MultiPolygon,
@@ -1377,92 +1657,9 @@ class PocketCalculator:
         """
         Try to merge paths. A merged path doesn't cross outside of bounds AND the interior polygons
         """
-        # cnt = MatplotLibUtils.display("mergePath", shapely.geometry.MultiLineString(paths), force=True)
-
-        if _bounds and len(_bounds.geoms) > 0:
-            bounds = _bounds
-        else:
-            bounds = shapely.geometry.MultiPolygon()
-
-        ext_lines = ShapelyUtils.multipoly_exteriors_to_multiline(bounds)
-        int_polys = []
-        for poly in bounds.geoms:
-            if poly.interiors:
-                for interior in poly.interiors:
-                    int_poly = shapely.geometry.Polygon(interior)
-                    int_polys.append(int_poly)
-        if int_polys:
-            int_multipoly = shapely.geometry.MultiPolygon(int_polys)
-        else:
-            int_multipoly = None
-
-        # std list
-        thepaths = [list(path.coords) for path in paths]
-        paths = thepaths
+        self.cam_paths = cam.merge_paths(_bounds, paths)
 
-        current_path = paths[0]
-
-        path_end_point = current_path[-1]
-        path_start_point = current_path[0]
-
-        # close if start/end point not equal - why ? I could have simple lines!
-        if (
-            path_end_point[0] != path_start_point[0]
-            or path_end_point[1] != path_start_point[1]
-        ):
-            current_path = current_path + [path_start_point]
-
-        current_point = current_path[-1]
-        paths[0] = []  # empty
-
-        merged_paths: List[shapely.geometry.LineString] = []
-        num_left = len(paths) - 1
-
-        while num_left > 0:
-            closest_path_index = -1
-            closest_point_index = -1
-            closest_point_dist = float(sys.maxsize)
-            for path_index, path in enumerate(paths):
-                for point_index, point in enumerate(path):
-                    dist = cam.distP(current_point, point)
-                    if dist < closest_point_dist:
-                        closest_path_index = path_index
-                        closest_point_index = point_index
-                        closest_point_dist = dist
-
-            path = paths[closest_path_index]
-            paths[closest_path_index] = []  # empty
-            num_left -= 1
-            need_new = ShapelyUtils.crosses(
-                ext_lines, current_point, path[closest_point_index]
-            )
-            if (not need_new) and int_multipoly:
-                need_new = ShapelyUtils.crosses(
-                    int_multipoly, current_point, path[closest_point_index]
-                )
-
-            # JSCUT path = path.slice(closest_point_index, len(path)).concat(path.slice(0, closest_point_index))
-            path = path[closest_point_index:] + path[:closest_point_index]
-            path.append(path[0])
-
-            if need_new:
-                merged_paths.append(current_path)
-                current_path = path
-                current_point = current_path[-1]
-            else:
-                current_path = current_path + path
-                current_point = current_path[-1]
-
-        merged_paths.append(current_path)
-
-        cam_paths: List[CamPath] = []
-        for path in merged_paths:
-            safe_to_close = not ShapelyUtils.crosses(bounds, path[0], path[-1])
-            cam_paths.append(CamPath(shapely.geometry.LineString(path), safe_to_close))
-
-        self.cam_paths = cam_paths
-
-        return cam_paths
+        return self.cam_paths
 
 
 class SpiralePocketCalculator:
@@ -1916,6 +2113,7 @@ class NibblePocketCalculator:
         cutter_dia: float,
         overlap: float,
         climb: bool,
+        nb_workers: int = 1,
     ):
         """
         cutter_dia is in user units.
@@ -1927,6 +2125,9 @@ class NibblePocketCalculator:
         self.overlap = overlap
         self.climb = climb
 
+        # the polygons pocketed in worker processes if > 1
+        self.nb_workers = nb_workers
+
         self.resolution = 16
         self.join_style = 1
         self.mitre_limit = 5.0
@@ -1953,35 +2154,82 @@ class NibblePocketCalculator:
 
         print("step_size = ", step_size)
 
-        winding_dir = geometry.ArcDir.CW if self.climb == True else geometry.ArcDir.CCW
+        if self.nb_workers > 1 and len(current.geoms) > 1:
+            self.pocket_polygons_in_workers(list(current.geoms))
+            return
 
         for poly in current.geoms:
-            toolpath = geometry.Pocket(
-                poly,
-                step_size,
-                winding_dir,
-                generate=True,
-                starting_point=poly.centroid,
-                # starting_radius=2.5,
-                debug=True,
-            )
+            self.pocket_polygon(poly)
+
+    def pocket_polygon(self, poly: shapely.geometry.Polygon):
+        """
+        the cam paths of one polygon of the (offseted) multipolygon
+        """
+        step_size = (1.0 - self.overlap) * self.cutter_dia
+
+        winding_dir = geometry.ArcDir.CW if self.climb == True else geometry.ArcDir.CCW
+
+        toolpath = geometry.Pocket(
+            poly,
+            step_size,
+            winding_dir,
+            generate=True,
+            starting_point=poly.centroid,
+            # starting_radius=2.5,
+            debug=True,
+        )
 
-            # this is neccessary!
-            timeslice = 1000  # ms
-            for index, progress in enumerate(toolpath.get_arcs(timeslice)):
-                print(index, round(progress * 1000) / 1000)
-            # toolpath.path contains the currently generated path data at this point.
+        # this is neccessary!
+        timeslice = 1000  # ms
+        for index, progress in enumerate(toolpath.get_arcs(timeslice)):
+            print(index, round(progress * 1000) / 1000)
+        # toolpath.path contains the currently generated path data at this point.
 
-            self.toolpath_to_campaths(toolpath)
+        nb_cam_paths = len(self.cam_paths)
 
-            # last : the coutour itself - for a clean contour
-            campath = CamPath(poly.exterior, True)
-            self.cam_paths.append(campath)
+        self.toolpath_to_campaths(toolpath)
+
+        self.check_safe_to_close(poly, self.cam_paths[nb_cam_paths:])
+
+        # last : the coutour itself - for a clean contour
+        campath = CamPath(poly.exterior, True)
+        self.cam_paths.append(campath)
+
+    def pocket_polygons_in_workers(self, polys: List[shapely.geometry.Polygon]):
+        """
+        each polygon has its own voronoi diagram and toolpath: they are
+        calculated in worker processes ("spawn": safe with Qt), and their
+        cam paths appended in the polygons order
+        """
+        context = multiprocessing.get_context("spawn")
+
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.nb_workers, mp_context=context
+        ) as executor:
+            futures = [
+                executor.submit(
+                    nibble_polygon_in_worker,
+                    {
+                        "polygon": shapely.to_wkb(poly),
+                        "cutter_dia": float(self.cutter_dia),
+                        "overlap": float(self.overlap),
+                        "climb": self.climb,
+                    },
+                )
+                for poly in polys
+            ]
+
+            for future in futures:
+                for path, safe_to_close, arcs in future.result():
+                    self.cam_paths.append(
+                        CamPath(shapely.from_wkb(path), safe_to_close, arcs)
+                    )
 
     def toolpath_to_campaths(self, toolpath: geometry.Pocket):
         """ """
         xx = []
         yy = []
+        arcs = []
 
         for k, element in enumerate(toolpath.path):
 
@@ -1990,6 +2238,11 @@ class NibblePocketCalculator:
 
                 x, y = element.path.xy
 
+                # the arc indices in the cam path
+                arcs.append(
+                    (len(xx), len(xx) + len(x) - 1, element.origin.x, element.origin.y)
+                )
+
                 xx.extend(x)
                 yy.extend(y)
 
@@ -2007,10 +2260,11 @@ class NibblePocketCalculator:
                 elif element.move_style == geometry.MoveStyle.RAPID_OUTSIDE:
                     # plt.plot(x, y, c=rapid_outside_colour, linewidth=1)
 
-                    self.add_campath(xx, yy, True)
+                    self.add_campath(xx, yy, True, arcs)
 
                     xx = []
                     yy = []
+                    arcs = []
 
                 else:
                     assert element.move_style == geometry.MoveStyle.CUT
@@ -2025,13 +2279,34 @@ class NibblePocketCalculator:
                     # plt.plot(x, y, linestyle="--", c=cut_colour, linewidth=1)
 
         if len(xx) > 0:
-            self.add_campath(xx, yy, True)
+            self.add_campath(xx, yy, True, arcs)
+
+    def check_safe_to_close(
+        self, poly: shapely.geometry.Polygon, cam_paths: List[CamPath]
+    ):
+        """
+        a path is safe to close if the line from its end to its start stays
+        inside of the pocket: touching its boundary is fine
+        """
+        if len(cam_paths) == 0:
+            return
 
-    def add_campath(self, xx, yy, safe_to_close):
+        links = shapely.linestrings(
+            [
+                [cam_path.path.coords[-1], cam_path.path.coords[0]]
+                for cam_path in cam_paths
+            ]
+        )
+        outside = shapely.length(shapely.difference(links, poly)) > 1e-6
+
+        for cam_path, is_outside in zip(cam_paths, outside):
+            cam_path.safe_to_close = not is_outside
+
+    def add_campath(self, xx, yy, safe_to_close, arcs=None):
         coords = [(x, y) for x, y in zip(xx, yy)]
         linestring = shapely.geometry.LineString(coords)
 
-        campath = CamPath(linestring, safe_to_close)
+        campath = CamPath(linestring, safe_to_close, arcs)
         self.cam_paths.append(campath)
 
     def offset_multipolygon(
@@ -2053,3 +2328,27 @@ class NibblePocketCalculator:
             self.join_style,
             self.mitre_limit,
         )
+
+
+def nibble_polygon_in_worker(
+    worker_data: Dict[str, Any]
+) -> List[Tuple[bytes, bool, List[Tuple[int, int, float, float]]]]:
+    """
+    runs in a worker process: the cam paths of one polygon (WKB) of a
+    NibblePocketCalculator, given back as WKB paths with their
+    "safe_to_close" flag and arcs
+    """
+    poly = shapely.from_wkb(worker_data["polygon"])
+
+    pc = NibblePocketCalculator(
+        shapely.geometry.MultiPolygon([poly]),
+        worker_data["cutter_dia"],
+        worker_data["overlap"],
+        worker_data["climb"],
+    )
+    pc.pocket_polygon(poly)
+
+    return [
+        (shapely.to_wkb(cam_path.path), cam_path.safe_to_close, cam_path.arcs)
+        for cam_path in pc.cam_paths
+    ]
@@ -3,6 +3,9 @@ import math
 from typing import List
 from typing import Tuple
 
+import numpy as np
+
+import shapely
 import shapely.geometry
 import shapely.ops
 from shapely.validation import make_valid
@@ -56,20 +59,21 @@ class ShapelyUtils:
 
         p1_p2 = shapely.geometry.LineString([p1, p2])
 
-        if bounds.geom_type == "MultiPolygon":
-            compound = shapely.geometry.GeometryCollection([bounds, p1_p2])
-            MatplotLibUtils.display(
-                "mergePath bounds check crosses (multipoly) : %d" % cls.cnt,
-                compound,
-                force=False,
-            )
-        if bounds.geom_type == "MultiLineString":
-            compound = shapely.geometry.GeometryCollection([bounds, p1_p2])
-            MatplotLibUtils.display(
-                "mergePath bounds check crosses (multilines) : %d" % cls.cnt,
-                compound,
-                force=False,
-            )
+        if MatplotLibUtils.MAPLOTLIB_DEBUG:
+            if bounds.geom_type == "MultiPolygon":
+                compound = shapely.geometry.GeometryCollection([bounds, p1_p2])
+                MatplotLibUtils.display(
+                    "mergePath bounds check crosses (multipoly) : %d" % cls.cnt,
+                    compound,
+                    force=False,
+                )
+            if bounds.geom_type == "MultiLineString":
+                compound = shapely.geometry.GeometryCollection([bounds, p1_p2])
+                MatplotLibUtils.display(
+                    "mergePath bounds check crosses (multilines) : %d" % cls.cnt,
+                    compound,
+                    force=False,
+                )
 
         result = p1_p2.intersection(bounds)
 
@@ -597,3 +601,62 @@ class ShapelyUtils:
         dx = p2[0] - p1[0]
         dy = p2[1] - p1[1]
         return dx * dx + dy * dy
+
+
+class ShapelyLinkChecker:
+    """
+    ShapelyUtils.crosses for many links at once: do the lines from p1 to p2
+    cross outside of bounds?
+
+    The bounds are prepared once, the links are given as arrays of points
+    and checked with the vectorized shapely functions - same answers as
+    ShapelyUtils.crosses link by link.
+    """
+
+    def __init__(
+        self,
+        bounds: shapely.geometry.MultiPolygon | shapely.geometry.MultiLineString | None,
+    ):
+        self.bounds = bounds
+
+        if bounds is not None:
+            shapely.prepare(bounds)
+
+    def crosses(self, p1: np.ndarray, p2: np.ndarray) -> np.ndarray:
+        """
+        p1, p2: arrays (N,2) of the links ends - returns an array (N) of bool
+        """
+        p1 = np.asarray(p1, dtype=float).reshape(-1, 2)
+        p2 = np.asarray(p2, dtype=float).reshape(-1, 2)
+
+        if self.bounds is None:
+            return np.ones(len(p1), dtype=bool)
+
+        result = np.zeros(len(p1), dtype=bool)
+
+        # as ShapelyUtils.crosses: same x -> does not cross
+        todo = np.flatnonzero(p1[:, 0] != p2[:, 0])
+        if len(todo) == 0:
+            return result
+
+        lines = shapely.linestrings(np.stack([p1[todo], p2[todo]], axis=1))
+
+        # no intersection at all -> does not cross
+        hits = shapely.intersects(self.bounds, lines)
+        todo = todo[hits]
+        if len(todo) == 0:
+            return result
+
+        intersections = shapely.intersection(lines[hits], self.bounds)
+
+        # only touching one of the ends -> does not cross
+        is_point = shapely.get_type_id(intersections) == 0
+        x = np.where(is_point, shapely.get_x(intersections), np.nan)
+        y = np.where(is_point, shapely.get_y(intersections), np.nan)
+
+        at_p1 = (x == p1[todo, 0]) & (y == p1[todo, 1])
+        at_p2 = (x == p2[todo, 0]) & (y == p2[todo, 1])
+
+        result[todo] = ~(shapely.is_empty(intersections) | at_p1 | at_p2)
+
+        return result
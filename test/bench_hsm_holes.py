@@ -0,0 +1,102 @@
+"""
+Benchmark of the HSM nibbler on pockets with holes: time, path elements
+and area left uncut, with the estimate of the next arc position versus the
+previous first guess (one step further along the voronoi edge).
+
+Holes make the voronoi branches bend back towards the cut area: a slow or
+incomplete pocket shows up here first.
+
+    > python test/bench_hsm_holes.py
+    > python test/bench_hsm_holes.py --scale 3 --step 1.8
+"""
+
+import os
+import sys
+import io
+import time
+import contextlib
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import shapely.affinity
+import shapely.geometry
+
+from hsm_nibble import geometry
+
+
+class StepGuessPocket(geometry.Pocket):
+    """
+    the previous first guess of the next arc position
+    """
+
+    def _guess_distance(self, voronoi_edge, start_distance, desired_step):
+        return start_distance + desired_step
+
+
+def pockets_with_holes(scale: float):
+    """ """
+    round_and_slot = (
+        shapely.geometry.box(0, 0, 80, 50)
+        .difference(shapely.geometry.Point(20, 20).buffer(6))
+        .difference(shapely.geometry.box(50, 10, 60, 40))
+    )
+
+    holes = shapely.geometry.box(0, 0, 100, 60)
+    for k in range(4):
+        holes = holes.difference(shapely.geometry.Point(15 + k * 23, 30).buffer(5))
+
+    return {
+        "round and slot x%g" % scale: shapely.affinity.scale(
+            round_and_slot, scale, scale, origin=(0, 0)
+        ),
+        "4 holes x%g" % scale: shapely.affinity.scale(
+            holes, scale, scale, origin=(0, 0)
+        ),
+    }
+
+
+def run_pocket(pocket_class, poly, step: float):
+    """ """
+    t0 = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        pocket = pocket_class(
+            poly, step, geometry.ArcDir.CCW, starting_point=poly.centroid
+        )
+        for _ in pocket.get_arcs(1000):
+            pass
+    dt = time.time() - t0
+
+    uncut = poly.difference(pocket.calculated_area_total.total()).area
+    return dt, len(pocket.path), uncut
+
+
+def main():
+    warnings.filterwarnings("ignore")
+
+    args = sys.argv[1:]
+
+    scale = 1.0
+    step = 1.8
+
+    while args:
+        if args[0] == "--scale":
+            scale = float(args[1])
+        elif args[0] == "--step":
+            step = float(args[1])
+        args = args[2:]
+
+    for name, poly in pockets_with_holes(scale).items():
+        for label, pocket_class in (
+            ("step guess", StepGuessPocket),
+            ("analytic", geometry.Pocket),
+        ):
+            dt, nb_elements, uncut = run_pocket(pocket_class, poly, step)
+            print(
+                "%-24s %-12s %7.2f s %6d elements %8.1f / %.1f mm2 uncut"
+                % (name, label, dt, nb_elements, uncut, poly.area)
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark of the HSM nibbler on large pockets: arcs per second and
+iterations per arc, with the analytic estimate of the next arc position
+versus the previous first guess (one step further along the voronoi edge).
+
+    > python test/bench_hsm_nibble.py
+    > python test/bench_hsm_nibble.py --length 3000 --cutter 3
+"""
+
+import os
+import sys
+import io
+import time
+import contextlib
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import shapely.geometry
+
+from hsm_nibble import geometry
+
+
+class StepGuessPocket(geometry.Pocket):
+    """
+    the previous first guess of the next arc position
+    """
+
+    def _guess_distance(self, voronoi_edge, start_distance, desired_step):
+        return start_distance + desired_step
+
+
+def large_pockets(length: float):
+    """ """
+    # serpentine corridor, 16 wide
+    coords = []
+    for k in range(max(1, int(length / 200))):
+        y = k * 30
+        coords += [(0, y), (200, y)] if k % 2 == 0 else [(200, y), (0, y)]
+    corridor = shapely.geometry.LineString(coords).buffer(8, cap_style=2, join_style=2)
+
+    side = length / 8
+    rect = shapely.geometry.box(0, 0, side, side * 0.6)
+    hole = shapely.geometry.Point(side * 0.3, side * 0.3).buffer(side * 0.1)
+
+    return {
+        "corridor %g" % length: corridor,
+        "rectangle with hole %g" % side: rect.difference(hole),
+    }
+
+
+def run_pocket(pocket_class, poly, cutter_dia: float):
+    """ """
+    t0 = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        pocket = pocket_class(
+            poly,
+            cutter_dia * 0.6,
+            geometry.ArcDir.CW,
+            starting_point=poly.representative_point(),
+        )
+    dt = time.time() - t0
+    nb_arcs = len([item for item in pocket.path if isinstance(item, geometry.ArcData)])
+    return dt, nb_arcs, pocket.loop_count
+
+
+def main():
+    warnings.filterwarnings("ignore")
+
+    args = sys.argv[1:]
+
+    length = 1000.0
+    cutter_dia = 3.0
+
+    while args:
+        if args[0] == "--length":
+            length = float(args[1])
+        elif args[0] == "--cutter":
+            cutter_dia = float(args[1])
+        args = args[2:]
+
+    for name, poly in large_pockets(length).items():
+        for label, pocket_class in (
+            ("step guess", StepGuessPocket),
+            ("analytic", geometry.Pocket),
+        ):
+            dt, nb_arcs, loop_count = run_pocket(pocket_class, poly, cutter_dia)
+            print(
+                "%-28s %-12s %6d arcs %7.2f s %8.1f arcs/s %6.2f iterations/arc"
+                % (name, label, nb_arcs, dt, nb_arcs / dt, loop_count / max(1, nb_arcs))
+            )
+
+
+if __name__ == "__main__":
+    main()
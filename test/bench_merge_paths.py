@@ -0,0 +1,154 @@
+"""
+Benchmark of the merge of the toolpaths (pocket, outline) on the projects samples:
+the closest path search with the STRtree of NearestPointFinder, versus the scan of
+all the points of all the remaining paths.
+
+    > python test/bench_merge_paths.py projects/cnc_all_letters.json projects/holes.json
+    > python test/bench_merge_paths.py --circles 400
+
+("--circles N": engrave of N small circles, a merge of N paths)
+
+The merged paths must be the same.
+"""
+
+import os
+import sys
+import time
+
+from typing import List
+from typing import Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import shapely_cam
+from shapely_cam import cam
+
+import shapely.geometry
+
+import pycut_batch
+
+
+class ScanNearestPointFinder:
+    """
+    the previous search: scan all the points of all the remaining paths
+    """
+
+    def __init__(self, paths: List[List[Tuple[float, float]]]):
+        self.paths = paths
+        self.alive = [True] * len(paths)
+
+    def remove_path(self, path_index: int):
+        self.alive[path_index] = False
+
+    def closest(self, current_point: Tuple[float, float]) -> Tuple[int, int]:
+        closest_path_index = -1
+        closest_point_index = -1
+        closest_point_dist = float(sys.maxsize)
+        for path_index, path in enumerate(self.paths):
+            if not self.alive[path_index]:
+                continue
+            for point_index, point in enumerate(path):
+                dist = cam.distP(current_point, point)
+                if dist < closest_point_dist:
+                    closest_path_index = path_index
+                    closest_point_index = point_index
+                    closest_point_dist = dist
+
+        return closest_path_index, closest_point_index
+
+
+def record_merge_paths_calls(projfilename: str):
+    """
+    the arguments of all the merge_paths calls of the toolpaths calculation
+    """
+    calls = []
+
+    cam_merge_paths = cam.merge_paths.__func__
+
+    def cam_merge_paths_recorder(cls, bounds, paths, closed_path=True):
+        calls.append((bounds, list(paths), closed_path))
+        return cam_merge_paths(cls, bounds, paths, closed_path)
+
+    cam.merge_paths = classmethod(cam_merge_paths_recorder)
+    try:
+        pycut_batch.BatchProject(projfilename).make_jobmodel()
+    finally:
+        cam.merge_paths = classmethod(cam_merge_paths)
+
+    return calls
+
+
+def circles_merge_paths_calls(nb_circles: int):
+    """
+    the merge of the engrave of many small circles
+    """
+    nb_x = int(nb_circles**0.5)
+
+    polys = [
+        shapely.geometry.Point(10.0 * (k % nb_x), 10.0 * (k // nb_x)).buffer(3.0)
+        for k in range(nb_circles)
+    ]
+    paths = [poly.exterior for poly in polys]
+
+    return [(shapely.geometry.MultiPolygon(polys), paths, True)]
+
+
+def merge_all(calls, finder_class) -> Tuple[float, List]:
+    """ """
+    shapely_cam.NearestPointFinder, finder = finder_class, shapely_cam.NearestPointFinder
+
+    results = []
+    t0 = time.time()
+    try:
+        for bounds, paths, closed_path in calls:
+            results.append(cam.merge_paths(bounds, paths, closed_path))
+    finally:
+        shapely_cam.NearestPointFinder = finder
+
+    return time.time() - t0, results
+
+
+def main():
+    args = sys.argv[1:]
+
+    while args:
+        if args[0] == "--circles":
+            name = "%s circles" % args[1]
+            calls = circles_merge_paths_calls(int(args[1]))
+            args = args[2:]
+        else:
+            name = os.path.basename(args[0])
+            calls = record_merge_paths_calls(args[0])
+            args = args[1:]
+
+        nb_paths = sum(len(paths) for _, paths, _ in calls)
+        nb_points = sum(len(path.coords) for _, paths, _ in calls for path in paths)
+
+        t_scan, scan_results = merge_all(calls, ScanNearestPointFinder)
+        t_tree, tree_results = merge_all(calls, shapely_cam.NearestPointFinder)
+
+        same = all(
+            len(r1) == len(r2)
+            and all(
+                p1.path.equals_exact(p2.path, 0) and p1.safe_to_close == p2.safe_to_close
+                for p1, p2 in zip(r1, r2)
+            )
+            for r1, r2 in zip(scan_results, tree_results)
+        )
+
+        print(
+            "%-40s %4d merges %6d paths %8d pts   scan %7.2f s   tree %7.2f s   same: %s"
+            % (
+                name,
+                len(calls),
+                nb_paths,
+                nb_points,
+                t_scan,
+                t_tree,
+                same,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
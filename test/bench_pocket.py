@@ -0,0 +1,92 @@
+"""
+Benchmark of the pocket toolpaths calculation on large pockets: the break
+condition of PocketCalculator, versus the union of all the cutter discs
+on the vertices of each ring.
+
+    > python test/bench_pocket.py
+    > python test/bench_pocket.py --size 400 --cutter 3
+
+The toolpaths must be the same.
+"""
+
+import os
+import sys
+import io
+import time
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import shapely.geometry
+
+from shapely_cam import PocketCalculator
+
+from test_pocket import DiscsPocketCalculator
+
+
+def large_pockets(size: float):
+    """ """
+    rect = shapely.geometry.box(0, 0, size, size * 0.75)
+    disc = shapely.geometry.Point(size / 2, size / 2).buffer(size / 2)
+
+    holes = [
+        shapely.geometry.Point(size * x, size * y).buffer(size / 20)
+        for x, y in ((0.25, 0.25), (0.75, 0.25), (0.5, 0.5))
+    ]
+    with_holes = rect.difference(shapely.geometry.MultiPolygon(holes))
+
+    return {
+        "rectangle %g" % size: rect,
+        "disc %g" % size: disc,
+        "rectangle with holes %g" % size: with_holes,
+    }
+
+
+def run_pocket(calculator_class, poly, cutter_dia: float):
+    """ """
+    calculator = calculator_class(
+        shapely.geometry.MultiPolygon([poly]), cutter_dia, 0.4, False
+    )
+    t0 = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        calculator.pocket()
+    return time.time() - t0, calculator.cam_paths
+
+
+def main():
+    args = sys.argv[1:]
+
+    size = 200.0
+    cutter_dia = 3.0
+
+    while args:
+        if args[0] == "--size":
+            size = float(args[1])
+        elif args[0] == "--cutter":
+            cutter_dia = float(args[1])
+        args = args[2:]
+
+    for name, poly in large_pockets(size).items():
+        t_discs, discs_paths = run_pocket(DiscsPocketCalculator, poly, cutter_dia)
+        t_pocket, paths = run_pocket(PocketCalculator, poly, cutter_dia)
+
+        same = len(paths) == len(discs_paths) and all(
+            p1.path.equals_exact(p2.path, 0) and p1.safe_to_close == p2.safe_to_close
+            for p1, p2 in zip(paths, discs_paths)
+        )
+
+        print(
+            "%-30s %5d paths %8d pts   discs %7.2f s   pocket %7.2f s   same: %s"
+            % (
+                name,
+                len(paths),
+                sum(len(p.path.coords) for p in paths),
+                t_discs,
+                t_pocket,
+                same,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import os
+
+import numpy as np
+
+import unittest
+import xmlrunner
+
+from gcodeviewer.parser.gcodeloader import GcodeLoader
+from gcodeviewer.parser.gcodeviewparse import GcodeViewParse
+from gcodeviewer.drawers.gcodedrawer import GcodeDrawer
+from gcodeviewer.drawers.linespyramid import LinesPyramid
+from gcodeviewer.drawers.shaderdrawable import ShaderDrawable
+from gcodeviewer.util.util import Util
+
+GCODE = """G21 G90
+G0 Z5
+G0 X0 Y0
+G1 Z-1 F60
+G1 X10 F600
+G1 Y10
+G1 X0
+G1 Y0
+G0 Z5
+"""
+
+
+class GcodeDrawerTests(unittest.TestCase):
+    """ """
+
+    def test_vertex_ranges(self):
+        """ """
+        begins, ends = ShaderDrawable.vertexRanges(np.array([0, 1, 2, 3, 8, 9]), 2)
+        self.assertEqual(list(zip(begins, ends)), [(0, 4), (8, 10)])
+
+        begins, ends = ShaderDrawable.vertexRanges(np.array([0, 1, 4, 5, 8, 9]), 2)
+        self.assertEqual(list(zip(begins, ends)), [(0, 10)])
+
+        begins, ends = ShaderDrawable.vertexRanges(np.array([], dtype=int))
+        self.assertEqual(len(begins), 0)
+
+    def test_update_vectors(self):
+        """
+        only the colors of the updated segments change, the vertex buffer
+        (not filled yet here) has to be filled again
+        """
+        loader = GcodeLoader(GCODE, 100)
+        loader.run()
+
+        viewParser = GcodeViewParse()
+        viewParser.reset()
+        viewParser.getLinesFromParser(loader.parser(), 0.0, True)
+
+        drawer = GcodeDrawer()
+        drawer.setViewParser(viewParser)
+        drawer.prepareVectors()
+        lines = drawer.m_lines.copy()
+
+        segments = viewParser.getLineSegments()
+        segments.highlights()[3:5] = True
+        drawer.update_indexes(np.arange(3, 5))
+        drawer.update_indexes(np.arange(4, 6))
+
+        self.assertTrue(drawer.updateVectors())
+        self.assertEqual(drawer.m_indexes, [])
+
+        highlight = Util.colorToVector(drawer.colorHighlight()).toTuple()
+        vertexIndexes = drawer.m_vertexIndexes[3:5]
+        changed = np.concatenate([vertexIndexes, vertexIndexes + 1])
+        self.assertTrue(np.allclose(drawer.m_lines[changed, 3:6], highlight))
+
+        unchanged = np.ones(len(lines), dtype=bool)
+        unchanged[changed] = False
+        self.assertTrue(
+            np.array_equal(drawer.m_lines[unchanged], lines[unchanged], equal_nan=True)
+        )
+
+
+class LinesPyramidTests(unittest.TestCase):
+    """ """
+
+    def test_levels(self):
+        """
+        a circle of 10000 lines then a fast move: each level is coarser,
+        its lines start and end on the vertices of the lines and all the
+        points are within its tolerance
+        """
+        angles = np.linspace(0, 2 * np.pi, 10001)
+        points = np.stack([np.cos(angles), np.sin(angles), np.zeros(10001)], axis=1)
+        points = np.concatenate([points * 50, [[100, 0, 10]]])
+        starts, ends = points[:-1], points[1:]
+        types = np.zeros(10001, dtype=int)
+        types[-1] = 1
+
+        levels = LinesPyramid(starts, ends, types).levels()
+        self.assertTrue(len(levels) >= 3)
+
+        vertexes = np.stack([starts, ends], axis=1).reshape(-1, 3)
+        nbLines = [len(indexes) // 2 for _, indexes in levels]
+        self.assertEqual(nbLines, sorted(nbLines, reverse=True))
+
+        for tolerance, indexes in levels:
+            firsts, lasts = indexes[0::2] // 2, indexes[1::2] // 2
+            # the lines are covered in order, the fast move stays
+            self.assertEqual(firsts[0], 0)
+            self.assertEqual(lasts[-1], 10000)
+            self.assertEqual(firsts[-1], 10000)
+            self.assertTrue(np.array_equal(firsts[1:], lasts[:-1] + 1))
+
+            lines = np.repeat(np.arange(len(firsts)), lasts - firsts + 1)
+            distances = np.sqrt(
+                LinesPyramid.pointSegmentDistances2(
+                    ends, vertexes[indexes[0::2]], vertexes[indexes[1::2]], lines
+                )
+            )
+            self.assertTrue(distances.max() <= tolerance)
+
+
+if __name__ == "__main__":
+    if os.environ.get("PYCUT_XMLRUNNER_UNITTESTS", None) == "YES":
+        unittest.main(
+            testRunner=xmlrunner.XMLTestRunner(path="RESULTS", indic="test_gcodedrawer")
+        )
+    else:
+        unittest.main()
@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+
+import unittest
+import xmlrunner
+
+from gcodeviewer.parser.gcodeloader import GcodeLoader
+from gcodeviewer.parser.gcodeviewparse import GcodeViewParse
+
+GCODE = """(generated by pycut)
+G21 G90
+G0 Z5
+G0 X0 Y0
+G1 Z-1 F60
+
+G1 X10 F600 ; a comment
+G4 P0.5
+G2 X20 Y10 R10
+G1 Y20
+G0 Z5
+"""
+
+
+class GcodeLoaderTests(unittest.TestCase):
+    """ """
+
+    def load(self, chunkLines: int, cancelAfter: int = None):
+        loader = GcodeLoader(GCODE, 100, chunkLines=chunkLines)
+        viewParser = GcodeViewParse()
+        viewParser.reset()
+        items = []
+        nbLinesDone = []
+
+        def onChunkLoaded(chunkItems, segments, nbDone):
+            items.extend(chunkItems)
+            viewParser.addPointSegments(segments, 0.0, True)
+            nbLinesDone.append(nbDone)
+            if len(nbLinesDone) == cancelAfter:
+                loader.cancel()
+
+        loader.chunkLoaded.connect(onChunkLoaded)
+        loader.run()
+
+        return loader, items, viewParser, nbLinesDone
+
+    def test_chunks(self):
+        """
+        the same as in one chunk, the dwell of the last point of a chunk
+        included
+        """
+        loader, items, viewParser, nbLinesDone = self.load(100)
+        self.assertEqual(nbLinesDone, [12, 12])
+        self.assertEqual(len(items), 10)
+        self.assertEqual(items[5].command, "G1 X10 F600 ; a comment")
+        self.assertEqual(items[5].args, ["G1", "X10", "F600"])
+
+        expected = GcodeViewParse()
+        expected.reset()
+        segments = expected.getLinesFromParser(loader.parser(), 0.0, True)
+        self.assertTrue(len(segments) > 6)
+        self.assertEqual(segments.dwells()[3], 0.5)
+        self.assertEqual(segments.lineRange(4, 5), (4, len(segments) - 2))
+        self.assertTrue(np.all(segments.isArc()[4:-2]))
+
+        for chunkLines in (1, 2, 5):
+            _, chunkItems, chunkViewParser, nbLinesDone = self.load(chunkLines)
+            self.assertEqual(nbLinesDone[-1], 12)
+
+            self.assertEqual(
+                [(item.command, item.line, item.args) for item in chunkItems],
+                [(item.command, item.line, item.args) for item in items],
+            )
+
+            chunkSegments = chunkViewParser.getLineSegments()
+            for column in (
+                "starts",
+                "ends",
+                "speeds",
+                "dwells",
+                "lineNumbers",
+                "flags",
+            ):
+                self.assertTrue(
+                    np.array_equal(
+                        getattr(chunkSegments, column)(), getattr(segments, column)()
+                    )
+                )
+            self.assertEqual(
+                chunkViewParser.getMaximumExtremes(), expected.getMaximumExtremes()
+            )
+            self.assertEqual(chunkViewParser.getMinLength(), expected.getMinLength())
+
+    def test_cancel(self):
+        """ """
+        loader, items, viewParser, nbLinesDone = self.load(2, cancelAfter=2)
+
+        self.assertTrue(loader.isCanceled())
+        self.assertEqual(nbLinesDone, [2, 4, 4])
+        self.assertEqual(
+            [item.command for item in items],
+            ["(generated by pycut)", "G21 G90", "G0 Z5", "G0 X0 Y0"],
+        )
+        self.assertEqual(len(viewParser.getLineSegments()), 2)
+
+
+if __name__ == "__main__":
+    if os.environ.get("PYCUT_XMLRUNNER_UNITTESTS", None) == "YES":
+        unittest.main(
+            testRunner=xmlrunner.XMLTestRunner(path="RESULTS", indic="test_gcodeloader")
+        )
+    else:
+        unittest.main()
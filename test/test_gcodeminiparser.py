@@ -0,0 +1,164 @@
+import os
+import math
+
+import numpy as np
+
+import unittest
+import xmlrunner
+
+from gcodesimulator_python.gcodeminiparser import GcodeMiniParser
+from gcodesimulator_webgl.gcodeminiparser import (
+    GcodeMiniParser as WebGLGcodeMiniParser,
+)
+
+GCODE = """(generated by pycut)
+G21 G90
+G0 Z5
+G0 X0 Y0
+M3 S1000
+G1 Z-1 F60
+G1 X10 F600 X20
+G2 X20 Y10 I0 J5
+g1 y 20
+G1 X-
+"""
+
+
+class GcodeMiniParserTests(unittest.TestCase):
+    """ """
+
+    def test_moves(self):
+        """
+        modal x, y, z, f - their first value applies to the points before it -
+        the last word of a letter in a line wins, arcs as segments
+        """
+        parser = GcodeMiniParser()
+        parser.parse_gcode(GCODE)
+
+        # 6 moves + 1 move without a valid number + the arc intermediate points
+        nb_arc_points = len(parser.xs) - 7
+        self.assertEqual(nb_arc_points, 35)
+
+        self.assertEqual(parser.xs[:3].tolist(), [0, 0, 0])
+        self.assertEqual(parser.ys[:3].tolist(), [0, 0, 0])
+        self.assertEqual(parser.zs[:3].tolist(), [5, 5, -1])
+        self.assertEqual(parser.fs[:4].tolist(), [60, 60, 60, 600])
+        self.assertEqual(parser.xs[3], 20)
+
+        # the clockwise half circle, center (20, 5)
+        arc = slice(4, 4 + nb_arc_points)
+        radii = np.hypot(parser.xs[arc] - 20, parser.ys[arc] - 5)
+        self.assertTrue(np.allclose(radii, 5))
+        self.assertTrue(np.all(parser.xs[arc] < 20))
+
+        self.assertEqual((parser.xs[-2], parser.ys[-2]), (20, 20))
+        self.assertEqual((parser.xs[-1], parser.ys[-1]), (20, 20))
+
+        self.assertEqual(parser.line_nos[:4].tolist(), [2, 3, 5, 6])
+        self.assertEqual(parser.line_nos[arc].tolist(), [7] * nb_arc_points)
+        self.assertEqual(parser.line_nos[-2:].tolist(), [8, 9])
+
+    def test_times(self):
+        """ """
+        parser = GcodeMiniParser()
+        parser.parse_gcode(GCODE)
+
+        self.assertEqual(parser.times[1], 0)
+        self.assertAlmostEqual(parser.times[2], 6.0)
+        self.assertAlmostEqual(parser.times[3], 8.0)
+        self.assertAlmostEqual(parser.line_no_time_map[6], 8.0)
+        self.assertEqual(parser.path_time, parser.times[-1])
+        self.assertEqual(parser.path[3].at_time, parser.times[3])
+
+        self.assertEqual(parser.get_mvt_index_for_time(0), 0)
+        self.assertEqual(parser.get_mvt_index_for_time(7.0), 3)
+
+        webgl_parser = WebGLGcodeMiniParser()
+        webgl_parser.parse_gcode(GCODE)
+
+        # the webgl parser times the first point too
+        self.assertTrue(np.allclose(webgl_parser.times, parser.times))
+        self.assertEqual(webgl_parser.line_no_time_map[2], 0)
+        self.assertEqual(
+            webgl_parser.line_no_time_map.keys() - {2}, parser.line_no_time_map.keys()
+        )
+        self.assertEqual(webgl_parser.get_path_idx_for_time(7.0), 3)
+
+    def test_acceleration(self):
+        """
+        trapezoidal speed profile: 600 mm/min = 10 mm/s, 100 mm/s²
+        """
+        gcode = "G1 X0 Y0 Z0 F600\nG1 X20\nG1 X20.5\nG1 X30\nG1 Y10\nG1 Y0\n"
+
+        parser = GcodeMiniParser(acceleration=100, junction_deviation=0.01)
+        parser.parse_gcode(gcode)
+
+        # from a stop: 0.05 s more than at 10 mm/s, then straight at 10 mm/s
+        self.assertAlmostEqual(parser.times[1], 2.05)
+        self.assertAlmostEqual(parser.times[2] - parser.times[1], 0.05)
+
+        # slowing down for the 90° corner
+        corner_speed = math.sqrt(100 * 0.01 * (1 + math.sqrt(2)))
+        self.assertAlmostEqual(
+            parser.times[3] - parser.times[2],
+            (10 - corner_speed) / 100 + (9.5 - (100 - corner_speed**2) / 200) / 10,
+        )
+
+        # the reversal stops: 10 mm from and to a stop
+        self.assertAlmostEqual(parser.times[5] - parser.times[4], 1.1)
+
+        webgl_parser = WebGLGcodeMiniParser(acceleration=100)
+        webgl_parser.parse_gcode(gcode)
+        self.assertTrue(np.allclose(webgl_parser.times, parser.times))
+
+    def test_line_no_time(self):
+        """ """
+        parser = GcodeMiniParser()
+        parser.parse_gcode(GCODE)
+
+        self.assertEqual(parser.get_line_no_time(1), (0, 0.0))
+        self.assertEqual(parser.get_line_no_time(5), (5, 6.0))
+        self.assertEqual(parser.get_line_no_time(6)[0], 6)
+        self.assertAlmostEqual(parser.get_line_no_time(6)[1], 8.0)
+        self.assertEqual(parser.get_line_no_time(100), (9, parser.path_time))
+
+    def test_chunks(self):
+        """
+        the gcode given by chunks of lines: same path and times as at once
+        """
+        parser = GcodeMiniParser()
+        parser.parse_gcode(GCODE)
+
+        lines = GCODE.split("\n")
+        for nb_lines in (1, 2, 3, 5, len(lines)):
+            chunks_parser = GcodeMiniParser()
+            for k in range(0, len(lines), nb_lines):
+                chunks_parser.parse_gcode_chunk(lines[k : k + nb_lines])
+            chunks_parser.end_gcode_chunks()
+
+            for column in ("xs", "ys", "zs", "fs", "line_nos", "times"):
+                self.assertTrue(
+                    np.array_equal(
+                        getattr(chunks_parser, column),
+                        getattr(parser, column),
+                        equal_nan=True,
+                    )
+                )
+            self.assertEqual(chunks_parser.path_time, parser.path_time)
+
+    def test_empty(self):
+        """ """
+        parser = GcodeMiniParser()
+        parser.parse_gcode("(nothing)\nM3\n")
+
+        self.assertEqual(len(parser.xs), 0)
+        self.assertEqual(parser.path_time, 0)
+
+
+if __name__ == "__main__":
+    if os.environ.get("PYCUT_XMLRUNNER_UNITTESTS", None) == "YES":
+        unittest.main(
+            testRunner=xmlrunner.XMLTestRunner(path="RESULTS", indic="test_gcodeminiparser")
+        )
+    else:
+        unittest.main()
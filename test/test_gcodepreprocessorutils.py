@@ -0,0 +1,94 @@
+import os
+import math
+
+import numpy as np
+
+import unittest
+import xmlrunner
+
+from PySide6.QtGui import QVector3D
+
+from gcodeviewer.parser.pointsegment import PointSegment
+from gcodeviewer.parser.gcodepreprocessorutils import GcodePreprocessorUtils
+
+# plane, start, end, center, clockwise, radius
+ARCS = [
+    (PointSegment.Plane.XY, (10, 0, 0), (0, 10, 0), (0, 0, 0), False, 10),
+    (PointSegment.Plane.XY, (10, 0, 0), (0, 10, -1), (0, 0, 0), True, 10),
+    (PointSegment.Plane.XY, (2, 1, 0), (2, 1, 0), (1, 1, 0), False, 1),
+    (PointSegment.Plane.ZX, (5, 0, 0), (0, 0, 5), (0, 0, 0), True, 5),
+    (PointSegment.Plane.YZ, (0, 5, 0), (0, 0, -5), (0, 0, 0), False, 5),
+]
+
+
+class GeneratePointsAlongArcsTests(unittest.TestCase):
+    """ """
+
+    def generate(self, arcs, arcPrecision: float, arcDegreeMode: bool):
+        planes, starts, ends, centers, clockwise, radii = zip(*arcs)
+        return GcodePreprocessorUtils.generatePointsAlongArcs(
+            [plane.value for plane in planes],
+            np.array(starts),
+            np.array(ends),
+            np.array(centers),
+            clockwise,
+            radii,
+            0.1,
+            arcPrecision,
+            arcDegreeMode,
+        )
+
+    def test_same_as_one_arc(self):
+        """
+        the points of each arc of the batch as generatePointsAlongArcBDring
+        """
+        for arcPrecision, arcDegreeMode in ((0.0, False), (0.5, False), (5, True)):
+            points, counts = self.generate(ARCS, arcPrecision, arcDegreeMode)
+            self.assertEqual(len(points), counts.sum())
+
+            offsets = np.cumsum(counts) - counts
+            for arc, offset, count in zip(ARCS, offsets, counts):
+                plane, start, end, center, clockwise, radius = arc
+                expected = GcodePreprocessorUtils.generatePointsAlongArcBDring(
+                    plane,
+                    QVector3D(*start),
+                    QVector3D(*end),
+                    QVector3D(*center),
+                    clockwise,
+                    radius,
+                    0.1,
+                    arcPrecision,
+                    arcDegreeMode,
+                )
+                expected = [point.toTuple() for point in expected]
+
+                self.assertEqual(count, len(expected))
+                self.assertTrue(
+                    np.allclose(points[offset : offset + count], expected, atol=1e-5)
+                )
+
+    def test_counts(self):
+        """
+        chord length or angle step, nothing without center
+        """
+        arcs = ARCS[:1] + [
+            (PointSegment.Plane.XY, (1, 0, 0), (0, 1, 0), (math.nan,) * 3, False, 1)
+        ]
+
+        _, counts = self.generate(arcs, 0.0, True)
+        # quarter of a circle of radius 10, segments of 0.1 at most, + end
+        self.assertEqual(counts.tolist(), [158 + 1, 0])
+
+        _, counts = self.generate(arcs, 10, True)
+        self.assertEqual(counts.tolist(), [9 + 1, 0])
+
+
+if __name__ == "__main__":
+    if os.environ.get("PYCUT_XMLRUNNER_UNITTESTS", None) == "YES":
+        unittest.main(
+            testRunner=xmlrunner.XMLTestRunner(
+                path="RESULTS", indic="test_gcodepreprocessorutils"
+            )
+        )
+    else:
+        unittest.main()
@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+
+import unittest
+import xmlrunner
+
+from gcodesimulator_python.heightmapsimulator import HeightMapSimulator
+
+# a 2 mm deep slot from (0, 0) to (20, 0), then back to the safe height
+GCODE = """G0 Z5
+G0 X0 Y0
+G1 Z-2 F60
+G1 X20 F600
+G0 Z5
+"""
+
+
+class HeightMapSimulatorTests(unittest.TestCase):
+    """ """
+
+    def height_at(self, simulator, heights, x, y):
+        col = int((x - simulator.min_x) / simulator.pixel_size)
+        row = int((y - simulator.min_y) / simulator.pixel_size)
+        return heights[row, col]
+
+    def test_flat_slot(self):
+        """ """
+        simulator = HeightMapSimulator.from_gcode(GCODE, 4.0, resolution=200)
+        heights = simulator.simulate()
+
+        self.assertEqual(heights.shape, (200, 200))
+        self.assertAlmostEqual(self.height_at(simulator, heights, 10, 0), -2)
+        self.assertAlmostEqual(self.height_at(simulator, heights, 10, 1.8), -2)
+        self.assertAlmostEqual(self.height_at(simulator, heights, 10, 2.2), 0)
+        self.assertAlmostEqual(self.height_at(simulator, heights, 22.2, 0), 0)
+        self.assertAlmostEqual(heights.min(), -2)
+
+    def test_vbit_slot(self):
+        """
+        90 degrees V-bit: the depth decreases as the distance to the path
+        """
+        simulator = HeightMapSimulator.from_gcode(GCODE, 4.0, 90, resolution=200)
+        heights = simulator.simulate()
+
+        for y in (0.5, 1.0, 1.5):
+            # within a pixel
+            self.assertAlmostEqual(
+                self.height_at(simulator, heights, 10, y),
+                -2 + y,
+                delta=simulator.pixel_size,
+            )
+        self.assertAlmostEqual(self.height_at(simulator, heights, 10, 2.5), 0)
+
+    def test_stop_at_time(self):
+        """
+        the slot takes 2 s: it is half cut 1 s after the plunge
+        """
+        simulator = HeightMapSimulator.from_gcode(GCODE, 4.0, resolution=200)
+        heights = simulator.simulate(simulator.total_time)
+        self.assertTrue(np.array_equal(heights, simulator.simulate()))
+
+        plunge_end_time = simulator.times[2]
+        heights = simulator.simulate(plunge_end_time + 1.0)
+
+        self.assertAlmostEqual(self.height_at(simulator, heights, 8, 0), -2)
+        self.assertAlmostEqual(self.height_at(simulator, heights, 14, 0), 0)
+
+
+if __name__ == "__main__":
+    if os.environ.get("PYCUT_XMLRUNNER_UNITTESTS", None) == "YES":
+        unittest.main(
+            testRunner=xmlrunner.XMLTestRunner(path="RESULTS", indic="test_heightmapsimulator")
+        )
+    else:
+        unittest.main()
@@ -0,0 +1,66 @@
+import os
+import math
+
+import shapely
+import shapely.geometry
+
+import unittest
+import xmlrunner
+
+from hsm_nibble.arc_queues import ArcQueueIndex
+
+
+class ArcQueueIndexTests(unittest.TestCase):
+    """ """
+
+    def queues(self):
+        """ short arcs along a few spirals, one queue per spiral """
+        queues = {}
+        for key in range(4):
+            queues[key] = []
+            for k in range(30):
+                angle = k * 0.4 + key
+                center = (k * 1.5 * math.cos(angle), k * 1.5 * math.sin(angle))
+                circle = shapely.geometry.Point(center).buffer(1 + key, quad_segs=4)
+                queues[key].append(shapely.geometry.LineString(circle.exterior.coords[:5]))
+        return queues
+
+    def test_candidates(self):
+        """
+        the queries find all the arcs within the distance, as a brute force
+        search does
+        """
+        index = ArcQueueIndex(4.0)
+        queues = self.queues()
+        for k in range(30):
+            for key, paths in queues.items():
+                index.append(key, paths[k])
+        index.remove(2)
+        del queues[2]
+
+        for x in range(-40, 40, 7):
+            for y in range(-40, 40, 7):
+                point = shapely.geometry.Point(x, y)
+                dilated = point.buffer(3)
+
+                near_tails = index.near_tails(point, 3)
+                near_arcs = index.near_arcs(dilated)
+
+                for key, paths in queues.items():
+                    if paths[-1].distance(point) <= 3:
+                        self.assertIn(key, near_tails)
+                    for path in paths:
+                        if path.intersects(dilated):
+                            self.assertIn((key, path), near_arcs)
+
+                self.assertNotIn(2, near_tails)
+                self.assertNotIn(2, [key for key, _ in near_arcs])
+
+
+if __name__ == "__main__":
+    if os.environ.get("PYCUT_XMLRUNNER_UNITTESTS", None) == "YES":
+        unittest.main(
+            testRunner=xmlrunner.XMLTestRunner(path="RESULTS", indic="test_hsm_arc_queues")
+        )
+    else:
+        unittest.main()
@@ -0,0 +1,59 @@
+import os
+import math
+
+import shapely
+import shapely.geometry
+
+import unittest
+import xmlrunner
+
+from hsm_nibble.cut_area import CutArea
+
+
+class CutAreaTests(unittest.TestCase):
+    """ """
+
+    def test_around_same_as_total(self):
+        """
+        circles along a spiral: the differences with the area around them
+        are the same as with the whole area
+        """
+        cut_area = CutArea(5.0, shapely.geometry.box(-2, -2, 2, 2))
+        total = shapely.geometry.box(-2, -2, 2, 2)
+
+        for k in range(60):
+            angle = k * 0.3
+            center = shapely.geometry.Point(k * math.cos(angle), k * math.sin(angle))
+            circle = center.buffer(3 + (k % 7))
+
+            arc = circle.exterior
+            self.assertTrue(
+                arc.difference(cut_area.around(arc)).equals(arc.difference(total))
+            )
+            self.assertEqual(
+                arc.covered_by(cut_area.around(arc)), arc.covered_by(total)
+            )
+
+            cut_area.add(circle)
+            total = total.union(circle)
+
+        self.assertAlmostEqual(cut_area.total().area, total.area)
+
+    def test_empty(self):
+        """ """
+        cut_area = CutArea(5.0)
+        self.assertTrue(cut_area.is_empty())
+        self.assertTrue(cut_area.around(shapely.geometry.Point(0, 0).buffer(1)).is_empty)
+
+        cut_area.add(shapely.geometry.Point(100, 100).buffer(1))
+        self.assertFalse(cut_area.is_empty())
+        self.assertTrue(cut_area.around(shapely.geometry.Point(0, 0).buffer(1)).is_empty)
+
+
+if __name__ == "__main__":
+    if os.environ.get("PYCUT_XMLRUNNER_UNITTESTS", None) == "YES":
+        unittest.main(
+            testRunner=xmlrunner.XMLTestRunner(path="RESULTS", indic="test_hsm_cut_area")
+        )
+    else:
+        unittest.main()
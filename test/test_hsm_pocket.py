@@ -0,0 +1,63 @@
+import os
+import io
+import contextlib
+import warnings
+
+import shapely.geometry
+
+import unittest
+import xmlrunner
+
+from hsm_nibble import geometry
+
+
+class StepGuessPocket(geometry.Pocket):
+    """
+    the previous first guess of the next arc position
+    """
+
+    def _guess_distance(self, voronoi_edge, start_distance, desired_step):
+        return start_distance + desired_step
+
+
+def uncut_area(pocket_class, poly, step: float) -> float:
+    """the area of poly never cut by the arcs of the pocket"""
+    with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+        warnings.simplefilter("ignore")
+        pocket = pocket_class(
+            poly, step, geometry.ArcDir.CCW, starting_point=poly.centroid
+        )
+        for _ in pocket.get_arcs(1000):
+            pass
+
+    return poly.difference(pocket.calculated_area_total.total()).area
+
+
+class PocketTests(unittest.TestCase):
+    """ """
+
+    def test_coverage_with_holes(self):
+        """
+        with the estimate of the next arc position, the pocket is cut as with
+        the fixed step: only its corners are left
+        """
+        poly = (
+            shapely.geometry.box(0, 0, 80, 50)
+            .difference(shapely.geometry.Point(20, 20).buffer(6))
+            .difference(shapely.geometry.box(50, 10, 60, 40))
+        )
+
+        uncut = uncut_area(geometry.Pocket, poly, 1.8)
+        step_guess_uncut = uncut_area(StepGuessPocket, poly, 1.8)
+
+        self.assertLess(uncut, poly.area * 0.01)
+        self.assertLess(uncut, step_guess_uncut * 1.1)
+
+
+if __name__ == "__main__":
+    if os.environ.get("PYCUT_XMLRUNNER_UNITTESTS", None) == "YES":
+        unittest.main(
+            testRunner=xmlrunner.XMLTestRunner(path="RESULTS", indic="test_hsm_pocket")
+        )
+    else:
+        unittest.main()
@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+
+import shapely
+import shapely.geometry
+
+import unittest
+import xmlrunner
+
+from hsm_nibble.voronoi_centers import EPS
+from hsm_nibble.voronoi_centers import VoronoiCenters
+
+
+def make_polygon():
+    """an L shape with a hole and a disc: straight and curved edges"""
+    polygon = shapely.geometry.Polygon(
+        [(0, 0), (60, 0), (60, 30), (50, 30), (50, 12), (0, 12)],
+        [[(5, 3), (15, 3), (15, 9), (5, 9)]],
+    )
+    return polygon.union(shapely.geometry.Point(70, 35).buffer(10))
+
+
+class RecordingVoronoiCenters(VoronoiCenters):
+    """
+    the vertices checked by _vertices_inside, and the edges stored with their
+    end vertices
+    """
+
+    def _vertices_inside(self, vertices_xy):
+        self.vertices_xy = vertices_xy
+        self.inside = super()._vertices_inside(vertices_xy)
+        return self.inside
+
+    def _store_edge(self, edge, replace_index=None, vertices=None):
+        if vertices is not None:
+            self.straight_edges = getattr(self, "straight_edges", [])
+            self.straight_edges.append((list(edge.coords), vertices))
+        return super()._store_edge(edge, replace_index, vertices)
+
+
+class PerVertexVoronoiCenters(VoronoiCenters):
+    """
+    the previous rule: each vertex within EPS of the polygon
+    """
+
+    def _vertices_inside(self, vertices_xy):
+        return np.array(
+            [
+                shapely.geometry.Point(xy).distance(self.polygon) <= EPS
+                for xy in vertices_xy
+            ],
+            dtype=bool,
+        )
+
+
+class VoronoiCentersTests(unittest.TestCase):
+    """ """
+
+    def test_same_as_per_vertex(self):
+        """
+        the vertices kept at once and the straight edges built at once: same
+        as vertex by vertex and edge by edge
+        """
+        voronoi = RecordingVoronoiCenters(make_polygon(), preserve_widest=True)
+        per_vertex = PerVertexVoronoiCenters(make_polygon(), preserve_widest=True)
+
+        expected = [
+            shapely.geometry.Point(xy).distance(voronoi.polygon) <= EPS
+            for xy in voronoi.vertices_xy
+        ]
+        self.assertEqual(voronoi.inside.tolist(), expected)
+        self.assertTrue(any(expected))
+        self.assertFalse(all(expected))
+
+        # some of them on the boundary: kept by the distance filter
+        strictly_inside = shapely.contains_xy(
+            voronoi.polygon, voronoi.vertices_xy[:, 0], voronoi.vertices_xy[:, 1]
+        )
+        self.assertLess(strictly_inside.sum(), sum(expected))
+
+        self.assertGreater(len(voronoi.straight_edges), 0)
+        for coords, (start, end) in voronoi.straight_edges:
+            self.assertEqual(
+                coords, list(shapely.geometry.LineString((start, end)).coords)
+            )
+
+        self.assertEqual(voronoi.edges.keys(), per_vertex.edges.keys())
+        for edge_index, edge in voronoi.edges.items():
+            self.assertEqual(
+                list(edge.coords), list(per_vertex.edges[edge_index].coords)
+            )
+        self.assertEqual(voronoi.vertex_to_edges, per_vertex.vertex_to_edges)
+
+
+if __name__ == "__main__":
+    if os.environ.get("PYCUT_XMLRUNNER_UNITTESTS", None) == "YES":
+        unittest.main(
+            testRunner=xmlrunner.XMLTestRunner(
+                path="RESULTS", indic="test_hsm_voronoi_centers"
+            )
+        )
+    else:
+        unittest.main()
@@ -0,0 +1,197 @@
+import os
+import sys
+import io
+import contextlib
+
+import shapely.geometry
+import shapely.ops
+
+import unittest
+import xmlrunner
+
+from shapely_cam import cam
+from shapely_cam import CamPath
+from shapely_cam import PocketCalculator
+from shapely_cam import NibblePocketCalculator
+
+from val_with_unit import ValWithUnit
+
+
+def count_retracts(cam_path: CamPath) -> int:
+    """the retracts to safeZ in the gcode of a pocket path cut in 2 passes"""
+    gcode = cam.get_gcode(
+        {
+            "optype": "Pocket",
+            "paths": [cam_path],
+            "ramp": False,
+            "x_offset": ValWithUnit(0, "mm"),
+            "y_offset": ValWithUnit(0, "mm"),
+            "decimal": 3,
+            "topZ": ValWithUnit(0, "mm"),
+            "botZ": ValWithUnit(-2, "mm"),
+            "safeZ": ValWithUnit(2.5, "mm"),
+            "passdepth": ValWithUnit(1, "mm"),
+            "plunge_feed": 100,
+            "retract_feed": 500,
+            "cut_feed": 250,
+            "rapid_feed": 500,
+            "tabs": [],
+            "tabZ": ValWithUnit(-2, "mm"),
+            "peckZ": ValWithUnit(0.5, "mm"),
+            "flip_xy": False,
+        }
+    )
+    return list(gcode).count("; Retract")
+
+
+class DiscsPocketCalculator(PocketCalculator):
+    """
+    the previous break condition: union of all the cutter discs
+    """
+
+    def material_fully_cut(self, current: shapely.geometry.MultiPolygon) -> bool:
+        cuts = []
+        for poly in current.geoms:
+            cuts += [
+                shapely.geometry.Point(xi, yi).buffer(self.cutter_dia / 2.0)
+                for (xi, yi) in poly.exterior.coords
+            ]
+        material_cut = shapely.ops.unary_union(cuts)
+        return current.covered_by(material_cut)
+
+
+def pocket(calculator_class, poly: shapely.geometry.Polygon, cutter_dia: float):
+    """ """
+    calculator = calculator_class(
+        shapely.geometry.MultiPolygon([poly]), cutter_dia, 0.4, False
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        calculator.pocket()
+    return calculator.cam_paths
+
+
+class PocketTests(unittest.TestCase):
+    """ """
+
+    polys = {
+        "rectangle": shapely.geometry.box(0, 0, 40, 25),
+        "narrow rectangle": shapely.geometry.box(10, 3.3, 20, 6.7),
+        "small circle": shapely.geometry.Point(10, 10).buffer(1.75),
+        "circle with hole": shapely.geometry.Point(0, 0)
+        .buffer(20)
+        .difference(shapely.geometry.Point(5, 3).buffer(6)),
+        "L": shapely.geometry.Polygon(
+            [(0, 0), (40, 0), (40, 30), (30, 30), (30, 12), (0, 12)]
+        ),
+    }
+
+    def test_same_toolpaths(self):
+        """ """
+        for name, poly in self.polys.items():
+            with self.subTest(name):
+                cam_paths = pocket(PocketCalculator, poly, 3.0)
+                discs_cam_paths = pocket(DiscsPocketCalculator, poly, 3.0)
+
+                self.assertGreater(len(cam_paths), 0)
+                self.assertEqual(len(cam_paths), len(discs_cam_paths))
+                for cam_path, discs_cam_path in zip(cam_paths, discs_cam_paths):
+                    self.assertTrue(cam_path.path.equals_exact(discs_cam_path.path, 0))
+                    self.assertEqual(
+                        cam_path.safe_to_close, discs_cam_path.safe_to_close
+                    )
+
+
+class NibblePocketTests(unittest.TestCase):
+    """ """
+
+    def test_workers_same_toolpaths(self):
+        """
+        the polygons pocketed in worker processes: same toolpaths, same order
+        """
+        multipoly = shapely.geometry.MultiPolygon(
+            [
+                shapely.geometry.box(0, 0, 12, 8),
+                shapely.geometry.Polygon(
+                    [(20, 0), (60, 0), (60, 30), (50, 30), (50, 12), (20, 12)]
+                ),
+                shapely.geometry.Point(10, 35).buffer(6),
+            ]
+        )
+
+        all_cam_paths = []
+        for nb_workers in (1, 2):
+            calculator = NibblePocketCalculator(multipoly, 3.0, 0.4, False, nb_workers)
+            with contextlib.redirect_stdout(io.StringIO()):
+                calculator.pocket()
+            all_cam_paths.append(calculator.cam_paths)
+
+        cam_paths, workers_cam_paths = all_cam_paths
+
+        self.assertGreater(len(cam_paths), 3)
+        self.assertEqual(len(cam_paths), len(workers_cam_paths))
+        for cam_path, workers_cam_path in zip(cam_paths, workers_cam_paths):
+            # the contours are LinearRings, given back as LineStrings
+            self.assertEqual(
+                list(cam_path.path.coords), list(workers_cam_path.path.coords)
+            )
+            self.assertEqual(cam_path.safe_to_close, workers_cam_path.safe_to_close)
+            self.assertEqual(cam_path.arcs, workers_cam_path.arcs)
+
+    def test_safe_to_close(self):
+        """
+        the link from the end of a path to its start: safe inside of the
+        pocket or on its boundary, not outside of it
+        """
+        poly = shapely.geometry.Polygon(
+            [(0, 0), (20, 0), (20, 20), (10, 20), (10, 10), (0, 10)]
+        )
+        cam_paths = [
+            CamPath(shapely.geometry.LineString([(2, 2), (8, 2), (8, 8)])),
+            CamPath(shapely.geometry.LineString([(0, 0), (20, 0), (20, 20)])),
+            CamPath(shapely.geometry.LineString([(2, 8), (18, 2), (18, 18)])),
+        ]
+
+        calculator = NibblePocketCalculator(
+            shapely.geometry.MultiPolygon([poly]), 3.0, 0.4, False
+        )
+        calculator.check_safe_to_close(poly, cam_paths)
+
+        self.assertEqual(
+            [cam_path.safe_to_close for cam_path in cam_paths], [True, True, False]
+        )
+
+    def test_retract_between_passes(self):
+        """
+        the gcode of the nibbler paths: no retract between the depth passes
+        when the closing link stays in the pocket, a retract when it leaves it
+        """
+        poly = shapely.geometry.Polygon(
+            [(0, 0), (20, 0), (20, 20), (10, 20), (10, 10), (0, 10)]
+        )
+        inside = CamPath(shapely.geometry.LineString([(2, 2), (8, 2), (8, 8)]))
+        outside = CamPath(shapely.geometry.LineString([(2, 8), (18, 2), (18, 18)]))
+
+        calculator = NibblePocketCalculator(
+            shapely.geometry.MultiPolygon([poly]), 3.0, 0.4, False
+        )
+        calculator.check_safe_to_close(poly, [inside, outside])
+
+        # 2 passes, then the final retract
+        self.assertEqual(count_retracts(inside), 1)
+        self.assertEqual(count_retracts(outside), 2)
+
+        # the paths of a real pocket stay inside of it
+        with contextlib.redirect_stdout(io.StringIO()):
+            calculator.pocket()
+        self.assertTrue(
+            all(cam_path.safe_to_close for cam_path in calculator.cam_paths)
+        )
+
+
+if __name__ == "__main__":
+    if os.environ.get("PYCUT_XMLRUNNER_UNITTESTS", None) == "YES":
+        unittest.main(
+            testRunner=xmlrunner.XMLTestRunner(path="RESULTS", indic="test_pocket")
+        )
+    else:
+        unittest.main()
@@ -0,0 +1,278 @@
+import os
+import sys
+import io
+import json
+import tempfile
+
+import unittest
+import xmlrunner
+
+import pycut_batch
+
+from val_with_unit import ValWithUnit
+from gcode_generator import JobModel
+from gcode_generator import GcodeGenerator
+
+from gcodesimulator_python.gcodeminiparser import GcodeMiniParser
+
+from toolpaths_cache import ToolpathsCache
+
+
+svg_two_rects = """<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<svg version="1.1" id="test_two_rects" width="100mm" height="100mm" viewBox="0 0 100 100"
+   xmlns="http://www.w3.org/2000/svg" xmlns:svg="http://www.w3.org/2000/svg">
+  <g id="layer">
+     <rect id="r1" style="fill:#0000ff" width="30" height="20" x="10" y="10" />
+     <rect id="r2" style="fill:#0000ff" width="20" height="40" x="50" y="40" />
+  </g>
+</svg>"""
+
+
+def make_operation(name, optype, paths):
+    return {
+        "name": name,
+        "type": optype,
+        "cut_depth": 3.0,
+        "paths": paths,
+        "ramp_plunge": False,
+        "combinaison": "Union",
+        "direction": "Conventional",
+        "units": "mm",
+        "margin": 0.0,
+        "width": 0.0,
+    }
+
+
+project_two_rects = {
+    "svg_file": "two_rects.svg",
+    "operations": [
+        make_operation("pocket_r1", "Pocket", ["r1"]),
+        make_operation("outside_r2", "Outside", ["r2"]),
+    ],
+    "settings": {
+        "svg": {"px_per_inch": 96},
+        "Tabs": {"units": "mm", "height": 2.0, "tabs": []},
+        "Tool": {
+            "units": "mm",
+            "diameter": 3.0,
+            "angle": 180,
+            "passdepth": 1.0,
+            "overlap": 0.4,
+            "rapid": 500,
+            "plunge": 100,
+            "cut": 250,
+            "helix_pitch": 0.1,
+        },
+        "Material": {
+            "units": "mm",
+            "thickness": 10.0,
+            "z_origin": "Top",
+            "clearance": 2.5,
+        },
+        "CurveToLineConversion": {
+            "minimum_segments": 5,
+            "minimum_segments_length": 0.1,
+        },
+        "GCodeConversion": {
+            "units": "mm",
+            "flip_xy": False,
+            "use_offset": False,
+            "x_offset": 0.0,
+            "y_offset": 0.0,
+            "xy_reference": "ZERO_LOWER_LEFT_OF_MATERIAL",
+        },
+        "GCodeGeneration": {
+            "return_to_zero_at_end": True,
+            "spindle_control": True,
+            "spindle_speed": 1000,
+            "program_end": True,
+        },
+    },
+}
+
+
+class PyCutBatchTests(unittest.TestCase):
+    """ """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        with open(os.path.join(self.tmpdir.name, "two_rects.svg"), "w") as f:
+            f.write(svg_two_rects)
+
+        self.projfilename = os.path.join(self.tmpdir.name, "two_rects.json")
+        with open(self.projfilename, "w") as f:
+            json.dump(project_two_rects, f)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_generate_all_operations(self):
+        """ """
+        results = pycut_batch.run([self.projfilename])
+
+        self.assertEqual(len(results), 1)
+        self.assertIsNone(results[0]["error"])
+        self.assertEqual(
+            results[0]["nc_file"], os.path.join(self.tmpdir.name, "two_rects.nc")
+        )
+
+        with open(results[0]["nc_file"]) as f:
+            gcode = f.read()
+
+        self.assertTrue(gcode.startswith("G21"))
+        self.assertIn("; Name:         pocket_r1", gcode)
+        self.assertIn("; Name:         outside_r2", gcode)
+        self.assertTrue(gcode.endswith("M2"))
+
+    def test_generate_selected_operations(self):
+        """ """
+        gcode = pycut_batch.BatchProject(
+            self.projfilename, ["outside_r2"]
+        ).generate_gcode()
+
+        self.assertNotIn("pocket_r1", gcode)
+        self.assertIn("; Name:         outside_r2", gcode)
+
+    def test_reuse_toolpaths(self):
+        """ """
+        project = pycut_batch.BatchProject(self.projfilename)
+        job = project.make_jobmodel()
+
+        # only the gcode conversion changes -> same toolpaths objects
+        gcode_model = project.make_gcode_model()
+        gcode_model.flip_xy = True
+        same_job = JobModel(
+            job.svg_viewer,
+            project.make_cnc_ops(),
+            job.material_model,
+            job.svg_model,
+            job.tool_model,
+            job.tabs_model,
+            gcode_model,
+            previous_job=job,
+        )
+
+        for op, previous_op in zip(same_job.operations, job.operations):
+            self.assertIs(op.cam_paths, previous_op.cam_paths)
+
+        generator = GcodeGenerator(same_job)
+        generator.generate_gcode()
+        self.assertNotEqual(generator.gcode, project.generate_gcode())
+
+        # the tool changes -> recalculated
+        tool_model = project.make_tool_model()
+        tool_model.diameter = ValWithUnit(2.0, "mm")
+        other_job = JobModel(
+            job.svg_viewer,
+            project.make_cnc_ops(),
+            job.material_model,
+            job.svg_model,
+            tool_model,
+            job.tabs_model,
+            job.gcode_model,
+            previous_job=job,
+        )
+
+        for op, previous_op in zip(other_job.operations, job.operations):
+            self.assertIsNot(op.cam_paths, previous_op.cam_paths)
+
+    def test_operations_in_workers(self):
+        """ """
+        serial = pycut_batch.BatchProject(self.projfilename)
+        serial_job = serial.make_jobmodel()
+
+        project = pycut_batch.BatchProject(self.projfilename, nb_workers=2)
+        job = project.make_jobmodel()
+
+        for op, serial_op in zip(job.operations, serial_job.operations):
+            self.assertEqual(len(op.cam_paths), len(serial_op.cam_paths))
+            for cam_path, serial_cam_path in zip(op.cam_paths, serial_op.cam_paths):
+                self.assertTrue(cam_path.path.equals_exact(serial_cam_path.path, 0))
+                self.assertEqual(cam_path.safe_to_close, serial_cam_path.safe_to_close)
+            self.assertEqual(
+                len(op.cam_paths_svg_paths), len(serial_op.cam_paths_svg_paths)
+            )
+
+        self.assertEqual(project.generate_gcode(), serial.generate_gcode())
+
+    def test_stream_gcode(self):
+        """ """
+        gcode = pycut_batch.BatchProject(self.projfilename).generate_gcode()
+
+        job = pycut_batch.BatchProject(self.projfilename).make_jobmodel()
+        generator = GcodeGenerator(job)
+        generator.CHUNK_NB_LINES = 100
+
+        chunks = []
+        sink = io.StringIO()
+        generator.generate_gcode(sink, chunks.append)
+
+        self.assertEqual(sink.getvalue(), gcode)
+        self.assertEqual(generator.gcode, "")
+        self.assertEqual(generator.nb_lines, gcode.count("\n") + 1)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+        self.assertEqual(sum(len(chunk) for chunk in chunks), generator.nb_lines)
+
+        # without sink, the text is kept and the run time estimated by chunks
+        statistics = GcodeMiniParser()
+        generator = GcodeGenerator(job, statistics.parse_gcode_chunk)
+        generator.CHUNK_NB_LINES = 100
+        generator.generate_gcode()
+        statistics.end_gcode_chunks()
+
+        parser = GcodeMiniParser()
+        parser.parse_gcode(gcode)
+
+        self.assertEqual(generator.gcode, gcode)
+        self.assertGreater(statistics.path_time, 0)
+        self.assertEqual(statistics.path_time, parser.path_time)
+        self.assertEqual(statistics.line_nos.tolist(), parser.line_nos.tolist())
+
+    def test_toolpaths_cache(self):
+        """ """
+        gcode = pycut_batch.BatchProject(self.projfilename).generate_gcode()
+
+        project = pycut_batch.BatchProject(self.projfilename, cache_toolpaths=True)
+        self.assertEqual(project.generate_gcode(), gcode)
+        self.assertEqual(project.toolpaths_cache.nb_misses, 2)
+
+        # the next run: from the disk
+        project = pycut_batch.BatchProject(self.projfilename, cache_toolpaths=True)
+        self.assertEqual(project.generate_gcode(), gcode)
+        self.assertEqual(project.toolpaths_cache.nb_hits, 2)
+        self.assertEqual(project.toolpaths_cache.nb_misses, 0)
+
+        # only the changed operation is calculated again
+        project.project["operations"][1]["margin"] = 1.0
+        changed_gcode = project.generate_gcode()
+        self.assertNotEqual(changed_gcode, gcode)
+        self.assertEqual(project.toolpaths_cache.nb_hits, 3)
+        self.assertEqual(project.toolpaths_cache.nb_misses, 1)
+
+        cache_dir = os.path.join(self.tmpdir.name, ToolpathsCache.CACHE_DIRNAME)
+        self.assertEqual(len(os.listdir(cache_dir)), 3)
+
+    def test_worker_pool_same_result(self):
+        """ """
+        outdir = os.path.join(self.tmpdir.name, "out")
+
+        serial = pycut_batch.BatchProject(self.projfilename).generate_gcode()
+        results = pycut_batch.run(
+            [self.projfilename, self.projfilename], outdir, nb_workers=2
+        )
+
+        for result in results:
+            self.assertIsNone(result["error"])
+            with open(result["nc_file"]) as f:
+                self.assertEqual(f.read(), serial)
+
+
+if __name__ == "__main__":
+    if os.environ.get("PYCUT_XMLRUNNER_UNITTESTS", None) == "YES":
+        unittest.main(
+            testRunner=xmlrunner.XMLTestRunner(path="RESULTS", indic="test_pycut_batch")
+        )
+    else:
+        unittest.main()
@@ -0,0 +1,213 @@
+import os
+import sys
+import math
+
+import numpy as np
+
+import shapely.geometry
+
+import unittest
+import xmlrunner
+
+from shapely_cam import cam
+from shapely_cam import CamPath
+from shapely_cam import TabsIndex
+
+from gcode_generator import TabsModel
+
+from val_with_unit import ValWithUnit
+
+
+def make_args(flip_xy: bool, ramp: bool):
+    """a rectangle outline in 2 passes"""
+    rectangle = shapely.geometry.LineString(
+        [(10, 10), (30.25, 10), (30.25, 20.5), (10, 20.5), (10, 10)]
+    )
+
+    return {
+        "optype": "Outside",
+        "paths": [CamPath(rectangle)],
+        "ramp": ramp,
+        "x_offset": ValWithUnit(1.5, "mm"),
+        "y_offset": ValWithUnit(-2.25, "mm"),
+        "decimal": 3,
+        "topZ": ValWithUnit(0, "mm"),
+        "botZ": ValWithUnit(-2, "mm"),
+        "safeZ": ValWithUnit(2.5, "mm"),
+        "passdepth": ValWithUnit(1, "mm"),
+        "plunge_feed": 100,
+        "retract_feed": 500,
+        "cut_feed": 250,
+        "rapid_feed": 500,
+        "tabs": [],
+        "tabZ": ValWithUnit(-2, "mm"),
+        "peckZ": ValWithUnit(0.5, "mm"),
+        "flip_xy": flip_xy,
+    }
+
+
+class GcodeEmitterTests(unittest.TestCase):
+    """ """
+
+    def test_outline(self):
+        """ """
+        gcode = list(cam.get_gcode(make_args(False, False)))
+
+        self.assertEqual(
+            gcode[:12],
+            [
+                "",
+                "; Path 1",
+                "; Rapid to initial position",
+                "G1 X11.500 Y-12.250 F500",
+                "G1 Z0.000",
+                "; plunge",
+                "G1 Z-1.000 F100",
+                "; cut",
+                "G1 X31.750 Y-12.250  F250",
+                "G1 X31.750 Y-22.750",
+                "G1 X11.500 Y-22.750",
+                "G1 X11.500 Y-12.250",
+            ],
+        )
+        # second pass: same cut lines
+        self.assertEqual(gcode[14:16], ["G1 Z-1.000", "; plunge"])
+        self.assertEqual(gcode[16], "G1 Z-2.000 F100")
+        self.assertEqual(gcode[17:22], gcode[7:12])
+        self.assertEqual(gcode[22:], ["; Retract", "G1 Z2.500 F500"])
+
+    def test_outline_flip_xy_ramp(self):
+        """ """
+        gcode = list(cam.get_gcode(make_args(True, True)))
+
+        self.assertEqual(
+            gcode[:13],
+            [
+                "",
+                "; Path 1",
+                "; Rapid to initial position",
+                "G1 X12.250 Y11.500 F500",
+                "G1 Z0.000",
+                "; ramp",
+                "G1 X12.250 Y31.750 Z-0.500 F250.000",
+                "G1 X12.250 Y11.500 Z-1.000",
+                "; cut",
+                "G1 X12.250 Y31.750  F250",
+                "G1 X22.750 Y31.750",
+                "G1 X22.750 Y11.500",
+                "G1 X12.250 Y11.500",
+            ],
+        )
+        self.assertEqual(
+            gcode[17:19],
+            ["G1 X12.250 Y31.750 Z-1.500 F250.000", "G1 X12.250 Y11.500 Z-2.000"],
+        )
+
+    def test_arcs(self):
+        """ """
+        circle = shapely.geometry.Point(20, 15).buffer(5).exterior
+        nb_points = len(circle.coords)
+
+        args = make_args(False, False)
+        args["botZ"] = ValWithUnit(-1, "mm")
+        args["paths"] = [
+            CamPath(
+                shapely.geometry.LineString(circle.coords),
+                True,
+                [(0, nb_points - 1, 20, 15)],
+            )
+        ]
+        gcode = list(cam.get_gcode(args))
+
+        # a full circle: 2 half circles, clockwise in the svg -> G3
+        self.assertEqual(
+            gcode[7:10],
+            [
+                "; cut",
+                "G3 X16.500 Y-17.250 I-5.000 J0.000  F250",
+                "G3 X26.500 Y-17.250 I5.000 J0.000",
+            ],
+        )
+
+        # a short arc (45 degrees): a single G2/G3 line
+        arc = shapely.geometry.LineString(
+            [
+                (20 + 5 * math.cos(angle), 15 + 5 * math.sin(angle))
+                for angle in np.linspace(0, math.pi / 4, 9)
+            ]
+        )
+        args["paths"] = [CamPath(arc, False, [(0, 8, 20, 15)])]
+        gcode = list(cam.get_gcode(args))
+
+        self.assertEqual(
+            gcode[7:9],
+            ["; cut", "G2 X25.036 Y-20.786 I-5.000 J0.000  F250"],
+        )
+
+        # not an arc: G1 lines
+        args = make_args(False, False)
+        lines = list(cam.get_gcode(args))
+
+        args["paths"][0].arcs = [(0, 2, 20, 15)]
+        self.assertEqual(list(cam.get_gcode(args)), lines)
+
+
+class TabsIndexTests(unittest.TestCase):
+    """ """
+
+    tabs = [
+        {"center": [20, 10], "radius": 2.0, "enabled": True},
+        {"center": [30.25, 15], "radius": 1.0, "enabled": True},
+    ]
+
+    def test_pos_in_tab(self):
+        """ """
+        tabs_model = TabsModel(self.tabs)
+        tabs_model.set_height(2.0, "mm")
+
+        self.assertTrue(tabs_model.pos_in_tab(21, 11, -9, 10))
+        self.assertTrue(tabs_model.pos_in_tab(30.25, 16, -9, 10))
+        self.assertFalse(tabs_model.pos_in_tab(22, 12, -9, 10))
+        # above the tabs
+        self.assertFalse(tabs_model.pos_in_tab(21, 11, -5, 10))
+
+        # built once
+        self.assertIs(tabs_model.make_tabs_index(), tabs_model.make_tabs_index())
+
+    def test_outline_with_tabs(self):
+        """ """
+        args = make_args(False, False)
+        args["tabs"] = self.tabs
+        args["tabZ"] = ValWithUnit(-1.5, "mm")
+        gcode = list(cam.get_gcode(args))
+
+        args["tabs"] = TabsIndex(self.tabs)
+        self.assertEqual(list(cam.get_gcode(args)), gcode)
+
+        # the last pass, below the tabs, is split in 2 partial paths
+        tab_moves = [
+            gcode[k + 1]
+            for k, line in enumerate(gcode)
+            if line.startswith("; Tab: move to first point")
+        ]
+        self.assertEqual(tab_moves, ["G1 X23.500 Y-12.250", "G1 X31.750 Y-18.250"])
+        self.assertEqual(
+            gcode[-8:-4],
+            [
+                "G1 X31.750 Y-22.750  F250",
+                "G1 X11.500 Y-22.750",
+                "G1 X11.500 Y-12.250",
+                "G1 X19.500 Y-12.250",
+            ],
+        )
+
+
+if __name__ == "__main__":
+    if os.environ.get("PYCUT_XMLRUNNER_UNITTESTS", None) == "YES":
+        unittest.main(
+            testRunner=xmlrunner.XMLTestRunner(
+                path="RESULTS", indic="test_shapely_cam_gcode"
+            )
+        )
+    else:
+        unittest.main()
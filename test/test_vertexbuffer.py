@@ -0,0 +1,121 @@
+import os
+import tempfile
+
+import numpy as np
+
+import unittest
+import xmlrunner
+
+from gcodesimulator_python.gcodeminiparser import GcodeMiniParser
+from gcodesimulator_python.vertexbuffer import make_path_buffer
+from gcodesimulator_python.vertexbuffer import path_buffer_key
+from gcodesimulator_python.vertexbuffer import PathBufferCache
+
+# plunge, slot, retract
+GCODE = """G0 X0 Y0 Z5 F600
+G1 Z-2 F60
+G1 X20 F600
+G0 Z5
+"""
+
+
+def parse(gcode: str) -> GcodeMiniParser:
+    parser = GcodeMiniParser()
+    parser.parse_gcode(gcode)
+    return parser
+
+
+class PathBufferTests(unittest.TestCase):
+    """ """
+
+    def test_flat_cutter(self):
+        """ """
+        parser = parse(GCODE)
+        array, infos = make_path_buffer(parser.xs, parser.ys, parser.zs, parser.fs, 180)
+
+        self.assertEqual(infos["stride"], 9)
+        self.assertEqual(infos["vertexes_per_line"], 18)
+        self.assertEqual(infos["num_points"], 4)
+        self.assertAlmostEqual(infos["total_time"], 7 + 2 + 0.7)
+        self.assertEqual(infos["min_z"], -2)
+
+        vertexes = array.reshape(4, 18, 9)
+        # the slot: from (0, 0, -2) to (20, 0, -2), from 7 s to 9 s
+        self.assertEqual(vertexes[2, 0].tolist(), [0, 0, -2, 20, 0, -2, 7, 9, 0])
+        self.assertEqual(vertexes[2, :, 8].tolist(), list(range(18)))
+        # the first point "moves" from itself
+        self.assertEqual(vertexes[0, 5, :8].tolist(), [0, 0, 5, 0, 0, 5, 0, 0])
+
+    def test_vbit(self):
+        """
+        plunge (full cone, then discarded vertexes), cut (rawPos on the cone
+        of the depth), retract
+        """
+        parser = parse(GCODE)
+        array, infos = make_path_buffer(parser.xs, parser.ys, parser.zs, parser.fs, 90)
+
+        self.assertEqual(infos["stride"], 12)
+        self.assertEqual(infos["vertexes_per_line"], 42)
+
+        vertexes = array.reshape(4, 42, 12)
+        commands = vertexes[:, :, 8]
+
+        # the cone at the lower end: pos2 (101) for a plunge, pos1 (100) else
+        self.assertEqual(set(commands[1, :30]), {101})
+        self.assertEqual(set(commands[1, 30:]), {200})
+        self.assertEqual(set(commands[3, :30]), {100})
+        self.assertEqual(set(commands[2]), {100, 101})
+
+        # 90°: the cone radius is its height (2 + 0.1)
+        raw = vertexes[2, :, 9:12]
+        on_cone = raw[:, 2] > 0
+        self.assertTrue(np.allclose(raw[on_cone, 2], 2.1))
+        self.assertTrue(np.allclose(np.hypot(raw[on_cone, 0], raw[on_cone, 1]), 2.1))
+        self.assertTrue(np.all(raw[~on_cone] == 0))
+
+    def test_cache(self):
+        """ """
+        parser = parse(GCODE)
+        array, infos = make_path_buffer(parser.xs, parser.ys, parser.zs, parser.fs, 90)
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = PathBufferCache(cache_dir, max_nb_entries=2)
+            key = path_buffer_key(GCODE, 90, False)
+
+            self.assertIsNone(cache.get(key))
+            cache.put(key, array, infos)
+
+            cached_array, cached_infos = cache.get(key)
+            self.assertTrue(np.array_equal(cached_array, array))
+            self.assertEqual(cached_infos["total_time"], infos["total_time"])
+
+            self.assertNotEqual(path_buffer_key(GCODE, 60, False), key)
+            self.assertNotEqual(path_buffer_key(GCODE + "\n", 90, False), key)
+
+            # the oldest entries are evicted
+            for angle in (60, 30):
+                cache.put(path_buffer_key(GCODE, angle, False), array, infos)
+            del cached_array
+            self.assertIsNone(cache.get(key))
+            self.assertEqual(len(os.listdir(cache_dir)), 4)
+
+        # and beyond the total size, but the most recent one is kept
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = PathBufferCache(cache_dir, max_nb_bytes=array.nbytes * 3 // 2)
+            for angle in (90, 60):
+                cache.put(path_buffer_key(GCODE, angle, False), array, infos)
+            self.assertIsNone(cache.get(path_buffer_key(GCODE, 90, False)))
+            self.assertIsNotNone(cache.get(path_buffer_key(GCODE, 60, False)))
+
+            cache.max_nb_bytes = 0
+            cache.put(path_buffer_key(GCODE, 30, False), array, infos)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+
+if __name__ == "__main__":
+    if os.environ.get("PYCUT_XMLRUNNER_UNITTESTS", None) == "YES":
+        unittest.main(
+            testRunner=xmlrunner.XMLTestRunner(path="RESULTS", indic="test_vertexbuffer")
+        )
+    else:
+        unittest.main()
@@ -0,0 +1,150 @@
+# This Python file uses the following encoding: utf-8
+
+"""
+A cache of the calculated toolpaths of the operations.
+
+The key is a hash of everything the toolpaths of an op depend on (its
+combined geometry, op type, direction, margin, width and the tool
+diameter/overlap - see CncOp.toolpaths_cache_key), so an op whose inputs
+did not change gets back its toolpaths, whatever else changed in the job.
+
+The toolpaths are kept in memory (LRU) and optionally on disk, as small
+json files in a directory next to the project.
+"""
+
+import os
+import json
+import collections
+
+from typing import List
+from typing import Tuple
+
+import shapely
+
+from shapely_cam import CamPath
+
+# change it when the toolpaths calculation changes: the disk cache
+# of the previous versions is then ignored
+VERSION = 4
+
+
+class ToolpathsCache:
+    """ """
+
+    # in memory
+    MAX_NB_ENTRIES = 64
+
+    # the disk cache directory, next to the project file
+    CACHE_DIRNAME = ".pycut_cache"
+
+    def __init__(self, max_nb_entries: int = MAX_NB_ENTRIES, cache_dir: str = None):
+        self.max_nb_entries = max_nb_entries
+        self.cache_dir = cache_dir
+
+        # key -> list of (path, safe_to_close, arcs)
+        self.entries: collections.OrderedDict[str, List[Tuple]] = (
+            collections.OrderedDict()
+        )
+
+        self.nb_hits = 0
+        self.nb_misses = 0
+
+    @classmethod
+    def for_project(cls, projfilename: str) -> "ToolpathsCache":
+        """
+        memory + disk cache in the directory of the project
+        """
+        projdir = os.path.dirname(os.path.abspath(projfilename))
+
+        return cls(cache_dir=os.path.join(projdir, cls.CACHE_DIRNAME))
+
+    def get(self, key: str) -> List[CamPath] | None:
+        """ """
+        paths = self.entries.get(key, None)
+
+        if paths is not None:
+            self.entries.move_to_end(key)
+        else:
+            paths = self.read(key)
+            if paths is not None:
+                self.keep(key, paths)
+
+        if paths is None:
+            self.nb_misses += 1
+            return None
+
+        self.nb_hits += 1
+        return [
+            CamPath(path, safe_to_close, list(arcs))
+            for path, safe_to_close, arcs in paths
+        ]
+
+    def put(self, key: str, cam_paths: List[CamPath]):
+        """ """
+        paths = [
+            (cam_path.path, cam_path.safe_to_close, list(cam_path.arcs))
+            for cam_path in cam_paths
+        ]
+
+        self.keep(key, paths)
+        self.write(key, paths)
+
+    def keep(self, key: str, paths: List[Tuple]):
+        """
+        in memory, the least recently used entries are evicted
+        """
+        self.entries[key] = paths
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_nb_entries:
+            self.entries.popitem(last=False)
+
+    def filename(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def read(self, key: str) -> List[Tuple] | None:
+        """ """
+        if self.cache_dir is None:
+            return None
+
+        try:
+            with open(self.filename(key)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if data.get("version", None) != VERSION:
+            return None
+
+        return [
+            (
+                shapely.from_wkb(bytes.fromhex(path)),
+                safe_to_close,
+                [tuple(arc) for arc in arcs],
+            )
+            for path, safe_to_close, arcs in data["paths"]
+        ]
+
+    def write(self, key: str, paths: List[Tuple]):
+        """
+        a failure to write the cache is not an error
+        """
+        if self.cache_dir is None:
+            return
+
+        data = {
+            "version": VERSION,
+            "paths": [
+                [shapely.to_wkb(path, hex=True), safe_to_close, arcs]
+                for path, safe_to_close, arcs in paths
+            ],
+        }
+
+        filename = self.filename(key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(filename + ".tmp", "w") as f:
+                json.dump(data, f)
+            os.replace(filename + ".tmp", filename)
+        except OSError as e:
+            print("toolpaths cache: cannot write %s: %s" % (filename, e))